@@ -358,8 +358,8 @@ class ProjectOwnershipTransferDataAPITestCase(BaseAssetTestCase):
         new=MockServiceUsageSerializer._get_storage_usage
     )
     @patch(
-        'kpi.serializers.v2.service_usage.ServiceUsageSerializer._get_submission_counters',
-        new=MockServiceUsageSerializer._get_submission_counters
+        'kpi.serializers.v2.service_usage.ServiceUsageSerializer._get_usage_counters',
+        new=MockServiceUsageSerializer._get_usage_counters
     )
     @patch(
         'kobo.apps.project_ownership.models.transfer.reset_kc_permissions',
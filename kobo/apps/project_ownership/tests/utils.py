@@ -1,4 +1,7 @@
-from django.db.models import F
+from django.db.models import F, Sum
+from django.db.models.functions import Coalesce
+
+from kobo.apps.trackers.models import NLPUsageCounter
 from kpi.models.asset import Asset
 
 
@@ -18,7 +21,7 @@ class MockServiceUsageSerializer:
                         [att['bytes'] for att in submission['_attachments']]
                     )
 
-    def _get_submission_counters(self, month_filter, year_filter):
+    def _get_usage_counters(self):
         self._total_submission_count = {
             'all_time': 0,
             'current_year': 0,
@@ -33,3 +36,13 @@ class MockServiceUsageSerializer:
                 self._total_submission_count['all_time'] += len(submissions)
                 self._total_submission_count['current_year'] += len(submissions)
                 self._total_submission_count['current_month'] += len(submissions)
+
+        nlp_usage = NLPUsageCounter.objects.filter(
+            self._user_id_query
+        ).aggregate(
+            asr_seconds=Coalesce(Sum('total_asr_seconds'), 0),
+            mt_characters=Coalesce(Sum('total_mt_characters'), 0),
+        )
+        for period in self._total_submission_count:
+            for key, value in nlp_usage.items():
+                self._total_nlp_usage[f'{key}_{period}'] = value
@@ -1,17 +1,79 @@
 # coding: utf-8
-from collections import OrderedDict
+import json
+from collections import Counter, OrderedDict
 from copy import deepcopy
 
+from django.conf import settings
+from django.core.cache import cache
 from django.utils.translation import gettext as t
 from rest_framework import serializers
 from formpack import FormPack
 
+from kpi.constants import PERM_VIEW_SUBMISSIONS
+from kpi.utils.hash import calculate_hash
 from kpi.utils.log import logging
+from kpi.utils.mongo_helper import MongoHelper
 from .constants import (
     FUZZY_VERSION_ID_KEY,
     INFERRED_VERSION_ID_KEY,
 )
 
+# Statistics of these question types can be computed by MongoDB
+MONGO_AGGREGATION_DATA_TYPES = ('select_one', 'select_multiple')
+
+# Submission keys `build_formpack()` reads to infer the version of a
+# submission; they must be kept when only some fields are retrieved
+VERSION_ID_KEYS = ('__version__', '_version_', '_version__001', '_version__002')
+
+
+def get_formpack_schemas(versions) -> dict:
+    """
+    Return a dictionary of formpack schemas of `versions`, indexed by version
+    uid. Versions whose schema cannot be built are omitted.
+
+    Schemas are expensive to build and never change for a given content,
+    so they are kept in the cache (keyed by version uid and content hash) for
+    `settings.FORMPACK_SCHEMA_CACHE_TIMEOUT` seconds.
+    """
+    cache_keys = {}
+    for v in versions:
+        cache_key = f'formpack_schema:{v.uid}:{v.content_hash}'
+        if v.deployed_content is not None:
+            cache_key += ':deployed'
+        cache_keys[cache_key] = v
+
+    fp_schemas = {}
+    cached_schemas = cache.get_many(cache_keys.keys())
+    missing_schemas = {}
+    for cache_key, v in cache_keys.items():
+        try:
+            fp_schemas[v.uid] = cached_schemas[cache_key]
+        except KeyError:
+            pass
+        else:
+            continue
+
+        try:
+            fp_schema = v.to_formpack_schema()
+        # FIXME: should FormPack validation errors have their own
+        # exception class?
+        except TypeError as e:
+            # https://github.com/kobotoolbox/kpi/issues/1361
+            logging.error(
+                f'Failed to get formpack schema for version: {repr(e)}',
+                exc_info=True
+            )
+        else:
+            fp_schemas[v.uid] = fp_schema
+            missing_schemas[cache_key] = fp_schema
+
+    if missing_schemas:
+        cache.set_many(
+            missing_schemas, settings.FORMPACK_SCHEMA_CACHE_TIMEOUT
+        )
+
+    return fp_schemas
+
 
 def build_formpack(asset, submission_stream=None, use_all_form_versions=True):
     """
@@ -32,18 +94,10 @@ def build_formpack(asset, submission_stream=None, use_all_form_versions=True):
 
     schemas = []
     version_ids_newest_first = []
+    fp_schemas = get_formpack_schemas(_versions)
     for v in _versions:
-        try:
-            fp_schema = v.to_formpack_schema()
-        # FIXME: should FormPack validation errors have their own
-        # exception class?
-        except TypeError as e:
-            # https://github.com/kobotoolbox/kpi/issues/1361
-            logging.error(
-                f'Failed to get formpack schema for version: {repr(e)}',
-                exc_info=True
-            )
-        else:
+        fp_schema = fp_schemas.get(v.uid)
+        if fp_schema is not None:
             fp_schema['version_id_key'] = INFERRED_VERSION_ID_KEY
             schemas.append(fp_schema)
             version_ids_newest_first.append(v.uid)
@@ -119,9 +173,76 @@ def _vnames(asset, cache=False):
     return asset._available_report_uids
 
 
+def _get_aggregated_stats(asset, fields, lang, permission_filters):
+    """
+    Return formpack statistics of `fields` computed from value frequencies
+    aggregated by MongoDB, instead of reading every submission.
+    """
+    frequencies = MongoHelper.get_value_frequencies(
+        asset.deployment.mongo_userform_id,
+        [field.path for field in fields],
+        permission_filters,
+    )
+    stats = {}
+    for field in fields:
+        # Mimic the metrics formpack collects while reading submissions
+        metrics = Counter()
+        for frequency in frequencies[field.path]:
+            if frequency['value'] is None:
+                metrics[None] += frequency['count']
+                continue
+            for value in field.parse_values(frequency['value']):
+                metrics[value] += frequency['count']
+            metrics['__submissions__'] += frequency['count']
+
+        stats[field.name] = (
+            field,
+            field.get_labels(lang)[0],
+            field.get_stats(metrics, lang=lang),
+        )
+    return stats
+
+
+def _get_projected_fields(fields: list) -> list[str]:
+    """
+    Return the submission keys needed to compute statistics of `fields`,
+    i.e. their paths, the paths of their ancestors (repeat groups are stored
+    as lists under their own key) and the version keys.
+    """
+    projected_fields = set(VERSION_ID_KEYS)
+    for field in fields:
+        path = field.path.split('/')
+        for idx in range(1, len(path) + 1):
+            projected_fields.add('/'.join(path[:idx]))
+    return sorted(projected_fields)
+
+
 def data_by_identifiers(asset, field_names=None, submission_stream=None,
                         report_styles=None, lang=None, fields=None,
-                        split_by=None):
+                        split_by=None, use_mongo_aggregation=False,
+                        permission_filters=None, get_submission_stream=None):
+    """
+    Return report statistics of `field_names` (all fields by default).
+
+    If `use_mongo_aggregation` is `True`, statistics of select questions are
+    computed by MongoDB from the submissions matching `permission_filters`
+    (`submission_stream` is then expected to contain the same submissions),
+    unless the report is split.
+
+    `get_submission_stream` can be given instead of `submission_stream`. It
+    receives the list of submission fields the remaining statistics need and
+    returns the submissions restricted to those fields.
+    """
+    projected_fields = []
+    if get_submission_stream is not None:
+        def _get_projected_submission_stream():
+            # `projected_fields` is only filled once the fields which cannot
+            # be aggregated by MongoDB are known, i.e. before the stream is
+            # read for the first time
+            yield from get_submission_stream(projected_fields)
+
+        submission_stream = _get_projected_submission_stream()
+
     pack, submission_stream = build_formpack(asset, submission_stream)
     _all_versions = pack.versions.keys()
     report = pack.autoreport(versions=_all_versions)
@@ -174,10 +295,124 @@ def data_by_identifiers(asset, field_names=None, submission_stream=None,
             'style': specified_styles.get(identifier, {}),
         }
 
-    return [
-        _package_stat(*stat_tup, split_by=split_by) for
-        stat_tup in report.get_stats(submission_stream,
-                                     fields=field_names,
-                                     lang=lang,
-                                     split_by=split_by)
+    aggregated_stats = {}
+    if use_mongo_aggregation and not split_by:
+        aggregated_fields = [
+            field
+            for name, field in fields_by_name.items()
+            if name in field_names
+            and field.data_type in MONGO_AGGREGATION_DATA_TYPES
+        ]
+        aggregated_stats = _get_aggregated_stats(
+            asset, aggregated_fields, lang, permission_filters
+        )
+
+    if not aggregated_stats:
+        projected_fields.extend(
+            _get_projected_fields(
+                [
+                    fields_by_name[name]
+                    for name in field_names
+                    if name in fields_by_name
+                ]
+                + ([fields_by_name[split_by]] if split_by else [])
+            )
+        )
+        return [
+            _package_stat(*stat_tup, split_by=split_by) for
+            stat_tup in report.get_stats(submission_stream,
+                                         fields=field_names,
+                                         lang=lang,
+                                         split_by=split_by)
+        ]
+
+    remaining_field_names = [
+        name for name in field_names if name not in aggregated_stats
     ]
+    streamed_stats = {}
+    if remaining_field_names:
+        projected_fields.extend(
+            _get_projected_fields(
+                [
+                    fields_by_name[name]
+                    for name in remaining_field_names
+                    if name in fields_by_name
+                ]
+            )
+        )
+        streamed_stats = {
+            stat_tup[0].name: stat_tup
+            for stat_tup in report.get_stats(submission_stream,
+                                             fields=remaining_field_names,
+                                             lang=lang,
+                                             split_by=split_by)
+        }
+
+    # Keep the order of the form
+    stats = []
+    for name in fields_by_name.keys():
+        try:
+            stat_tup = aggregated_stats.get(name) or streamed_stats[name]
+        except KeyError:
+            continue
+        stats.append(_package_stat(*stat_tup, split_by=split_by))
+
+    return stats
+
+
+def get_cached_report_data(
+    asset, user, field_names=None, lang=None, split_by=None
+):
+    """
+    Return the same result as `data_by_identifiers()` for the submissions
+    `user` is allowed to view.
+
+    Results are persisted in the cache (per asset, parameters and partial
+    permissions of `user`) for `settings.REPORT_DATA_CACHE_TIMEOUT` seconds
+    along with the `submission_data_version` of the deployment they have been
+    computed from. They are recomputed only when submissions have been added,
+    deleted or edited since.
+    """
+    deployment = asset.deployment
+    if field_names is not None:
+        field_names = list(field_names)
+
+    permission_filters = asset.get_filters_for_partial_perm(
+        user.pk, perm=PERM_VIEW_SUBMISSIONS
+    )
+    report_params = json.dumps(
+        {
+            'field_names': field_names,
+            'lang': lang,
+            'permission_filters': permission_filters,
+            'report_styles': asset.report_styles,
+            'split_by': split_by,
+            'version_id': deployment.version_id,
+        },
+        default=str,
+        sort_keys=True,
+    )
+    cache_key = f'report_data:{asset.uid}:{calculate_hash(report_params)}'
+    data_version = deployment.submission_data_version
+
+    cached_report = cache.get(cache_key)
+    if cached_report and cached_report['data_version'] == data_version:
+        return cached_report['data']
+
+    data = data_by_identifiers(
+        asset,
+        field_names,
+        lang=lang,
+        split_by=split_by,
+        get_submission_stream=lambda fields: deployment.get_submissions(
+            user, fields=fields
+        ),
+        use_mongo_aggregation=True,
+        permission_filters=permission_filters,
+    )
+    cache.set(
+        cache_key,
+        {'data_version': data_version, 'data': data},
+        settings.REPORT_DATA_CACHE_TIMEOUT,
+    )
+    return data
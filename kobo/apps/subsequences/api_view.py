@@ -1,8 +1,7 @@
 import json
 from copy import deepcopy
 
-from jsonschema import validate
-from jsonschema.exceptions import ValidationError as SchemaValidationError
+from jsonschema.exceptions import best_match
 from kobo.apps.subsequences.models import SubmissionExtras
 from kpi.models import Asset
 from kpi.permissions import SubmissionPermission
@@ -83,10 +82,8 @@ class AdvancedSubmissionView(APIView):
 
     def post(self, request, asset_uid, format=None):
         posted_data = request.data
-        schema = self.asset.get_advanced_submission_schema()
-        try:
-            validate(posted_data, schema)
-        except SchemaValidationError as err:
+        validator = self.asset.get_advanced_submission_validator()
+        if err := best_match(validator.iter_errors(posted_data)):
             raise APIValidationError({'error': err})
 
         _check_asr_mt_access_if_applicable(request.user, posted_data)
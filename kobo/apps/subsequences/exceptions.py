@@ -10,3 +10,9 @@ class TranscriptionResultsNotFound(Exception):
     """
     No results returned by specified transcription service
     """
+
+
+class EngineBusyError(Exception):
+    """
+    All the slots of an ASR/MT engine are already taken by other jobs
+    """
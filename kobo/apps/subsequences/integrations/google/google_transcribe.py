@@ -10,7 +10,7 @@ from django.core.cache import cache
 from google.cloud import speech, storage
 from googleapiclient import discovery
 
-from kobo.apps.trackers.utils import update_nlp_counter
+from kobo.apps.trackers.utils import buffer_nlp_counter
 from .utils import google_credentials_from_constance_config
 from ...constants import GOOGLE_CACHE_TIMEOUT, make_async_cache_key
 from ...exceptions import (
@@ -135,7 +135,7 @@ class GoogleTranscribeEngine(AutoTranscription):
 
             speech_results = speech_client.long_running_recognize(audio=audio, config=config)
             cache.set(cache_key, speech_results.operation.name, GOOGLE_CACHE_TIMEOUT)
-            update_nlp_counter(
+            buffer_nlp_counter(
                 'google_asr_seconds',
                 int(duration.total_seconds()),
                 self.asset.owner_id,
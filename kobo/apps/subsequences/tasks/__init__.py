@@ -1 +1,5 @@
 from .handle_translation_operation import handle_google_translation_operation
+from .process_submission_extras import (
+    transcribe_submission_audio,
+    translate_submission_text,
+)
@@ -0,0 +1,279 @@
+from contextlib import contextmanager
+
+from celery import shared_task
+from celery.exceptions import Retry
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+from kobo.apps.languages.models.translation import TranslationService
+from kobo.apps.trackers.utils import buffer_nlp_counter
+from kpi.utils.log import logging
+from .handle_translation_operation import handle_google_translation_operation
+from ..constants import (
+    ASYNC_TRANSLATION_DELAY_INTERVAL,
+    GOOGLE_CACHE_TIMEOUT,
+    GOOGLETS,
+    GOOGLETX,
+)
+from ..exceptions import (
+    EngineBusyError,
+    SubsequenceTimeoutError,
+    TranscriptionResultsNotFound,
+)
+
+# Delay between two checks of a transcription operation which is still running
+# on the engine side
+ASYNC_TRANSCRIPTION_DELAY_INTERVAL = 10  # seconds
+
+
+@shared_task(
+    bind=True,
+    max_retries=GOOGLE_CACHE_TIMEOUT // ASYNC_TRANSCRIPTION_DELAY_INTERVAL,
+)
+def transcribe_submission_audio(self, submission_extras_id: int, qpath: str):
+    """
+    Run the automatic transcription of the audio answer of `qpath` requested
+    on a submission, and store the results.
+
+    The status stays `in_progress` until results are stored. Long-running
+    operations are polled again later, see `GoogleTranscribeEngine`.
+    """
+    submission_extras = _get_submission_extras(submission_extras_id)
+    params = submission_extras.content.get(qpath, {}).get(GOOGLETS, {})
+    if params.get('status') != 'in_progress':
+        return
+
+    asset = submission_extras.asset
+    language_code = params.get('languageCode')
+    region_code = params.get('regionCode')
+    try:
+        xpath = asset.get_xpaths_by_qpath()[qpath]
+    except KeyError:
+        logging.error(f'No XPath found for {qpath} of asset {asset.uid}')
+        return _save_results(
+            submission_extras_id,
+            qpath,
+            GOOGLETS,
+            {
+                'status': 'error',
+                'languageCode': language_code,
+                'regionCode': region_code,
+            },
+        )
+
+    try:
+        try:
+            with _engine_slot('transcription'):
+                engine = import_string(settings.ASR_MT_TRANSCRIPTION_ENGINE)()
+                results = engine.transcribe_file(
+                    asset=asset,
+                    xpath=xpath,
+                    source=region_code or language_code,
+                    submission_id=submission_extras.submission_uuid,
+                    user=asset.owner,
+                )
+        except EngineBusyError as e:
+            raise self.retry(
+                exc=e, countdown=settings.ASR_MT_ENGINE_RETRY_DELAY
+            )
+        except SubsequenceTimeoutError as e:
+            raise self.retry(exc=e, countdown=ASYNC_TRANSCRIPTION_DELAY_INTERVAL)
+        except TranscriptionResultsNotFound:
+            logging.error(f'No transcriptions found for {xpath}')
+            results = []
+    except Retry:
+        raise
+    except Exception as e:
+        # Includes `AudioTooLongError` and the original error once retries
+        # are exhausted. Clients would poll forever if the status remained
+        # `in_progress`.
+        logging.error(f'Cannot transcribe {xpath}: {e}', exc_info=True)
+        return _save_results(
+            submission_extras_id,
+            qpath,
+            GOOGLETS,
+            {
+                'status': 'error',
+                'languageCode': language_code,
+                'regionCode': region_code,
+            },
+        )
+
+    _save_results(
+        submission_extras_id,
+        qpath,
+        GOOGLETS,
+        {
+            'status': 'complete',
+            'value': ' '.join([r['transcript'] for r in results]),
+            'fullResponse': results,
+            'languageCode': language_code,
+            'regionCode': region_code,
+        },
+    )
+
+
+@shared_task(bind=True, max_retries=None)
+def translate_submission_text(self, submission_extras_id: int, qpath: str):
+    """
+    Run the automatic translation of the transcript of `qpath` requested on
+    a submission, and store the results.
+
+    Long texts are translated asynchronously by the engine, see
+    `handle_google_translation_operation()`.
+    """
+    submission_extras = _get_submission_extras(submission_extras_id)
+    vals = submission_extras.content.get(qpath, {})
+    params = vals.get(GOOGLETX, {})
+    if params.get('status') != 'in_progress':
+        return
+
+    asset = submission_extras.asset
+    content = vals['transcript']['value']
+    target_lang = params['languageCode']
+
+    try:
+        try:
+            with _engine_slot('translation'):
+                engine = import_string(settings.ASR_MT_TRANSLATION_ENGINE)()
+                if engine.translation_must_be_async(content):
+                    _translate_async(
+                        engine,
+                        asset,
+                        submission_extras.submission_uuid,
+                        qpath,
+                        content,
+                        params['source'],
+                        target_lang,
+                    )
+                    return
+
+                results = _translate_sync(
+                    engine, asset, content, params['source'], target_lang
+                )
+        except EngineBusyError as e:
+            raise self.retry(
+                exc=e, countdown=settings.ASR_MT_ENGINE_RETRY_DELAY
+            )
+    except Retry:
+        raise
+    except Exception as e:
+        logging.error(f'Cannot translate {qpath}: {e}', exc_info=True)
+        results = {
+            'status': 'error',
+            'source': params['source'],
+            'languageCode': target_lang,
+        }
+
+    _save_results(submission_extras_id, qpath, GOOGLETX, results)
+
+
+@contextmanager
+def _engine_slot(engine_type: str):
+    """
+    Hold one of the `settings.ASR_MT_ENGINE_CONCURRENCY[engine_type]` slots
+    shared by all workers while the engine is called.
+    Raise `EngineBusyError` if all of them are taken.
+    """
+    cache_key = f'asr_mt_engine_slots:{engine_type}'
+    # Slots of killed workers are released when the counter expires
+    cache.add(cache_key, 0, settings.CELERY_TASK_TIME_LIMIT)
+    try:
+        taken_slots = cache.incr(cache_key)
+    except ValueError:
+        # The counter has expired in the meantime
+        cache.set(cache_key, 1, settings.CELERY_TASK_TIME_LIMIT)
+        taken_slots = 1
+
+    try:
+        if taken_slots > settings.ASR_MT_ENGINE_CONCURRENCY[engine_type]:
+            raise EngineBusyError
+        yield
+    finally:
+        try:
+            cache.decr(cache_key)
+        except ValueError:
+            pass
+
+
+def _translate_async(
+    engine,
+    asset: 'kpi.models.Asset',
+    submission_uuid: str,
+    qpath: str,
+    content: str,
+    source_lang: str,
+    target_lang: str,
+):
+    # FIXME Code is hardcoded and should be dynamic
+    service = TranslationService.objects.get(code='goog')
+    buffer_nlp_counter(
+        'google_mt_characters', len(content), asset.owner_id, asset.id
+    )
+    followup_params = engine.translate_async(
+        # the string to translate
+        content=content,
+        # field IDs to tell us where to save results
+        submission_uuid=submission_uuid,
+        xpath=qpath,
+        # username is used in the label of the request
+        username=asset.owner.username,
+        # the rest
+        source_lang=service.get_language_code(source_lang),
+        target_lang=service.get_language_code(target_lang),
+    )
+    handle_google_translation_operation.apply_async(
+        kwargs=followup_params,
+        countdown=ASYNC_TRANSLATION_DELAY_INTERVAL,
+    )
+
+
+def _translate_sync(
+    engine,
+    asset: 'kpi.models.Asset',
+    content: str,
+    source_lang: str,
+    target_lang: str,
+) -> dict:
+    # FIXME Code is hardcoded and should be dynamic
+    service = TranslationService.objects.get(code='goog')
+    buffer_nlp_counter(
+        'google_mt_characters', len(content), asset.owner_id, asset.id
+    )
+    results = engine.translate_sync(
+        content=content,
+        source_lang=service.get_language_code(source_lang),
+        target_lang=service.get_language_code(target_lang),
+        username=asset.owner.username,
+    )
+    # FIXME: clobbers previous translations; we want a record
+    # of what Google returned
+    return {
+        'status': 'complete',
+        'languageCode': target_lang,
+        'value': results,
+    }
+
+
+def _get_submission_extras(submission_extras_id: int):
+    # Avoid circular import
+    SubmissionExtras = apps.get_model('subsequences', 'SubmissionExtras')  # noqa
+    return SubmissionExtras.objects.select_related(
+        'asset', 'asset__owner'
+    ).defer('asset__content').get(pk=submission_extras_id)
+
+
+def _save_results(
+    submission_extras_id: int, qpath: str, key: str, results: dict
+):
+    # Avoid circular import
+    SubmissionExtras = apps.get_model('subsequences', 'SubmissionExtras')  # noqa
+    with transaction.atomic():
+        submission_extras = SubmissionExtras.objects.select_for_update().get(
+            pk=submission_extras_id
+        )
+        submission_extras.content.setdefault(qpath, {})[key] = results
+        submission_extras.save()
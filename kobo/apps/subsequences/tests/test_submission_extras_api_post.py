@@ -14,8 +14,11 @@ from kobo.apps.languages.models.transcription import (
     TranscriptionService,
     TranscriptionServiceLanguageM2M,
 )
+from kobo.apps.languages.models.translation import (
+    TranslationService,
+    TranslationServiceLanguageM2M,
+)
 from kpi.models.asset import Asset
-from kpi.utils.fuzzy_int import FuzzyInt
 from kpi.constants import (
     PERM_ADD_SUBMISSIONS,
     PERM_CHANGE_ASSET,
@@ -23,8 +26,43 @@ from kpi.constants import (
     PERM_VIEW_ASSET,
     PERM_VIEW_SUBMISSIONS,
 )
-from ..constants import GOOGLETS, make_async_cache_key
+from ..constants import GOOGLETS, GOOGLETX, make_async_cache_key
+from ..exceptions import EngineBusyError
 from ..models import SubmissionExtras
+from ..tasks.process_submission_extras import _engine_slot
+from ..utils import advanced_submission_jsonschema
+
+
+class StandInTranscribeEngine:
+    """
+    Local stand-in for `GoogleTranscribeEngine`
+    """
+
+    RESULTS = [
+        {'transcript': 'hello', 'confidence': 0.9},
+        {'transcript': 'world', 'confidence': 0.8},
+    ]
+    calls = []
+
+    def transcribe_file(self, asset, xpath, submission_id, source, user):
+        self.calls.append((xpath, source, submission_id))
+        return self.RESULTS
+
+
+class StandInTranslationEngine:
+    """
+    Local stand-in for `GoogleTranslationEngine`
+    """
+
+    MAX_SYNC_CHARS = 20
+    calls = []
+
+    def translation_must_be_async(self, content):
+        return len(content) > self.MAX_SYNC_CHARS
+
+    def translate_sync(self, content, source_lang, target_lang, username):
+        self.calls.append((content, source_lang, target_lang))
+        return content.upper()
 
 
 class ValidateSubmissionTest(APITestCase):
@@ -66,6 +104,45 @@ class ValidateSubmissionTest(APITestCase):
         q1transcript = rr.json()['q1']['transcript']
         assert q1transcript['value'] == 'they said goodbye'
 
+    @override_settings(
+        CACHES={
+            'default': {
+                'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'
+            }
+        }
+    )
+    def test_schema_is_built_once_per_features_and_version(self):
+        self.set_asset_advanced_features({'transcript': {'values': ['q1']}})
+        url = reverse('advanced-submission-post', args=[self.asset.uid])
+        package = {
+            'submission': 'abc123-def456',
+            'q1': {'transcript': {'value': 'they said hello'}},
+        }
+        with patch(
+            'kpi.models.asset.advanced_submission_jsonschema',
+            wraps=advanced_submission_jsonschema,
+        ) as build_schema:
+            for _ in range(3):
+                res = self.client.post(url, package, format='json')
+                assert res.status_code == 200
+            assert build_schema.call_count == 1
+
+            # An invalid payload is still rejected by the cached validator
+            res = self.client.post(
+                url, {'q1': {'transcript': {'value': 'oops'}}}, format='json'
+            )
+            assert res.status_code == 400
+            assert build_schema.call_count == 1
+
+            # Changing the features builds a new schema
+            self.set_asset_advanced_features({
+                'transcript': {'values': ['q1']},
+                'translation': {'values': ['q1'], 'languages': ['tx1']},
+            })
+            res = self.client.post(url, package, format='json')
+            assert res.status_code == 200
+            assert build_schema.call_count == 2
+
     def test_translation_revisions_stored_properly(self):
         self.set_asset_advanced_features({
             'translation': {
@@ -429,11 +506,18 @@ class GoogleTranscriptionSubmissionTest(APITestCase):
             'submission': submission_id,
             'q1': {GOOGLETS: {'status': 'requested', 'languageCode': ''}}
         }
-        with self.assertNumQueries(FuzzyInt(51, 55)):
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
             res = self.client.post(url, data, format='json')
+        self.assertContains(res, 'in_progress')
+        assert len(callbacks) == 1
+        res = self.client.get(url, {'submission': submission_id})
         self.assertContains(res, 'complete')
-        with self.assertNumQueries(FuzzyInt(20, 24)):
-            self.client.post(url, data, format='json')
+        # Requesting the same transcription again returns the stored results
+        # and does not queue another job
+        with self.captureOnCommitCallbacks() as callbacks:
+            res = self.client.post(url, data, format='json')
+        self.assertContains(res, 'complete')
+        assert len(callbacks) == 0
 
     @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
     @override_config(ASR_MT_INVITEE_USERNAMES='*')
@@ -460,9 +544,134 @@ class GoogleTranscriptionSubmissionTest(APITestCase):
             'submission': submission_id,
             'q1': {GOOGLETS: {'status': 'requested', 'languageCode': ''}}
         }
-        res = self.client.post(url, data, format='json')
+        with self.captureOnCommitCallbacks(execute=True):
+            res = self.client.post(url, data, format='json')
+        self.assertContains(res, 'in_progress')
+        res = self.client.get(url, {'submission': submission_id})
         self.assertContains(res, 'complete')
 
+    @override_settings(
+        CACHES={
+            'default': {
+                'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'
+            }
+        },
+        ASR_MT_TRANSCRIPTION_ENGINE=(
+            'kobo.apps.subsequences.tests.test_submission_extras_api_post.'
+            'StandInTranscribeEngine'
+        ),
+    )
+    @override_config(ASR_MT_INVITEE_USERNAMES='*')
+    def test_transcript_is_processed_in_background(self):
+        url = reverse('advanced-submission-post', args=[self.asset.uid])
+        submission_id = 'abc123-def456'
+        data = {
+            'submission': submission_id,
+            'q1': {GOOGLETS: {'status': 'requested', 'languageCode': 'en'}}
+        }
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            res = self.client.post(url, data, format='json')
+        assert res.json()['q1'][GOOGLETS]['status'] == 'in_progress'
+
+        # Results are stored once the job has been processed
+        res = self.client.get(url, {'submission': submission_id})
+        assert res.json()['q1'][GOOGLETS]['status'] == 'in_progress'
+        for callback in callbacks:
+            callback()
+        res = self.client.get(url, {'submission': submission_id})
+        assert res.json()['q1'][GOOGLETS] == {
+            'status': 'complete',
+            'value': 'hello world',
+            'fullResponse': StandInTranscribeEngine.RESULTS,
+            'languageCode': 'en',
+            'regionCode': None,
+        }
+        assert StandInTranscribeEngine.calls == [('q1', 'en', submission_id)]
+
+    @override_settings(
+        CACHES={
+            'default': {
+                'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'
+            }
+        },
+        ASR_MT_TRANSCRIPTION_ENGINE=(
+            'kobo.apps.subsequences.tests.test_submission_extras_api_post.'
+            'StandInTranscribeEngine'
+        ),
+    )
+    @override_config(ASR_MT_INVITEE_USERNAMES='*')
+    def test_failed_transcript_is_not_left_in_progress(self):
+        url = reverse('advanced-submission-post', args=[self.asset.uid])
+        submission_id = 'abc123-def456'
+        data = {
+            'submission': submission_id,
+            'q1': {GOOGLETS: {'status': 'requested', 'languageCode': 'en'}}
+        }
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.client.post(url, data, format='json')
+        with patch.object(
+            StandInTranscribeEngine,
+            'transcribe_file',
+            side_effect=RuntimeError('Engine failure'),
+        ):
+            for callback in callbacks:
+                callback()
+        res = self.client.get(url, {'submission': submission_id})
+        assert res.json()['q1'][GOOGLETS] == {
+            'status': 'error',
+            'languageCode': 'en',
+            'regionCode': None,
+        }
+
+    @override_settings(
+        CACHES={
+            'default': {
+                'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'
+            }
+        },
+    )
+    @override_config(ASR_MT_INVITEE_USERNAMES='*')
+    def test_polling_a_transcript_does_not_queue_jobs(self):
+        url = reverse('advanced-submission-post', args=[self.asset.uid])
+        data = {
+            'submission': 'abc123-def456',
+            'q1': {GOOGLETS: {'status': 'requested', 'languageCode': 'en'}}
+        }
+        with self.captureOnCommitCallbacks() as callbacks:
+            res = self.client.post(url, data, format='json')
+        assert len(callbacks) == 1
+
+        # Clients poll by posting the same request
+        for _ in range(3):
+            with self.captureOnCommitCallbacks() as callbacks:
+                res = self.client.post(url, data, format='json')
+            assert res.json()['q1'][GOOGLETS]['status'] == 'in_progress'
+            assert len(callbacks) == 0
+
+        # A request for another language is processed
+        data['q1'][GOOGLETS]['languageCode'] = 'fr'
+        with self.captureOnCommitCallbacks() as callbacks:
+            res = self.client.post(url, data, format='json')
+        assert res.json()['q1'][GOOGLETS]['languageCode'] == 'fr'
+        assert len(callbacks) == 1
+
+    @override_settings(
+        CACHES={
+            'default': {
+                'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'
+            }
+        },
+        ASR_MT_ENGINE_CONCURRENCY={'transcription': 1},
+    )
+    def test_engine_concurrency_is_limited(self):
+        with _engine_slot('transcription'):
+            with self.assertRaises(EngineBusyError):
+                with _engine_slot('transcription'):
+                    pass
+        # The slot has been released
+        with _engine_slot('transcription'):
+            pass
+
     @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}})
     def test_google_transcript_permissions(self):
         url = reverse('advanced-submission-post', args=[self.asset.uid])
@@ -490,3 +699,108 @@ class GoogleTranscriptionSubmissionTest(APITestCase):
         self.asset.save()
         res = self.client.get(url + '?submission=' + submission_id, format='json')
         self.assertEqual(res.status_code, 404)
+
+
+@override_settings(
+    CACHES={
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'
+        }
+    },
+    ASR_MT_TRANSLATION_ENGINE=(
+        'kobo.apps.subsequences.tests.test_submission_extras_api_post.'
+        'StandInTranslationEngine'
+    ),
+)
+@override_config(ASR_MT_INVITEE_USERNAMES='*')
+class GoogleTranslationSubmissionTest(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='someuser', email='user@example.com'
+        )
+        self.asset = Asset.objects.create(
+            owner=self.user,
+            content={'survey': [{'type': 'audio', 'name': 'q1'}]},
+            advanced_features={
+                'transcript': {'values': ['q1']},
+                'translation': {'values': ['q1'], 'languages': ['fr']},
+            },
+        )
+        self.asset.deploy(backend='mock', active=True)
+        self.client.force_login(self.user)
+        self.url = reverse('advanced-submission-post', args=[self.asset.uid])
+        service = TranslationService.objects.create(code='goog')
+        for code in ['en', 'fr']:
+            TranslationServiceLanguageM2M.objects.create(
+                language=Language.objects.create(name=code, code=code),
+                service=service,
+            )
+        StandInTranslationEngine.calls = []
+
+    def _request_translation(self, transcript):
+        return {
+            'submission': 'abc123-def456',
+            'q1': {
+                'transcript': {'value': transcript, 'languageCode': 'en'},
+                GOOGLETX: {'status': 'requested', 'languageCode': 'fr'},
+            },
+        }
+
+    def test_short_text_is_translated_in_background(self):
+        data = self._request_translation('hello')
+        with self.captureOnCommitCallbacks() as callbacks:
+            res = self.client.post(self.url, data, format='json')
+        assert res.status_code == 200
+        assert res.json()['q1'][GOOGLETX] == {
+            'status': 'in_progress',
+            'source': 'en',
+            'languageCode': 'fr',
+        }
+        assert len(callbacks) == 1
+        assert StandInTranslationEngine.calls == []
+
+        for callback in callbacks:
+            callback()
+        res = self.client.get(self.url, {'submission': 'abc123-def456'})
+        assert res.json()['q1'][GOOGLETX] == {
+            'status': 'complete',
+            'languageCode': 'fr',
+            'value': 'HELLO',
+        }
+
+        # The same request is not translated twice
+        with self.captureOnCommitCallbacks() as callbacks:
+            res = self.client.post(self.url, data, format='json')
+        assert res.json()['q1'][GOOGLETX]['value'] == 'HELLO'
+        assert len(callbacks) == 0
+        assert StandInTranslationEngine.calls == [('hello', 'en', 'fr')]
+
+    def test_failed_translation_is_not_left_in_progress(self):
+        data = self._request_translation('hello')
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.client.post(self.url, data, format='json')
+        with patch.object(
+            StandInTranslationEngine,
+            'translate_sync',
+            side_effect=RuntimeError('Engine failure'),
+        ):
+            for callback in callbacks:
+                callback()
+        res = self.client.get(self.url, {'submission': 'abc123-def456'})
+        assert res.json()['q1'][GOOGLETX] == {
+            'status': 'error',
+            'source': 'en',
+            'languageCode': 'fr',
+        }
+
+    def test_long_text_is_translated_in_background(self):
+        data = self._request_translation('they said hello ' * 10)
+        with self.captureOnCommitCallbacks() as callbacks:
+            res = self.client.post(self.url, data, format='json')
+        assert res.json()['q1'][GOOGLETX] == {
+            'status': 'in_progress',
+            'source': 'en',
+            'languageCode': 'fr',
+        }
+        assert len(callbacks) == 1
+        assert StandInTranslationEngine.calls == []
@@ -1,6 +1,8 @@
 import json
 from copy import deepcopy
 
+from unittest import mock
+
 from django.contrib.auth import get_user_model
 from django.test import TestCase
 
@@ -241,3 +243,31 @@ class TestSubmissionStream(TestCase):
         assert '_supplementalDetails' in output[0]
         assert '_supplementalDetails' in output[1]
         # test other things?
+
+    def test_submission_stream_loads_extras_by_batch(self):
+        submissions = list(
+            self.asset.deployment.get_submissions(user=self.asset.owner)
+        )
+        with mock.patch(
+            'kobo.apps.subsequences.utils.SUPPLEMENTAL_DETAILS_BATCH_SIZE', 1
+        ):
+            # One query per submission
+            with self.assertNumQueries(len(submissions)):
+                output = list(stream_with_extras(submissions, self.asset))
+
+        assert len(output) == len(submissions)
+        for submission in output:
+            assert '_supplementalDetails' in submission
+
+        submission_uuids_with_extras = set(
+            self.asset.submission_extras.values_list(
+                'submission_uuid', flat=True
+            )
+        )
+        assert submission_uuids_with_extras
+        for submission in output:
+            uuid = submission.get('meta/rootUuid', submission['_uuid'])
+            if uuid in submission_uuids_with_extras:
+                assert submission['_supplementalDetails']
+            else:
+                assert submission['_supplementalDetails'] == {}
@@ -1,10 +1,15 @@
-from collections import defaultdict
+from collections import OrderedDict, defaultdict
 from copy import deepcopy
+from itertools import islice
+
+from jsonschema.validators import validator_for
+
 from ..actions.automatic_transcription import AutomaticTranscriptionAction
 from ..actions.translation import TranslationAction
 from ..actions.qual import QualAction
 
 from ..actions.unknown_action import UnknownAction
+from ..constants import GOOGLETS, GOOGLETX
 
 
 AVAILABLE_ACTIONS = (
@@ -97,6 +102,41 @@ def advanced_submission_jsonschema(content, actions, url=None):
         action_instances.append(action_kls(action_params))
     return get_jsonschema(action_instances, url=url)
 
+
+# Number of compiled validators kept in memory by each process
+ADVANCED_SUBMISSION_VALIDATORS_MAX_SIZE = 128
+
+_advanced_submission_validators = OrderedDict()
+
+
+def get_advanced_submission_validator(cache_key, get_schema):
+    """
+    Return the validator compiled from the schema returned by `get_schema()`.
+
+    Validators are kept in memory, indexed by `cache_key` (unless it is
+    `None`), to avoid compiling the same schema on every request. The least
+    recently used ones are dropped when more than
+    `ADVANCED_SUBMISSION_VALIDATORS_MAX_SIZE` are kept.
+    """
+    try:
+        validator = _advanced_submission_validators.pop(cache_key)
+    except KeyError:
+        schema = get_schema()
+        validator_cls = validator_for(schema)
+        validator_cls.check_schema(schema)
+        validator = validator_cls(schema)
+        if cache_key is None:
+            return validator
+        if (
+            len(_advanced_submission_validators)
+            >= ADVANCED_SUBMISSION_VALIDATORS_MAX_SIZE
+        ):
+            _advanced_submission_validators.popitem(last=False)
+
+    _advanced_submission_validators[cache_key] = validator
+    return validator
+
+
 # def _empty_obj():
 #     return {'type': 'object', 'properties': {}, 'additionalProperties': False}
 
@@ -118,12 +158,61 @@ def get_jsonschema(action_instances=(), url=None):
         schema = instance.modify_jsonschema(schema)
     return schema
 
+# Parameters which identify an automatic transcription or translation request
+AUTO_REQUEST_PARAMS = {
+    GOOGLETS: ('languageCode', 'regionCode'),
+    GOOGLETX: ('languageCode',),
+}
+
+
+def remove_duplicate_auto_requests(content, edits):
+    """
+    Return `edits` without the automatic transcriptions and translations
+    already in progress or complete in `content` for the same languages.
+
+    Clients poll a pending request by posting it again; it must not be
+    processed (and billed) once more.
+    """
+    edits = deepcopy(edits)
+    for qpath, vals in edits.items():
+        if not isinstance(vals, dict):
+            continue
+        for key, params in AUTO_REQUEST_PARAMS.items():
+            try:
+                requested = vals[key]
+                stored = content[qpath][key]
+            except (KeyError, TypeError):
+                continue
+            if (
+                requested.get('status') == 'requested'
+                and stored.get('status') in ['in_progress', 'complete']
+                and all(
+                    requested.get(param) == stored.get(param)
+                    for param in params
+                )
+            ):
+                del vals[key]
+    return edits
+
+
 SUPPLEMENTAL_DETAILS_KEY = '_supplementalDetails'
 
+# Number of submissions whose extras are retrieved with a single query
+SUPPLEMENTAL_DETAILS_BATCH_SIZE = 1000
+
+def _batched(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
 def stream_with_extras(submission_stream, asset):
-    extras = dict(
-        asset.submission_extras.values_list('submission_uuid', 'content')
-    )
+    """
+    Add supplemental details to each submission of `submission_stream`.
+
+    Submissions are consumed by batches of `SUPPLEMENTAL_DETAILS_BATCH_SIZE`
+    and only the extras of the submissions of the current batch are loaded,
+    to keep memory usage bounded on large projects.
+    """
     try:
         qual_survey = asset.advanced_features['qual']['qual_survey']
     except KeyError:
@@ -145,11 +234,24 @@ def stream_with_extras(submission_stream, asset):
                 c['uuid']: c for c in choices
             }
         qual_questions_by_uuid[qual_q['uuid']] = qual_q
-    for submission in submission_stream:
-        if SUBMISSION_UUID_FIELD in submission:
-            uuid = submission[SUBMISSION_UUID_FIELD]
-        else:
-            uuid = submission['_uuid']
+    for batch in _batched(submission_stream, SUPPLEMENTAL_DETAILS_BATCH_SIZE):
+        yield from _merge_extras(
+            batch, asset, qual_questions_by_uuid, qual_choices_per_question_by_uuid
+        )
+
+def _merge_extras(
+    submissions, asset, qual_questions_by_uuid, qual_choices_per_question_by_uuid
+):
+    uuids = [
+        submission.get(SUBMISSION_UUID_FIELD, submission.get('_uuid'))
+        for submission in submissions
+    ]
+    extras = dict(
+        asset.submission_extras.filter(submission_uuid__in=uuids).values_list(
+            'submission_uuid', 'content'
+        )
+    )
+    for uuid, submission in zip(uuids, submissions):
         all_supplemental_details = extras.get(uuid, {})
         for qpath, supplemental_details in all_supplemental_details.items():
             try:
@@ -0,0 +1,32 @@
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('trackers', '0005_remove_year_and_month'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MonthlyUsageRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField()),
+                ('submission_count', models.PositiveIntegerField(default=0)),
+                ('total_asr_seconds', models.PositiveIntegerField(default=0)),
+                ('total_mt_characters', models.PositiveIntegerField(default=0)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='monthly_usage_rollups', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['month'], name='trackers_mo_month_05755d_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='monthlyusagerollup',
+            constraint=models.UniqueConstraint(fields=('user', 'month'), name='unique_monthly_usage_rollup'),
+        ),
+    ]
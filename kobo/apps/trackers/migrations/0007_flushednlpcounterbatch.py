@@ -0,0 +1,19 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trackers', '0006_monthlyusagerollup'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FlushedNLPCounterBatch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('token', models.CharField(max_length=32, unique=True)),
+                ('date_created', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+    ]
@@ -53,6 +53,45 @@ class NLPUsageCounter(models.Model):
             )
 
 
+class MonthlyUsageRollup(models.Model):
+    """
+    Usage of a user during a calendar month, summed up from the daily
+    counters once the month is over.
+    See `kobo.apps.trackers.utils.refresh_monthly_usage_rollups()`
+    """
+
+    user = models.ForeignKey(
+        User, related_name='monthly_usage_rollups', on_delete=models.CASCADE
+    )
+    # First day of the month
+    month = models.DateField()
+    submission_count = models.PositiveIntegerField(default=0)
+    total_asr_seconds = models.PositiveIntegerField(default=0)
+    total_mt_characters = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            UniqueConstraint(
+                fields=['user', 'month'], name='unique_monthly_usage_rollup'
+            ),
+        ]
+        indexes = [
+            models.Index(fields=('month',)),
+        ]
+
+
+class FlushedNLPCounterBatch(models.Model):
+    """
+    Batch of buffered NLP usage already written to `NLPUsageCounter`.
+    It is saved in the same transaction as the counters, so that a batch
+    left in Redis by an interrupted flush is not counted twice.
+    See `kobo.apps.trackers.utils.flush_nlp_counters()`
+    """
+
+    token = models.CharField(max_length=32, unique=True)
+    date_created = models.DateTimeField(auto_now_add=True)
+
+
 # signals are fired during cascade deletion (i.e. deletion initiated by the
 # removal of a related object), whereas the `delete()` model method is not
 # called
@@ -0,0 +1,12 @@
+from kobo.celery import celery_app
+from .utils import flush_nlp_counters, refresh_monthly_usage_rollups
+
+
+@celery_app.task(queue='kpi_low_priority_queue')
+def flush_buffered_nlp_counters():
+    flush_nlp_counters()
+
+
+@celery_app.task(queue='kpi_low_priority_queue')
+def refresh_usage_rollups():
+    refresh_monthly_usage_rollups()
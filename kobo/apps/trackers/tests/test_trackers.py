@@ -1,9 +1,21 @@
-from datetime import datetime
+import operator
+from datetime import date, datetime, timedelta
 
 from django.contrib.auth.models import User
+from django.db.models import Q
+from django.test import SimpleTestCase, override_settings
+from django_redis import get_redis_connection
 
-from kobo.apps.trackers.models import NLPUsageCounter
-from kobo.apps.trackers.utils import update_nlp_counter
+from kobo.apps.trackers.models import FlushedNLPCounterBatch, NLPUsageCounter
+from kobo.apps.trackers.utils import (
+    NLP_COUNTERS_BUFFER_KEY,
+    NLP_COUNTERS_FLUSHING_KEY,
+    NLP_COUNTERS_FLUSHING_TOKEN_KEY,
+    _split_usage_period,
+    buffer_nlp_counter,
+    flush_nlp_counters,
+    update_nlp_counter,
+)
 from kpi.models.asset import Asset
 from kpi.tests.kpi_test_case import KpiTestCase
 
@@ -97,3 +109,154 @@ class TrackersTestCases(KpiTestCase):
         )
         assert tracker_two_services.counters[new_service] == initial_amount
         assert tracker_two_services.counters[service] == expected_amount
+
+    def test_buffered_nlp_counters_are_flushed_exactly(self):
+        get_redis_connection().delete(
+            NLP_COUNTERS_BUFFER_KEY, NLP_COUNTERS_FLUSHING_KEY
+        )
+        asset = self._create_asset()
+        deleted_asset = self._create_asset()
+        update_nlp_counter('google_asr_seconds', 10, self.user.id, asset.id)
+
+        for _ in range(3):
+            buffer_nlp_counter('google_asr_seconds', 5, self.user.id, asset.id)
+            buffer_nlp_counter(
+                'google_mt_characters', 100, self.user.id, asset.id
+            )
+        buffer_nlp_counter(
+            'google_mt_characters', 50, self.user.id, deleted_asset.id
+        )
+        deleted_asset.delete()
+
+        # Nothing is written until the buffer is flushed
+        tracker = NLPUsageCounter.objects.get(
+            user_id=self.user.id, asset_id=asset.id
+        )
+        assert tracker.total_asr_seconds == 10
+        assert flush_nlp_counters() == 2
+
+        tracker.refresh_from_db()
+        assert tracker.counters == {
+            'google_asr_seconds': 25,
+            'google_mt_characters': 300,
+        }
+        assert tracker.total_asr_seconds == 25
+        assert tracker.total_mt_characters == 300
+
+        # Usage of deleted projects goes to the counter without asset
+        tracker_no_asset = NLPUsageCounter.objects.get(
+            user_id=self.user.id, asset_id=None
+        )
+        assert tracker_no_asset.counters == {'google_mt_characters': 50}
+        assert tracker_no_asset.total_mt_characters == 50
+
+        # Flushing again does not count increments twice
+        assert flush_nlp_counters() == 0
+        tracker.refresh_from_db()
+        assert tracker.total_asr_seconds == 25
+
+    def test_interrupted_flush_does_not_count_twice(self):
+        redis_client = get_redis_connection()
+        redis_client.delete(
+            NLP_COUNTERS_BUFFER_KEY,
+            NLP_COUNTERS_FLUSHING_KEY,
+            NLP_COUNTERS_FLUSHING_TOKEN_KEY,
+        )
+        asset = self._create_asset()
+        buffer_nlp_counter('google_asr_seconds', 5, self.user.id, asset.id)
+        batch = redis_client.hgetall(NLP_COUNTERS_BUFFER_KEY)
+        assert flush_nlp_counters() == 1
+
+        # Simulate a crash after the counters were committed, but before the
+        # batch was removed from Redis
+        redis_client.hset(NLP_COUNTERS_FLUSHING_KEY, mapping=batch)
+        redis_client.set(
+            NLP_COUNTERS_FLUSHING_TOKEN_KEY,
+            FlushedNLPCounterBatch.objects.get().token,
+        )
+        assert flush_nlp_counters() == 0
+        assert not redis_client.exists(NLP_COUNTERS_FLUSHING_KEY)
+        tracker = NLPUsageCounter.objects.get(
+            user_id=self.user.id, asset_id=asset.id
+        )
+        assert tracker.total_asr_seconds == 5
+
+        # The next batch is written
+        buffer_nlp_counter('google_asr_seconds', 5, self.user.id, asset.id)
+        assert flush_nlp_counters() == 1
+        tracker.refresh_from_db()
+        assert tracker.total_asr_seconds == 10
+
+    @override_settings(
+        CACHES={
+            'default': {
+                'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'
+            }
+        }
+    )
+    def test_nlp_counters_are_not_buffered_without_redis(self):
+        asset = self._create_asset()
+        buffer_nlp_counter('google_asr_seconds', 5, self.user.id, asset.id)
+        tracker = NLPUsageCounter.objects.get(
+            user_id=self.user.id, asset_id=asset.id
+        )
+        assert tracker.counters == {'google_asr_seconds': 5}
+        assert tracker.total_asr_seconds == 5
+        assert flush_nlp_counters() == 0
+
+
+class UsagePeriodTestCase(SimpleTestCase):
+
+    LOOKUPS = {
+        'gte': operator.ge,
+        'lt': operator.lt,
+        'lte': operator.le,
+        'range': lambda value, bounds: bounds[0] <= value <= bounds[1],
+    }
+    TODAY = date(2024, 5, 20)
+    # March 2024 is the last month rolled up
+    FIRST_MONTH_NOT_ROLLED_UP = date(2024, 4, 1)
+
+    def _matches(self, q: Q, **values) -> bool:
+        results = []
+        for child in q.children:
+            if isinstance(child, Q):
+                results.append(self._matches(child, **values))
+                continue
+            lookup, expected = child
+            field, lookup_type = lookup.split('__')
+            results.append(
+                self.LOOKUPS[lookup_type](values[field], expected)
+            )
+        return any(results) if q.connector == Q.OR else all(results)
+
+    def _assert_days_counted_once(self, start_date: date):
+        rollup_filter, daily_filter = _split_usage_period(
+            start_date, self.FIRST_MONTH_NOT_ROLLED_UP, self.TODAY
+        )
+        day = date(2023, 12, 1)
+        while day <= self.TODAY:
+            month = day.replace(day=1)
+            count = int(self._matches(daily_filter, date=day))
+            if month < self.FIRST_MONTH_NOT_ROLLED_UP:
+                # Days of rolled up months are counted by their rollup
+                count += int(self._matches(rollup_filter, month=month))
+            expected_count = 1 if day >= start_date else 0
+            assert count == expected_count, (
+                f'{day} counted {count} times instead of {expected_count}'
+            )
+            day += timedelta(days=1)
+
+    def test_period_starts_mid_month_before_last_rolled_up_month(self):
+        self._assert_days_counted_once(date(2024, 1, 15))
+
+    def test_period_starts_mid_month_during_last_rolled_up_month(self):
+        self._assert_days_counted_once(date(2024, 3, 10))
+
+    def test_period_starts_mid_month_after_last_rolled_up_month(self):
+        self._assert_days_counted_once(date(2024, 4, 10))
+        self._assert_days_counted_once(date(2024, 5, 2))
+
+    def test_period_starts_on_first_day_of_month(self):
+        self._assert_days_counted_once(date(2024, 2, 1))
+        self._assert_days_counted_once(date(2024, 4, 1))
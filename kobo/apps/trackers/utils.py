@@ -1,11 +1,28 @@
+import json
+import uuid
+from collections import defaultdict
+from datetime import date, timedelta
 from typing import Optional
 
+from dateutil.relativedelta import relativedelta
 from django.apps import apps
-from django.db.models import F
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.db.models import F, Max, Min, Q, Sum
+from django.db.models.functions import Coalesce
 from django.utils import timezone
+from django_redis import get_redis_connection
+from redis.exceptions import ResponseError
 
 from kpi.utils.django_orm_helper import IncrementValue
 
+# Redis hash which collects the increments of `buffer_nlp_counter()`
+NLP_COUNTERS_BUFFER_KEY = 'nlp_usage_counters:buffer'
+NLP_COUNTERS_FLUSHING_KEY = f'{NLP_COUNTERS_BUFFER_KEY}:flushing'
+# Identifies the batch being flushed, see `FlushedNLPCounterBatch`
+NLP_COUNTERS_FLUSHING_TOKEN_KEY = f'{NLP_COUNTERS_FLUSHING_KEY}:token'
+
 
 def update_nlp_counter(
     service: str,
@@ -51,3 +68,439 @@ def update_nlp_counter(
         counters=IncrementValue('counters', keyname=service, increment=amount),
         **kwargs,
     )
+
+
+def buffer_nlp_counter(
+    service: str,
+    amount: int,
+    user_id: int,
+    asset_id: Optional[int] = None,
+):
+    """
+    Same as `update_nlp_counter()`, but the increment is only collected in
+    Redis. Buffered increments are written by `flush_nlp_counters()`, which
+    runs periodically, to avoid contention on the daily counter row of busy
+    projects.
+    When the cache is not backed by Redis, the counter is updated right away.
+    """
+    try:
+        redis_client = get_redis_connection()
+    except NotImplementedError:
+        update_nlp_counter(service, amount, user_id, asset_id)
+        return
+
+    date = timezone.now().date()
+    field = f"{date.isoformat()}:{user_id}:{asset_id or ''}:{service}"
+    redis_client.hincrby(NLP_COUNTERS_BUFFER_KEY, field, amount)
+
+
+def flush_nlp_counters() -> int:
+    """
+    Write the increments collected by `buffer_nlp_counter()` with one upsert
+    per (date, user, asset) and return the number of counters updated.
+    """
+    # Avoid circular import
+    FlushedNLPCounterBatch = apps.get_model(  # noqa
+        'trackers', 'FlushedNLPCounterBatch'
+    )
+
+    try:
+        redis_client = get_redis_connection()
+    except NotImplementedError:
+        # Nothing is buffered without Redis, see `buffer_nlp_counter()`
+        return 0
+
+    lock = redis_client.lock(
+        f'{NLP_COUNTERS_BUFFER_KEY}:lock',
+        timeout=settings.CELERY_TASK_TIME_LIMIT,
+    )
+    if not lock.acquire(blocking=False):
+        # Another worker is already flushing
+        return 0
+
+    try:
+        # Increments received from now on are collected in a new buffer.
+        # A batch left by an interrupted flush is written first.
+        if not redis_client.exists(NLP_COUNTERS_FLUSHING_KEY):
+            try:
+                redis_client.rename(
+                    NLP_COUNTERS_BUFFER_KEY, NLP_COUNTERS_FLUSHING_KEY
+                )
+            except ResponseError:
+                # Nothing has been buffered
+                return 0
+
+        if batch_token := redis_client.get(NLP_COUNTERS_FLUSHING_TOKEN_KEY):
+            batch_token = batch_token.decode()
+        else:
+            batch_token = uuid.uuid4().hex
+            redis_client.set(NLP_COUNTERS_FLUSHING_TOKEN_KEY, batch_token)
+
+        counters = _get_buffered_nlp_counters(
+            redis_client.hgetall(NLP_COUNTERS_FLUSHING_KEY)
+        )
+        with transaction.atomic():
+            # The batch has already been written if the previous flush was
+            # interrupted before removing it from Redis
+            _, created = FlushedNLPCounterBatch.objects.get_or_create(
+                token=batch_token
+            )
+            if created:
+                _upsert_nlp_counters(counters)
+            else:
+                counters = {}
+        redis_client.delete(
+            NLP_COUNTERS_FLUSHING_KEY, NLP_COUNTERS_FLUSHING_TOKEN_KEY
+        )
+        FlushedNLPCounterBatch.objects.filter(
+            date_created__lt=timezone.now() - timedelta(days=1)
+        ).delete()
+    finally:
+        lock.release()
+
+    return len(counters)
+
+
+def _get_buffered_nlp_counters(buffered_increments: dict) -> dict:
+    # Avoid circular import
+    Asset = apps.get_model('kpi', 'Asset')  # noqa
+
+    increments_by_counter = defaultdict(lambda: defaultdict(int))
+    for field, amount in buffered_increments.items():
+        date, user_id, asset_id, service = field.decode().split(':', 3)
+        counter_key = (date, int(user_id), int(asset_id) if asset_id else None)
+        increments_by_counter[counter_key][service] += int(amount)
+
+    # Like `NLPUsageCounter.update_catch_all_counters_on_delete()`, usage of
+    # projects deleted in the meantime is added to the counter without asset
+    asset_ids = {asset_id for _, _, asset_id in increments_by_counter}
+    existing_asset_ids = set(
+        Asset.all_objects.filter(pk__in=asset_ids).values_list(
+            'pk', flat=True
+        )
+    )
+    counters = defaultdict(lambda: defaultdict(int))
+    for (date, user_id, asset_id), increments in increments_by_counter.items():
+        if asset_id not in existing_asset_ids:
+            asset_id = None
+        for service, amount in increments.items():
+            counters[(date, user_id, asset_id)][service] += amount
+
+    return counters
+
+
+def _upsert_nlp_counters(counters: dict):
+    # Avoid circular import
+    NLPUsageCounter = apps.get_model('trackers', 'NLPUsageCounter')  # noqa
+
+    existing_user_ids = set(
+        User.objects.filter(
+            pk__in={user_id for _, user_id, _ in counters}
+        ).values_list('pk', flat=True)
+    )
+    rows = {True: [], False: []}
+    for (date, user_id, asset_id), increments in counters.items():
+        # Usage of deleted users is deleted along with their counters
+        if user_id not in existing_user_ids:
+            continue
+        total_asr_seconds = sum(
+            amount
+            for service, amount in increments.items()
+            if service.endswith('asr_seconds')
+        )
+        total_mt_characters = sum(
+            amount
+            for service, amount in increments.items()
+            if service.endswith('mt_characters')
+        )
+        rows[asset_id is not None].append(
+            (
+                date,
+                user_id,
+                asset_id,
+                json.dumps(increments),
+                total_asr_seconds,
+                total_mt_characters,
+            )
+        )
+
+    # Counters without asset are unique on (date, user) only, see
+    # `NLPUsageCounter.Meta.constraints`
+    conflict_targets = {
+        True: '(date, user_id, asset_id)',
+        False: '(date, user_id) WHERE asset_id IS NULL',
+    }
+    table = NLPUsageCounter._meta.db_table
+    with connection.cursor() as cursor:
+        for with_asset, values in rows.items():
+            if not values:
+                continue
+            placeholders = ', '.join(
+                ['(%s, %s, %s, %s::jsonb, %s, %s)'] * len(values)
+            )
+            cursor.execute(
+                f"""
+                INSERT INTO {table} AS counter (
+                    date, user_id, asset_id, counters, total_asr_seconds,
+                    total_mt_characters
+                )
+                VALUES {placeholders}
+                ON CONFLICT {conflict_targets[with_asset]} DO UPDATE SET
+                    counters = (
+                        SELECT jsonb_object_agg(
+                            service,
+                            COALESCE((counter.counters ->> service)::int, 0)
+                            + COALESCE((EXCLUDED.counters ->> service)::int, 0)
+                        )
+                        FROM jsonb_object_keys(
+                            counter.counters || EXCLUDED.counters
+                        ) AS service
+                    ),
+                    total_asr_seconds = (
+                        counter.total_asr_seconds + EXCLUDED.total_asr_seconds
+                    ),
+                    total_mt_characters = (
+                        counter.total_mt_characters
+                        + EXCLUDED.total_mt_characters
+                    )
+                """,
+                [param for row in values for param in row],
+            )
+
+
+def get_usage_totals(
+    user_filter: Q,
+    start_dates: dict[str, Optional[date]],
+    kobocat_user_filter: Optional[Q] = None,
+) -> dict:
+    """
+    Return the submission count, ASR seconds and MT characters of the users
+    matching `user_filter` since each date of `start_dates` (`None` means all
+    time), per key of `start_dates`.
+    Submission counters are stored in KoBoCAT database, they are filtered
+    with `kobocat_user_filter` when `user_filter` contains subqueries on KPI
+    tables.
+
+    Months already summed up by `refresh_monthly_usage_rollups()` are read
+    from their rollups, and only the other days from the daily counters.
+    """
+    # Avoid circular import
+    from kpi.deployment_backends.kc_access.shadow_models import (
+        KobocatDailyXFormSubmissionCounter,
+    )
+    MonthlyUsageRollup = apps.get_model('trackers', 'MonthlyUsageRollup')  # noqa
+    NLPUsageCounter = apps.get_model('trackers', 'NLPUsageCounter')  # noqa
+
+    today = timezone.now().date()
+    # Rollups are created month after month, all the ones before the last
+    # rolled up month exist too
+    last_rolled_up_month = MonthlyUsageRollup.objects.aggregate(
+        month=Max('month')
+    )['month']
+    first_month_not_rolled_up = (
+        last_rolled_up_month + relativedelta(months=1)
+        if last_rolled_up_month
+        else None
+    )
+
+    rollup_aggregates = {}
+    daily_submission_aggregates = {}
+    daily_nlp_aggregates = {}
+    daily_filters = Q()
+    for name, start_date in start_dates.items():
+        rollup_filter, daily_filter = _split_usage_period(
+            start_date, first_month_not_rolled_up, today
+        )
+        daily_filters |= daily_filter
+        daily_submission_aggregates[f'{name}_submission_count'] = Coalesce(
+            Sum('counter', filter=daily_filter), 0
+        )
+        for field in ['total_asr_seconds', 'total_mt_characters']:
+            daily_nlp_aggregates[f'{name}_{field}'] = Coalesce(
+                Sum(field, filter=daily_filter), 0
+            )
+        if rollup_filter is not None:
+            for field in [
+                'submission_count',
+                'total_asr_seconds',
+                'total_mt_characters',
+            ]:
+                rollup_aggregates[f'{name}_{field}'] = Coalesce(
+                    Sum(field, filter=rollup_filter), 0
+                )
+
+    if kobocat_user_filter is None:
+        kobocat_user_filter = user_filter
+
+    totals = defaultdict(int)
+    usage_querysets = [
+        (
+            KobocatDailyXFormSubmissionCounter.objects.filter(
+                daily_filters, kobocat_user_filter
+            ),
+            daily_submission_aggregates,
+        ),
+        (
+            NLPUsageCounter.objects.filter(daily_filters, user_filter),
+            daily_nlp_aggregates,
+        ),
+    ]
+    if rollup_aggregates:
+        usage_querysets.append(
+            (MonthlyUsageRollup.objects.filter(user_filter), rollup_aggregates)
+        )
+    for queryset, aggregates in usage_querysets:
+        usage = queryset.aggregate(**aggregates)
+        for key, value in usage.items():
+            totals[key] += value or 0
+
+    return {
+        name: {
+            'submission_count': totals[f'{name}_submission_count'],
+            'asr_seconds': totals[f'{name}_total_asr_seconds'],
+            'mt_characters': totals[f'{name}_total_mt_characters'],
+        }
+        for name in start_dates
+    }
+
+
+def refresh_monthly_usage_rollups(
+    since: Optional[date] = None, user_ids: Optional[list[int]] = None
+) -> int:
+    """
+    Sum up the daily counters of each month over, since the month of `since`,
+    into `MonthlyUsageRollup` and return the number of rollups saved.
+
+    By default, it starts from the last month already rolled up, to catch
+    usage counted late, e.g. buffered NLP usage.
+
+    If `user_ids` is provided, only the rollups of these users are refreshed,
+    e.g. when counters have been moved from a user to another. Months which
+    have not been rolled up yet are then left out, because rollups of the
+    other users do not exist for them.
+    """
+    # Avoid circular import
+    from kpi.deployment_backends.kc_access.shadow_models import (
+        KobocatDailyXFormSubmissionCounter,
+    )
+    MonthlyUsageRollup = apps.get_model('trackers', 'MonthlyUsageRollup')  # noqa
+    NLPUsageCounter = apps.get_model('trackers', 'NLPUsageCounter')  # noqa
+
+    last_rolled_up_month = MonthlyUsageRollup.objects.aggregate(
+        month=Max('month')
+    )['month']
+    end_month = timezone.now().date().replace(day=1)
+    user_filter = Q()
+    if user_ids is not None:
+        if last_rolled_up_month is None:
+            return 0
+        end_month = last_rolled_up_month + relativedelta(months=1)
+        user_filter = Q(user_id__in=user_ids)
+
+    if since is None:
+        since = last_rolled_up_month
+    if since is None:
+        # Nothing has been rolled up yet, start from the oldest usage
+        oldest_dates = [
+            model.objects.aggregate(date=Min('date'))['date']
+            for model in [KobocatDailyXFormSubmissionCounter, NLPUsageCounter]
+        ]
+        if not (oldest_dates := [d for d in oldest_dates if d]):
+            return 0
+        since = min(oldest_dates)
+
+    month = since.replace(day=1)
+    saved = 0
+    while month < end_month:
+        next_month = month + relativedelta(months=1)
+        date_filter = Q(date__gte=month, date__lt=next_month)
+        usage_per_user = defaultdict(dict)
+        for record in (
+            KobocatDailyXFormSubmissionCounter.objects.filter(
+                date_filter, user_filter, user__isnull=False
+            )
+            .values('user_id')
+            .annotate(submission_count=Sum('counter'))
+            .order_by()
+        ):
+            usage_per_user[record.pop('user_id')].update(record)
+        for record in (
+            NLPUsageCounter.objects.filter(date_filter, user_filter)
+            .values('user_id')
+            .annotate(
+                total_asr_seconds=Sum('total_asr_seconds'),
+                total_mt_characters=Sum('total_mt_characters'),
+            )
+            .order_by()
+        ):
+            usage_per_user[record.pop('user_id')].update(record)
+
+        # KoBoCAT counters of deleted users may remain
+        existing_user_ids = set(
+            User.objects.filter(pk__in=usage_per_user).values_list(
+                'pk', flat=True
+            )
+        )
+        rollups = [
+            MonthlyUsageRollup(user_id=user_id, month=month, **usage)
+            for user_id, usage in usage_per_user.items()
+            if user_id in existing_user_ids
+        ]
+        with transaction.atomic():
+            # Users may have no usage anymore, e.g. after a project transfer
+            MonthlyUsageRollup.objects.filter(user_filter, month=month).exclude(
+                user_id__in=existing_user_ids
+            ).delete()
+            MonthlyUsageRollup.objects.bulk_create(
+                rollups,
+                batch_size=1000,
+                update_conflicts=True,
+                unique_fields=['user', 'month'],
+                update_fields=[
+                    'submission_count',
+                    'total_asr_seconds',
+                    'total_mt_characters',
+                ],
+            )
+        saved += len(rollups)
+        month = next_month
+
+    return saved
+
+
+def _split_usage_period(
+    start_date: Optional[date],
+    first_month_not_rolled_up: Optional[date],
+    today: date,
+) -> tuple[Optional[Q], Q]:
+    """
+    Return the filters on the rollups and on the daily counters which cover
+    the period from `start_date` to `today`.
+    Only whole months can be read from rollups, thus the days of the first
+    month are read from the daily counters when the period starts mid-month.
+    """
+    if first_month_not_rolled_up is None:
+        if start_date:
+            return None, Q(date__range=[start_date, today])
+        return None, Q(date__lte=today)
+
+    if start_date is None:
+        return (
+            Q(month__lt=first_month_not_rolled_up),
+            Q(date__range=[first_month_not_rolled_up, today]),
+        )
+
+    first_whole_month = start_date
+    if start_date.day != 1:
+        first_whole_month = start_date.replace(day=1) + relativedelta(
+            months=1
+        )
+    rollup_filter = Q(
+        month__gte=first_whole_month, month__lt=first_month_not_rolled_up
+    )
+    daily_filter = Q(
+        date__range=[max(start_date, first_month_not_rolled_up), today]
+    )
+    if start_date < first_whole_month <= first_month_not_rolled_up:
+        daily_filter |= Q(date__gte=start_date, date__lt=first_whole_month)
+    return rollup_filter, daily_filter
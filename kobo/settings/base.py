@@ -791,6 +791,51 @@ CAN_LOGIN_AS = lambda request, target_user: request.user.is_superuser
 # endpoint. This overrides any `?limit=` query parameter sent by a client
 SUBMISSION_LIST_LIMIT = 30000
 
+# How the submission list endpoint counts matching submissions:
+# - `exact`: count documents in MongoDB on every request
+# - `fast`: use KoBoCAT counter when no filters are applied, and cache counts
+#   of filtered requests for `SUBMISSION_COUNT_CACHE_TIMEOUT` seconds (or until
+#   submissions are written through KPI)
+SUBMISSION_COUNT_STRATEGY = env.str('SUBMISSION_COUNT_STRATEGY', 'exact')
+SUBMISSION_COUNT_CACHE_TIMEOUT = env.int(
+    'SUBMISSION_COUNT_CACHE_TIMEOUT', 60 * 5
+)  # seconds
+
+# How long to retain the date of the latest edit of submissions made outside
+# KPI (e.g. through Enketo), which voids cached reports and paired data
+SUBMISSION_EDIT_TIME_CACHE_TIMEOUT = env.int(
+    'SUBMISSION_EDIT_TIME_CACHE_TIMEOUT', 60
+)  # seconds
+
+# Number of submissions sent concurrently to KoBoCAT by a bulk update
+SUBMISSION_BULK_UPDATE_MAX_WORKERS = env.int(
+    'SUBMISSION_BULK_UPDATE_MAX_WORKERS', 5
+)
+# Bulk updates of more submissions than this are run in background by Celery
+SUBMISSION_BULK_UPDATE_ASYNC_THRESHOLD = env.int(
+    'SUBMISSION_BULK_UPDATE_ASYNC_THRESHOLD', 500
+)
+# How long the progress of a background bulk update can be retrieved
+SUBMISSION_BULK_UPDATE_PROGRESS_TIMEOUT = env.int(
+    'SUBMISSION_BULK_UPDATE_PROGRESS_TIMEOUT', 60 * 60 * 24
+)  # seconds
+
+# Inherited permissions of collections with more descendants than this are
+# recalculated in background by Celery
+PERMISSIONS_RECALCULATION_ASYNC_THRESHOLD = env.int(
+    'PERMISSIONS_RECALCULATION_ASYNC_THRESHOLD', 1000
+)
+# Number of descendants whose inherited permissions are replaced at once
+PERMISSIONS_RECALCULATION_BATCH_SIZE = 1000
+# How long the progress of a background recalculation can be retrieved
+PERMISSIONS_RECALCULATION_PROGRESS_TIMEOUT = 60 * 60 * 24  # seconds
+# How long to retain permissions of assets and users in the shared cache.
+# Cached permissions are invalidated as soon as they change, set to 0 to
+# disable the shared cache
+PERMISSIONS_CACHE_TIMEOUT = env.int(
+    'PERMISSIONS_CACHE_TIMEOUT', 60 * 60 * 24
+)  # 1 day
+
 # uWSGI, NGINX, etc. allow only a limited amount of time to process a request.
 # Set this value to match their limits
 SYNCHRONOUS_REQUEST_TIME_LIMIT = 120  # seconds
@@ -934,6 +979,19 @@ KOBOCAT_OLD_URL = os.environ.get('KOBOCAT_OLD_URL')
 KOBOCAT_INTERNAL_URL = os.environ.get('KOBOCAT_INTERNAL_URL',
                                       'http://kobocat')
 
+# Persistent connections to KoBoCAT.
+# See `kpi.deployment_backends.kc_access.http_client.KobocatHttpClient`
+KOBOCAT_HTTP_POOL_CONNECTIONS = env.int('KOBOCAT_HTTP_POOL_CONNECTIONS', 2)
+KOBOCAT_HTTP_POOL_MAXSIZE = env.int('KOBOCAT_HTTP_POOL_MAXSIZE', 10)
+KOBOCAT_HTTP_MAX_RETRIES = env.int('KOBOCAT_HTTP_MAX_RETRIES', 3)
+KOBOCAT_HTTP_BACKOFF_FACTOR = env.float('KOBOCAT_HTTP_BACKOFF_FACTOR', 0.5)
+KOBOCAT_HTTP_CONNECT_TIMEOUT = env.float(
+    'KOBOCAT_HTTP_CONNECT_TIMEOUT', 5
+)  # seconds
+KOBOCAT_HTTP_READ_TIMEOUT = env.float(
+    'KOBOCAT_HTTP_READ_TIMEOUT', SYNCHRONOUS_REQUEST_TIME_LIMIT
+)  # seconds
+
 KOBOFORM_URL = os.environ.get('KOBOFORM_URL', 'http://kpi')
 
 if 'KOBOCAT_URL' in os.environ:
@@ -1109,6 +1167,19 @@ CELERY_BEAT_SCHEDULE = {
         'schedule': crontab(minute=0, hour=0),
         'options': {'queue': 'kpi_low_priority_queue'}
     },
+    # Schedule every minute
+    'flush-buffered-nlp-counters': {
+        'task': 'kobo.apps.trackers.tasks.flush_buffered_nlp_counters',
+        'schedule': crontab(minute='*'),
+        'options': {'queue': 'kpi_low_priority_queue'}
+    },
+    # Schedule every day at 1:00 AM UTC, once buffered usage of the previous
+    # day has been flushed
+    'refresh-usage-rollups': {
+        'task': 'kobo.apps.trackers.tasks.refresh_usage_rollups',
+        'schedule': crontab(minute=0, hour=1),
+        'options': {'queue': 'kpi_low_priority_queue'}
+    },
 }
 
 CELERY_BROKER_TRANSPORT_OPTIONS = {
@@ -1269,6 +1340,24 @@ else:
 # Not fully supported as a generic storage backend
 GS_BUCKET_NAME = env.str('GS_BUCKET_NAME', None)
 
+# Engines used by Celery to process automatic transcriptions (ASR) and
+# translations (MT) requested on submissions
+ASR_MT_TRANSCRIPTION_ENGINE = (
+    'kobo.apps.subsequences.integrations.google.google_transcribe.'
+    'GoogleTranscribeEngine'
+)
+ASR_MT_TRANSLATION_ENGINE = (
+    'kobo.apps.subsequences.integrations.google.google_translate.'
+    'GoogleTranslationEngine'
+)
+# Maximum number of jobs sent at once to each engine. Other jobs wait in the
+# Celery queue and are retried after `ASR_MT_ENGINE_RETRY_DELAY` seconds
+ASR_MT_ENGINE_CONCURRENCY = {
+    'transcription': env.int('ASR_MT_TRANSCRIPTION_CONCURRENCY', 10),
+    'translation': env.int('ASR_MT_TRANSLATION_CONCURRENCY', 10),
+}
+ASR_MT_ENGINE_RETRY_DELAY = 10  # seconds
+
 
 ''' Django error logging configuration '''
 LOGGING = {
@@ -1452,6 +1541,25 @@ CACHES = {
 # How long to retain cached responses for kpi endpoints
 ENDPOINT_CACHE_DURATION = env.int('ENDPOINT_CACHE_DURATION', 60 * 15)  # 15 minutes
 
+# How long to retain compiled formpack schemas of asset versions. Least
+# recently used entries are evicted first when the cache is full (Redis must
+# be configured with `maxmemory-policy allkeys-lru`)
+FORMPACK_SCHEMA_CACHE_TIMEOUT = env.int(
+    'FORMPACK_SCHEMA_CACHE_TIMEOUT', 60 * 60 * 24 * 7
+)  # 7 days
+
+# How long to retain XForms compiled from asset snapshot sources. Least
+# recently used entries are evicted first when the cache is full
+XFORM_CACHE_TIMEOUT = env.int(
+    'XFORM_CACHE_TIMEOUT', 60 * 60 * 24 * 7
+)  # 7 days
+
+# How long to retain report statistics. They are recomputed as soon as
+# submissions are added or deleted, or edited through KPI
+REPORT_DATA_CACHE_TIMEOUT = env.int(
+    'REPORT_DATA_CACHE_TIMEOUT', 60 * 60 * 24
+)  # 1 day
+
 ENV = None
 
 # The maximum size in bytes that a request body may be before a
@@ -1468,6 +1576,9 @@ OPEN_ROSA_DEFAULT_CONTENT_LENGTH = 10000000
 # Expiration time in sec. after which paired data xml file must be regenerated
 # Should match KoBoCAT setting
 PAIRED_DATA_EXPIRATION = 300  # seconds
+# Delay before paired data files are synchronized with KoBoCAT after an asset
+# has been saved. All saves within that delay trigger only one synchronization
+PAIRED_DATA_SYNC_DELAY = 30  # seconds
 
 # Minimum size (in bytes) of files to allow fast calculation of hashes
 # Should match KoBoCAT setting
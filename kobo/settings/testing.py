@@ -25,6 +25,10 @@ ENV = 'testing'
 # Run all Celery tasks synchronously during testing
 CELERY_TASK_ALWAYS_EAGER = True
 
+# Permissions are rolled back at the end of each test but not the shared
+# cache, which would serve stale permissions to the next tests
+PERMISSIONS_CACHE_TIMEOUT = 0
+
 
 MONGO_CONNECTION_URL = 'mongodb://fakehost/formhub_test'
 mongo_client = MockMongoClient(
@@ -2,6 +2,9 @@
 SUBMISSION_FORMAT_TYPE_XML = "xml"
 SUBMISSION_FORMAT_TYPE_JSON = "json"
 
+SUBMISSION_COUNT_STRATEGY_EXACT = 'exact'
+SUBMISSION_COUNT_STRATEGY_FAST = 'fast'
+
 GEO_QUESTION_TYPES = ('geopoint', 'geotrace', 'geoshape')
 ATTACHMENT_QUESTION_TYPES = (
     'audit',
@@ -7,23 +7,28 @@ import datetime
 import json
 import os
 import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import date
 from contextlib import contextmanager
 from typing import Union, Iterator, Optional
 
 from bson import json_util
 from django.conf import settings
+from django.core.cache import cache
 from django.core.files.storage import default_storage
+from django.db import connections
 from django.db.models.query import QuerySet
 from django.utils import timezone
 from django.utils.translation import gettext_lazy as t
 from django.core.exceptions import PermissionDenied
-from rest_framework import serializers
+from rest_framework import serializers, status
 from rest_framework.reverse import reverse
 from rest_framework.pagination import _positive_int as positive_int
 from shortuuid import ShortUUID
 
 from kpi.constants import (
+    SUBMISSION_COUNT_STRATEGY_FAST,
     SUBMISSION_FORMAT_TYPE_XML,
     SUBMISSION_FORMAT_TYPE_JSON,
     PERM_CHANGE_SUBMISSIONS,
@@ -34,6 +39,8 @@ from kpi.exceptions import BulkUpdateSubmissionsClientException
 from kpi.models.asset_file import AssetFile
 from kpi.models.paired_data import PairedData
 from kpi.utils.django_orm_helper import UpdateJSONFieldAttributes
+from kpi.utils.log import logging
+from kpi.utils.mongo_helper import MongoHelper
 from kpi.utils.submission import get_attachment_filenames_and_xpaths
 from kpi.utils.xml import (
     edit_submission_xml,
@@ -53,6 +60,10 @@ class BaseDeploymentBackend(abc.ABC):
         'meta',
     ]
 
+    BULK_UPDATE_STATUS_PROCESSING = 'processing'
+    BULK_UPDATE_STATUS_COMPLETE = 'complete'
+    BULK_UPDATE_STATUS_ERROR = 'error'
+
     # XPaths are relative to the root node
     SUBMISSION_CURRENT_UUID_XPATH = 'meta/instanceID'
     SUBMISSION_DEPRECATED_UUID_XPATH = 'meta/deprecatedID'
@@ -60,8 +71,9 @@ class BaseDeploymentBackend(abc.ABC):
 
     def __init__(self, asset):
         self.asset = asset
-        # Python-only attribute used by `kpi.views.v2.data.DataViewSet.list()`
+        # Python-only attributes used by `kpi.views.v2.data.DataViewSet.list()`
         self.current_submission_count = 0
+        self.current_submission_count_is_exact = True
         self.__stored_data_key = None
 
     @property
@@ -86,7 +98,7 @@ class BaseDeploymentBackend(abc.ABC):
         pass
 
     def bulk_update_submissions(
-        self, data: dict, user: 'auth.User'
+        self, data: dict, user: 'auth.User', task_uid: Optional[str] = None
     ) -> dict:
         """
         Allows for bulk updating (bulk editing) of submissions. A
@@ -96,14 +108,23 @@ class BaseDeploymentBackend(abc.ABC):
         submission's XML tree, or the existing value is replaced by the updated
         value.
 
+        Submissions are sent to the back end concurrently (see
+        `settings.SUBMISSION_BULK_UPDATE_MAX_WORKERS`). When more than
+        `settings.SUBMISSION_BULK_UPDATE_ASYNC_THRESHOLD` submissions match,
+        the update is delegated to Celery and its progress can be retrieved
+        with `get_bulk_update_submissions_progress()`.
+
         Args:
             data (dict): must contain a list of `submission_ids` and at
                 least one other key:value field for updating the submissions
             user (User)
+            task_uid (str): identifier of the background task, if any. The
+                update is always run synchronously when it is provided.
 
         Returns:
             dict: formatted dict to be passed to a Response object
         """
+        original_data = copy.deepcopy(data)
         submission_ids = self.validate_access_with_partial_perms(
             user=user,
             perm=PERM_CHANGE_SUBMISSIONS,
@@ -132,6 +153,15 @@ class BaseDeploymentBackend(abc.ABC):
                 detail=t('No submissions match the given `submission_ids`')
             )
 
+        if (
+            task_uid is None
+            and self.current_submission_count
+            > settings.SUBMISSION_BULK_UPDATE_ASYNC_THRESHOLD
+        ):
+            return self._bulk_update_submissions_in_background(
+                original_data, user
+            )
+
         # Remove potentially destructive keys from the payload
         update_data = copy.deepcopy(data['data'])
         update_data = {
@@ -144,46 +174,39 @@ class BaseDeploymentBackend(abc.ABC):
             )
         }
 
-        kc_responses = []
-        for submission in submissions:
-            xml_parsed = fromstring_preserve_root_xmlns(submission)
-
-            _uuid, uuid_formatted = self.generate_new_instance_id()
-
-            # Updating xml fields for submission. In order to update an existing
-            # submission, the current `instanceID` must be moved to the value
-            # for `deprecatedID`.
-            instance_id = get_or_create_element(
-                xml_parsed, self.SUBMISSION_CURRENT_UUID_XPATH
-            )
-            # If the submission has been edited before, it will already contain
-            # a deprecatedID element - otherwise create a new element
-            deprecated_id = get_or_create_element(
-                xml_parsed, self.SUBMISSION_DEPRECATED_UUID_XPATH
-            )
-            deprecated_id.text = instance_id.text
-            instance_id.text = uuid_formatted
-
-            # If the form has been updated with new fields and earlier
-            # submissions have been selected as part of the bulk update,
-            # a new element has to be created before a value can be set.
-            # However, with this new power, arbitrary fields can be added
-            # to the XML tree through the API.
-            for path, value in update_data.items():
-                edit_submission_xml(xml_parsed, path, value)
-
-            kc_response = self.store_submission(
-                user, xml_tostring(xml_parsed), _uuid
-            )
-            kc_responses.append(
-                {
-                    'uuid': _uuid,
-                    'response': kc_response,
-                }
+        kc_responses = self._store_bulk_updated_submissions(
+            submissions, update_data, user, task_uid
+        )
+        response = self.prepare_bulk_update_response(kc_responses)
+        if task_uid:
+            self.set_bulk_update_progress(
+                task_uid,
+                user,
+                status=self.BULK_UPDATE_STATUS_COMPLETE,
+                processed=len(kc_responses),
+                result=response['data'],
             )
+        return response
 
-        return self.prepare_bulk_update_response(kc_responses)
+    def get_bulk_update_submissions_progress(
+        self, task_uid: str, user: 'auth.User'
+    ) -> Optional[dict]:
+        """
+        Return the progress of a bulk update run in background by `user`, or
+        `None` if it does not exist (or has expired).
+        """
+        progress = cache.get(self._get_bulk_update_cache_key(task_uid))
+        if (
+            not progress
+            or progress['asset_uid'] != self.asset.uid
+            or progress['user_id'] != user.pk
+        ):
+            return None
 
+        progress = copy.deepcopy(progress)
+        del progress['asset_uid']
+        del progress['user_id']
+        return progress
 
     @abc.abstractmethod
     def calculated_submission_count(self, user: 'auth.User', **kwargs):
@@ -368,6 +391,21 @@ class BaseDeploymentBackend(abc.ABC):
         """
         pass
 
+    def invalidate_submission_counts(self):
+        """
+        Void submission counts cached by `_get_submissions_cursor()`.
+        Must be called whenever submissions are written through KPI.
+        """
+        MongoHelper.invalidate_cached_counts(self.mongo_userform_id)
+
+    @property
+    def last_submission_edit_time(self) -> Optional[str]:
+        """
+        Most recent date submissions have been edited. Unlike additions and
+        deletions, edits do not change submission counts.
+        """
+        return MongoHelper.get_last_edited(self.mongo_userform_id)
+
     @property
     def last_submission_time(self):
         return self._last_submission_time()
@@ -437,6 +475,22 @@ class BaseDeploymentBackend(abc.ABC):
     def set_has_kpi_hooks(self):
         pass
 
+    def set_bulk_update_progress(
+        self, task_uid: str, user: 'auth.User', **values
+    ):
+        """
+        Store the progress of a bulk update run in background by `user`
+        """
+        cache_key = self._get_bulk_update_cache_key(task_uid)
+        progress = cache.get(cache_key) or {
+            'asset_uid': self.asset.uid,
+            'user_id': user.pk,
+        }
+        progress.update(values)
+        cache.set(
+            cache_key, progress, settings.SUBMISSION_BULK_UPDATE_PROGRESS_TIMEOUT
+        )
+
     def set_status(self, status):
         self.save_to_db({'status': status})
 
@@ -486,6 +540,19 @@ class BaseDeploymentBackend(abc.ABC):
     ):
         pass
 
+    @property
+    def submission_data_version(self) -> str:
+        """
+        Value which changes whenever submissions are added, removed or
+        edited, or written through KPI. Results computed from the whole set
+        of submissions can be cached as long as it does not change.
+        """
+        return '{}:{}:{}'.format(
+            self._submission_data_version,
+            MongoHelper.get_write_generation(self.mongo_userform_id),
+            self.last_submission_edit_time,
+        )
+
     @property
     @abc.abstractmethod
     def submission_list_url(self):
@@ -533,8 +600,9 @@ class BaseDeploymentBackend(abc.ABC):
             - fields
             - query
             - submission_ids
-        If `validate_count` is True,`start`, `limit`, `fields` and `sort` are
-        ignored.
+            - keyset (see `kpi.paginators.DataCursorPagination`)
+        If `validate_count` is True,`start`, `limit`, `fields`, `sort` and
+        `keyset` are ignored.
         If `user` has partial permissions, conditions are
         applied to the query to narrow down results to what they are allowed
         to see. Partial permissions are validated with 'view_submissions' by
@@ -565,6 +633,11 @@ class BaseDeploymentBackend(abc.ABC):
                     'fields': t('This is not supported in `XML` format')
                 })
 
+            if 'keyset' in mongo_query_params:
+                raise serializers.ValidationError({
+                    'cursor': t('This param is not supported in `XML` format')
+                })
+
         start = mongo_query_params.get('start', 0)
         limit = mongo_query_params.get('limit')
         sort = mongo_query_params.get('sort', {})
@@ -572,6 +645,7 @@ class BaseDeploymentBackend(abc.ABC):
         query = mongo_query_params.get('query', {})
         submission_ids = mongo_query_params.get('submission_ids', [])
         skip_count = mongo_query_params.get('skip_count', False)
+        keyset = mongo_query_params.get('keyset')
 
         # I've copied these `ValidationError` messages verbatim from DRF where
         # possible.TODO: Should this validation be in (or called directly by)
@@ -648,6 +722,17 @@ class BaseDeploymentBackend(abc.ABC):
         if limit:
             params['limit'] = limit
 
+        if keyset is not None:
+            if not isinstance(keyset, dict):
+                raise serializers.ValidationError(
+                    {'cursor': t('Invalid cursor')}
+                )
+            if start:
+                raise serializers.ValidationError(
+                    {'start': t('This param cannot be used with `cursor`')}
+                )
+            params['keyset'] = keyset
+
         return params
 
     def validate_access_with_partial_perms(
@@ -747,6 +832,189 @@ class BaseDeploymentBackend(abc.ABC):
     def _open_rosa_server_storage(self):
         return default_storage
 
+    def _bulk_update_submissions_in_background(
+        self, data: dict, user: 'auth.User'
+    ) -> dict:
+        # Avoid circular imports
+        from kpi.tasks import bulk_update_submissions_in_background
+
+        task_uid = ShortUUID().random(24)
+        progress = {
+            'uid': task_uid,
+            'status': self.BULK_UPDATE_STATUS_PROCESSING,
+            'count': self.current_submission_count,
+            'processed': 0,
+        }
+        self.set_bulk_update_progress(task_uid, user, **progress)
+        bulk_update_submissions_in_background.delay(
+            self.asset.uid, user.pk, data, task_uid
+        )
+        return {
+            'status': status.HTTP_202_ACCEPTED,
+            'data': progress,
+        }
+
+    @staticmethod
+    def _get_bulk_update_cache_key(task_uid: str) -> str:
+        return f'bulk_update_submissions:{task_uid}'
+
+    def _prepare_bulk_updated_submission(
+        self, submission: str, update_data: dict
+    ) -> tuple[str, str]:
+        """
+        Return the updated XML of `submission` and its new uuid
+        """
+        xml_parsed = fromstring_preserve_root_xmlns(submission)
+
+        _uuid, uuid_formatted = self.generate_new_instance_id()
+
+        # Updating xml fields for submission. In order to update an existing
+        # submission, the current `instanceID` must be moved to the value
+        # for `deprecatedID`.
+        instance_id = get_or_create_element(
+            xml_parsed, self.SUBMISSION_CURRENT_UUID_XPATH
+        )
+        # If the submission has been edited before, it will already contain
+        # a deprecatedID element - otherwise create a new element
+        deprecated_id = get_or_create_element(
+            xml_parsed, self.SUBMISSION_DEPRECATED_UUID_XPATH
+        )
+        deprecated_id.text = instance_id.text
+        instance_id.text = uuid_formatted
+
+        # If the form has been updated with new fields and earlier
+        # submissions have been selected as part of the bulk update,
+        # a new element has to be created before a value can be set.
+        # However, with this new power, arbitrary fields can be added
+        # to the XML tree through the API.
+        for path, value in update_data.items():
+            edit_submission_xml(xml_parsed, path, value)
+
+        return xml_tostring(xml_parsed), _uuid
+
+    def _store_bulk_updated_submissions(
+        self,
+        submissions: Iterator[str],
+        update_data: dict,
+        user: 'auth.User',
+        task_uid: Optional[str] = None,
+    ) -> list[dict]:
+        """
+        Update `submissions` with `update_data` and send them to the back end
+        with a bounded number of concurrent requests.
+
+        Results are returned in the same order as `submissions`. A failure
+        to reach the back end for one submission does not stop the others;
+        it is reported as an `error` in its result instead of a `response`.
+        """
+        max_workers = settings.SUBMISSION_BULK_UPDATE_MAX_WORKERS
+        # Do not keep more than a few XML documents in memory at once
+        max_pending = max_workers * 2
+        kc_responses = []
+        pending = deque()
+
+        def _store_submission(xml_submission: str, submission_uuid: str):
+            try:
+                return self.store_submission(
+                    user, xml_submission, submission_uuid
+                )
+            finally:
+                # Threads must not leak their database connections
+                connections.close_all()
+
+        def _collect_oldest():
+            submission_uuid, future = pending.popleft()
+            kc_response = {'uuid': submission_uuid}
+            try:
+                kc_response['response'] = future.result()
+            except Exception as e:
+                logging.error(
+                    f'Bulk update of submission {submission_uuid} failed: '
+                    f'{repr(e)}',
+                    exc_info=True,
+                )
+                kc_response['error'] = str(e)
+            kc_responses.append(kc_response)
+
+            if task_uid and len(kc_responses) % max_pending == 0:
+                self.set_bulk_update_progress(
+                    task_uid, user, processed=len(kc_responses)
+                )
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for submission in submissions:
+                xml_submission, submission_uuid = (
+                    self._prepare_bulk_updated_submission(
+                        submission, update_data
+                    )
+                )
+                pending.append(
+                    (
+                        submission_uuid,
+                        executor.submit(
+                            _store_submission, xml_submission, submission_uuid
+                        ),
+                    )
+                )
+                if len(pending) >= max_pending:
+                    _collect_oldest()
+
+            while pending:
+                _collect_oldest()
+
+        return kc_responses
+
+    def _get_submissions_cursor(self, params: dict):
+        """
+        Return a MongoDB cursor on submissions matching `params` (see
+        `validate_submission_list_params()`) and update
+        `self.current_submission_count` according to
+        `settings.SUBMISSION_COUNT_STRATEGY`.
+
+        With the `fast` strategy, the count of unfiltered requests comes from
+        `self.submission_count` and the count of filtered requests may come
+        from the cache. `self.current_submission_count_is_exact` tells whether
+        the count has been computed by MongoDB for this request.
+        """
+        skip_count = params.get('skip_count', False)
+        use_fast_count = (
+            settings.SUBMISSION_COUNT_STRATEGY == SUBMISSION_COUNT_STRATEGY_FAST
+        )
+        count_params = {
+            'query': copy.deepcopy(params.get('query')),
+            'submission_ids': params.get('submission_ids'),
+            'permission_filters': params.get('permission_filters'),
+        }
+
+        mongo_cursor, total_count = MongoHelper.get_instances(
+            self.mongo_userform_id,
+            **{**params, 'skip_count': skip_count or use_fast_count},
+        )
+        is_exact = True
+
+        if use_fast_count and not skip_count:
+            if not any(count_params.values()):
+                total_count = self.submission_count
+                is_exact = False
+            else:
+                total_count, is_exact = MongoHelper.get_cached_count(
+                    self.mongo_userform_id,
+                    data_version=self._submission_data_version,
+                    **count_params,
+                )
+
+        self.current_submission_count = total_count
+        self.current_submission_count_is_exact = is_exact
+        return mongo_cursor
+
+    @property
+    def _submission_data_version(self) -> str:
+        """
+        Value which changes when submissions are added or removed outside KPI.
+        Cached submission counts are voided when it changes.
+        """
+        return ''
+
     def _get_metadata_queryset(self, file_type: str) -> Union[QuerySet, list]:
         """
         Returns a list of objects, or a QuerySet to pass to Celery to
@@ -763,27 +1031,63 @@ class BaseDeploymentBackend(abc.ABC):
             queryset = PairedData.objects(self.asset).values()
             return queryset
 
+    def _get_attachment_url_context(
+        self, request
+    ) -> tuple[Optional[list], str]:
+        """
+        Return attachment XPaths of the deployed version and a template of
+        attachment URLs.
+        Both are computed once per request and reused for every submission
+        of the stream.
+        """
+        try:
+            request_, context = self.__attachment_url_context
+        except AttributeError:
+            pass
+        else:
+            if request_ is request:
+                return context
+
+        # We should use 'attachment-list' with `?xpath=` but we do not
+        # know what the XPath is here. Since the primary key is already
+        # exposed, let's use it to build the url with 'attachment-detail'.
+        # Placeholders cannot contain braces, they would be URL-encoded.
+        url_template = reverse(
+            'attachment-detail',
+            args=(self.asset.uid, 'SUBMISSIONID', 'ATTACHMENTID'),
+            request=request,
+        )
+        url_template = (
+            url_template.replace('{', '{{')
+            .replace('}', '}}')
+            .replace('SUBMISSIONID', '{submission_id}')
+            .replace('ATTACHMENTID', '{attachment_id}')
+        )
+        context = (
+            self.asset.get_attachment_xpaths(deployed=True),
+            url_template,
+        )
+        self.__attachment_url_context = (request, context)
+        return context
+
     def _rewrite_json_attachment_urls(
         self, submission: dict, request
     ) -> dict:
         if not request or '_attachments' not in submission:
             return submission
 
-        attachment_xpaths = self.asset.get_attachment_xpaths(deployed=True)
+        attachment_xpaths, url_template = self._get_attachment_url_context(
+            request
+        )
         filenames_and_xpaths = get_attachment_filenames_and_xpaths(
             submission, attachment_xpaths
         )
 
         for attachment in submission['_attachments']:
+            kpi_url = url_template.format(
+                submission_id=submission['_id'], attachment_id=attachment['id']
+            )
             for size, suffix in settings.KOBOCAT_THUMBNAILS_SUFFIX_MAPPING.items():
-                # We should use 'attachment-list' with `?xpath=` but we do not
-                # know what the XPath is here. Since the primary key is already
-                # exposed, let's use it to build the url with 'attachment-detail'
-                kpi_url = reverse(
-                    'attachment-detail',
-                    args=(self.asset.uid, submission['_id'], attachment['id']),
-                    request=request,
-                )
                 key = f'download{suffix}_url'
                 try:
                     attachment[key] = kpi_url
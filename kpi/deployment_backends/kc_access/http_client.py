@@ -0,0 +1,95 @@
+# coding: utf-8
+import os
+import threading
+from http.cookiejar import DefaultCookiePolicy
+from typing import Optional, Union
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+class KobocatHttpClient:
+    """
+    Process-wide HTTP client used to talk to KoBoCAT.
+
+    Connections are kept alive and pooled by a single `requests.Session`,
+    instead of opening a new connection (and TLS handshake) for each request.
+    Idempotent requests are retried with an exponential backoff when KoBoCAT
+    (or the proxy in front of it) answers with 502, 503 or 504. Connection
+    errors are retried whatever the method is, since nothing has been sent.
+
+    The session is shared by all users, thus it never stores cookies:
+    authentication is sent explicitly with each request.
+
+    The session is rebuilt in forked processes (e.g. uWSGI or Celery workers)
+    to avoid sharing sockets with the parent process.
+    """
+
+    RETRY_STATUS_CODES = (502, 503, 504)
+
+    _lock = threading.Lock()
+    _pid = None
+    _session = None
+
+    @classmethod
+    def get_session(cls) -> requests.Session:
+        pid = os.getpid()
+        if cls._session is None or cls._pid != pid:
+            with cls._lock:
+                if cls._session is None or cls._pid != pid:
+                    cls._session = cls._create_session()
+                    cls._pid = pid
+        return cls._session
+
+    @classmethod
+    def reset(cls):
+        """
+        Close all pooled connections. A new session is created on next call.
+        """
+        with cls._lock:
+            if cls._session is not None and cls._pid == os.getpid():
+                cls._session.close()
+            cls._session = None
+            cls._pid = None
+
+    @classmethod
+    def send(
+        cls,
+        prepared_request: requests.PreparedRequest,
+        timeout: Optional[Union[float, tuple]] = None,
+    ) -> requests.Response:
+        """
+        Send `prepared_request` through the pool.
+        `timeout` defaults to `settings.KOBOCAT_HTTP_CONNECT_TIMEOUT` and
+        `settings.KOBOCAT_HTTP_READ_TIMEOUT`.
+        """
+        if timeout is None:
+            timeout = (
+                settings.KOBOCAT_HTTP_CONNECT_TIMEOUT,
+                settings.KOBOCAT_HTTP_READ_TIMEOUT,
+            )
+        return cls.get_session().send(prepared_request, timeout=timeout)
+
+    @classmethod
+    def _create_session(cls) -> requests.Session:
+        retry = Retry(
+            total=settings.KOBOCAT_HTTP_MAX_RETRIES,
+            backoff_factor=settings.KOBOCAT_HTTP_BACKOFF_FACTOR,
+            status_forcelist=cls.RETRY_STATUS_CODES,
+            # Let the caller handle the last response
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(
+            pool_connections=settings.KOBOCAT_HTTP_POOL_CONNECTIONS,
+            pool_maxsize=settings.KOBOCAT_HTTP_POOL_MAXSIZE,
+            max_retries=retry,
+        )
+        session = requests.Session()
+        # Do not let cookies set by KoBoCAT for one user (e.g. its session)
+        # be sent along with requests made on behalf of other users
+        session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        return session
@@ -6,7 +6,8 @@ import re
 from collections import defaultdict
 from contextlib import contextmanager
 from datetime import date, datetime
-from typing import Generator, Optional, Union
+from itertools import islice
+from typing import Generator, Iterator, Optional, Union
 from urllib.parse import urlparse
 try:
     from zoneinfo import ZoneInfo
@@ -17,9 +18,10 @@ import requests
 import redis.exceptions
 from defusedxml import ElementTree as DET
 from django.conf import settings
+from django.core.cache import cache
 from django.core.exceptions import ImproperlyConfigured
 from django.core.files import File
-from django.db.models import Sum, F
+from django.db.models import F, Max, Min, Q, Sum
 from django.db.models.functions import Coalesce
 from django.db.models.query import QuerySet
 from django.utils import timezone
@@ -30,6 +32,7 @@ from rest_framework import status
 
 from kobo.apps.subsequences.utils import stream_with_extras
 from kobo.apps.trackers.models import NLPUsageCounter
+from kobo.apps.trackers.utils import refresh_monthly_usage_rollups
 from kpi.constants import (
     SUBMISSION_FORMAT_TYPE_JSON,
     SUBMISSION_FORMAT_TYPE_XML,
@@ -59,6 +62,7 @@ from kpi.utils.object_permission import get_database_user
 from kpi.utils.permissions import is_user_anonymous
 from kpi.utils.xml import fromstring_preserve_root_xmlns, xml_tostring
 from .base_backend import BaseDeploymentBackend
+from .kc_access.http_client import KobocatHttpClient
 from .kc_access.shadow_models import (
     KobocatAttachment,
     KobocatDailyXFormSubmissionCounter,
@@ -201,6 +205,80 @@ class KobocatDeploymentBackend(BaseDeploymentBackend):
         else:
             return nlp_tracking
 
+    @staticmethod
+    def nlp_tracking_data_per_asset(
+        asset_ids: list[int], start_dates: dict[str, Optional[date]]
+    ) -> dict[int, dict]:
+        """
+        Same as `nlp_tracking_data()` for several assets at once, within one
+        query. Data is returned per asset id, then per key of `start_dates`.
+        """
+        aggregates = {}
+        for name, start_date in start_dates.items():
+            date_filter = Q(date__gte=start_date) if start_date else None
+            aggregates[f'{name}_asr_seconds'] = Coalesce(
+                Sum('total_asr_seconds', filter=date_filter), 0
+            )
+            aggregates[f'{name}_mt_characters'] = Coalesce(
+                Sum('total_mt_characters', filter=date_filter), 0
+            )
+
+        records = (
+            NLPUsageCounter.objects.filter(asset_id__in=asset_ids)
+            .values('asset_id')
+            .annotate(**aggregates)
+            .order_by()
+        )
+        return {
+            record['asset_id']: {
+                name: {
+                    'total_nlp_asr_seconds': record[f'{name}_asr_seconds'],
+                    'total_nlp_mt_characters': record[
+                        f'{name}_mt_characters'
+                    ],
+                }
+                for name in start_dates
+            }
+            for record in records
+        }
+
+    @staticmethod
+    def submission_counts_per_xform(
+        xform_ids: list[int], start_dates: dict[str, Optional[date]]
+    ) -> dict[int, dict]:
+        """
+        Same as `submission_count_since_date()` for several XForms at once,
+        within one query. Counts are returned per XForm id, then per key of
+        `start_dates`.
+        """
+        today = timezone.now().date()
+        aggregates = {
+            name: Coalesce(
+                Sum(
+                    'counter',
+                    filter=(
+                        Q(date__range=[start_date, today])
+                        if start_date
+                        else None
+                    ),
+                ),
+                0,
+            )
+            for name, start_date in start_dates.items()
+        }
+        records = (
+            KobocatDailyXFormSubmissionCounter.objects.filter(
+                xform_id__in=xform_ids
+            )
+            .values('xform_id')
+            .annotate(**aggregates)
+            .order_by()
+        )
+        return {
+            record['xform_id']: {name: record[name] for name in start_dates}
+            for record in records
+        }
+
     def submission_count_since_date(self, start_date=None):
         try:
             xform_id = self.xform_id
@@ -284,6 +362,7 @@ class KobocatDeploymentBackend(BaseDeploymentBackend):
         kc_url = self.get_submission_detail_url(submission_id)
         kc_request = requests.Request(method='DELETE', url=kc_url)
         kc_response = self.__kobocat_proxy_request(kc_request, user)
+        self.invalidate_submission_counts()
 
         return self.__prepare_as_drf_response_signature(kc_response)
 
@@ -318,6 +397,7 @@ class KobocatDeploymentBackend(BaseDeploymentBackend):
         kc_url = self.submission_list_url
         kc_request = requests.Request(method='DELETE', url=kc_url, json=data)
         kc_response = self.__kobocat_proxy_request(kc_request, user)
+        self.invalidate_submission_counts()
 
         drf_response = self.__prepare_as_drf_response_signature(kc_response)
         return drf_response
@@ -447,6 +527,7 @@ class KobocatDeploymentBackend(BaseDeploymentBackend):
             method='POST', url=self.submission_url, files=files
         )
         kc_response = self.__kobocat_proxy_request(kc_request, user)
+        self.invalidate_submission_counts()
         return self.__prepare_as_drf_response_signature(
             kc_response, expected_response_format='xml'
         )
@@ -1041,6 +1122,7 @@ class KobocatDeploymentBackend(BaseDeploymentBackend):
 
         kc_request = requests.Request(**kc_request_params)
         kc_response = self.__kobocat_proxy_request(kc_request, user)
+        self.invalidate_submission_counts()
         return self.__prepare_as_drf_response_signature(kc_response)
 
     def set_validation_statuses(self, user: 'auth.User', data: dict) -> dict:
@@ -1074,6 +1156,7 @@ class KobocatDeploymentBackend(BaseDeploymentBackend):
         url = self.submission_list_url
         kc_request = requests.Request(method='PATCH', url=url, json=data)
         kc_response = self.__kobocat_proxy_request(kc_request, user)
+        self.invalidate_submission_counts()
         return self.__prepare_as_drf_response_signature(kc_response)
 
     def store_submission(
@@ -1087,6 +1170,7 @@ class KobocatDeploymentBackend(BaseDeploymentBackend):
             method='POST', url=self.submission_url, files=files
         )
         kc_response = self.__kobocat_proxy_request(kc_request, user=user)
+        self.invalidate_submission_counts()
         return kc_response
 
     @property
@@ -1205,6 +1289,7 @@ class KobocatDeploymentBackend(BaseDeploymentBackend):
                     'user__username',
                     'id_string',
                     'num_of_submissions',
+                    'last_submission_time',
                     'attachment_storage_bytes',
                     'require_auth',
                 )
@@ -1225,6 +1310,65 @@ class KobocatDeploymentBackend(BaseDeploymentBackend):
 
         return self._xform
 
+    @staticmethod
+    def xforms_per_asset(assets: list['kpi.models.Asset']) -> dict:
+        """
+        Same as `xform` for several assets deployed to KoBoCAT, within one
+        query. Assets linked to an unexpected XForm are left out.
+        Owners of `assets` should be already loaded.
+        """
+        assets_per_formid = {}
+        for asset in assets:
+            if formid := asset.deployment.backend_response.get('formid'):
+                assets_per_formid[formid] = asset
+
+        xforms = (
+            KobocatXForm.objects.filter(pk__in=assets_per_formid)
+            .only('user__username', 'id_string', 'attachment_storage_bytes')
+            .select_related('user')
+        )
+        xforms_per_asset = {}
+        for xform in xforms:
+            asset = assets_per_formid[xform.pk]
+            if (
+                xform.user.username == asset.owner.username
+                and xform.id_string == asset.deployment.xform_id_string
+            ):
+                xforms_per_asset[asset.pk] = xform
+
+        return xforms_per_asset
+
+    @property
+    def last_submission_edit_time(self) -> Optional[str]:
+        # KoBoCAT does not keep the edit date in MongoDB, but updates
+        # `date_modified` of the instance
+        try:
+            xform_id = self.xform_id
+        except InvalidXFormException:
+            return None
+
+        # Finding the latest `date_modified` reads every instance of the form.
+        # It is cached for `SUBMISSION_EDIT_TIME_CACHE_TIMEOUT` seconds, per
+        # write generation, thus edits made through KPI are seen right away.
+        cache_key = ':'.join(
+            [
+                'last_submission_edit_time',
+                str(xform_id),
+                MongoHelper.get_write_generation(self.mongo_userform_id),
+            ]
+        )
+        if (last_edited := cache.get(cache_key)) is not None:
+            return last_edited or None
+
+        last_edited = ReadOnlyKobocatInstance.objects.filter(
+            xform_id=xform_id
+        ).aggregate(last_edited=Max('date_modified'))['last_edited']
+        last_edited = last_edited.isoformat() if last_edited else ''
+        cache.set(
+            cache_key, last_edited, settings.SUBMISSION_EDIT_TIME_CACHE_TIMEOUT
+        )
+        return last_edited or None
+
     @property
     def xform_id(self):
         return self.xform.pk
@@ -1285,13 +1429,20 @@ class KobocatDeploymentBackend(BaseDeploymentBackend):
         )
 
     def transfer_counters_ownership(self, new_owner: 'auth.User'):
+        previous_owner_id = self.asset.owner.pk
+        nlp_counters = NLPUsageCounter.objects.filter(
+            asset=self.asset, user_id=previous_owner_id
+        )
+        daily_counters = KobocatDailyXFormSubmissionCounter.objects.filter(
+            xform=self.xform, user_id=previous_owner_id
+        )
+        oldest_dates = [
+            counters.aggregate(date=Min('date'))['date']
+            for counters in [nlp_counters, daily_counters]
+        ]
 
-        NLPUsageCounter.objects.filter(
-            asset=self.asset, user=self.asset.owner
-        ).update(user=new_owner)
-        KobocatDailyXFormSubmissionCounter.objects.filter(
-            xform=self.xform, user_id=self.asset.owner.pk
-        ).update(user=new_owner)
+        nlp_counters.update(user=new_owner)
+        daily_counters.update(user=new_owner)
         KobocatMonthlyXFormSubmissionCounter.objects.filter(
             xform=self.xform, user_id=self.asset.owner.pk
         ).update(user=new_owner)
@@ -1305,6 +1456,14 @@ class KobocatDeploymentBackend(BaseDeploymentBackend):
             + self.xform.attachment_storage_bytes
         )
 
+        # Usage of past months is read from rollups, they must follow the
+        # counters
+        if oldest_dates := [d for d in oldest_dates if d]:
+            refresh_monthly_usage_rollups(
+                since=min(oldest_dates),
+                user_ids=[previous_owner_id, new_owner.pk],
+            )
+
     def _kobocat_request(self, method, url, expect_formid=True, **kwargs):
         """
         Make a POST or PATCH request and return parsed JSON. Keyword arguments,
@@ -1314,7 +1473,8 @@ class KobocatDeploymentBackend(BaseDeploymentBackend):
         property in KoBoCAT response and returns the KoBoCAT response whatever
         it is.
 
-        `kwargs` contains arguments to be passed to KoBoCAT request.
+        `kwargs` contains arguments to be passed to KoBoCAT request, except
+        `timeout` which is passed to `KobocatHttpClient.send()`.
         """
 
         expected_status_codes = {
@@ -1331,11 +1491,14 @@ class KobocatDeploymentBackend(BaseDeploymentBackend):
                 'This backend does not implement the {} method'.format(method)
             )
 
+        timeout = kwargs.pop('timeout', None)
+
         # Make the request to KC
         try:
             kc_request = requests.Request(method=method, url=url, **kwargs)
-            response = self.__kobocat_proxy_request(kc_request,
-                                                    user=self.asset.owner)
+            response = self.__kobocat_proxy_request(
+                kc_request, user=self.asset.owner, timeout=timeout
+            )
 
         except requests.exceptions.RequestException as e:
             # Failed to access the KC API
@@ -1386,6 +1549,18 @@ class KobocatDeploymentBackend(BaseDeploymentBackend):
     def _open_rosa_server_storage(self):
         return default_kobocat_storage
 
+    @property
+    def _submission_data_version(self) -> str:
+        # Submissions are created directly in KoBoCAT, KPI cannot invalidate
+        # cached counts when it happens.
+        try:
+            return '{}-{}'.format(
+                self.xform.num_of_submissions,
+                self.xform.last_submission_time,
+            )
+        except InvalidXFormException:
+            return ''
+
     def __delete_kc_metadata(
         self, kc_file_: dict, file_: Union[AssetFile, PairedData] = None
     ):
@@ -1416,11 +1591,7 @@ class KobocatDeploymentBackend(BaseDeploymentBackend):
         # Apply a default sort of _id to prevent unpredictable natural sort
         if not params.get('sort'):
             params['sort'] = {'_id': 1}
-        mongo_cursor, total_count = MongoHelper.get_instances(
-            self.mongo_userform_id, **params)
-
-        # Python-only attribute used by `kpi.views.v2.data.DataViewSet.list()`
-        self.current_submission_count = total_count
+        mongo_cursor = self._get_submissions_cursor(params)
 
         add_supplemental_details_to_query = self.asset.has_advanced_features
 
@@ -1462,52 +1633,72 @@ class KobocatDeploymentBackend(BaseDeploymentBackend):
             submissions, count = MongoHelper.get_instances(
                 self.mongo_userform_id, **params
             )
-            submission_ids = [
-                submission.get('_id')
-                for submission in submissions
-            ]
             self.current_submission_count = count
+            # When using Mongo, data is already paginated,
+            # no need to do it with PostgreSQL too.
+            return self.__get_xml_by_batch(
+                submission['_id'] for submission in submissions
+            )
 
         queryset = ReadOnlyKobocatInstance.objects.filter(
             xform_id=self.xform_id,
         )
 
-        if len(submission_ids) > 0 or use_mongo:
+        if submission_ids := params.get('submission_ids'):
             queryset = queryset.filter(id__in=submission_ids)
 
         # Python-only attribute used by `kpi.views.v2.data.DataViewSet.list()`
-        if not use_mongo:
-            self.current_submission_count = queryset.count()
+        self.current_submission_count = queryset.count()
 
         # Force Sort by id
         # See FIXME about sort in `BaseDeploymentBackend.validate_submission_list_params()`
         queryset = queryset.order_by('id')
 
-        # When using Mongo, data is already paginated,
-        # no need to do it with PostgreSQL too.
-        if not use_mongo:
-            offset = params.get('start')
-            limit = offset + params.get('limit')
-            queryset = queryset[offset:limit]
+        offset = params.get('start')
+        limit = offset + params.get('limit')
+        queryset = queryset[offset:limit]
 
         return (lazy_instance.xml for lazy_instance in queryset)
 
+    def __get_xml_by_batch(
+        self, submission_ids: Iterator[int]
+    ) -> Generator[str, None, None]:
+        """
+        Stream the XML of `submission_ids` from PostgreSQL.
+
+        `submission_ids` must be sorted in ascending order. They are consumed
+        by batch, thus the list of matching ids is never fully held in memory,
+        nor sent to PostgreSQL at once.
+        """
+        queryset = ReadOnlyKobocatInstance.objects.filter(
+            xform_id=self.xform_id,
+        ).order_by('id')
+        while batch := list(
+            islice(submission_ids, MongoHelper.DEFAULT_BATCHSIZE)
+        ):
+            yield from queryset.filter(id__in=batch).values_list(
+                'xml', flat=True
+            ).iterator()
+
     @staticmethod
-    def __kobocat_proxy_request(kc_request, user=None):
+    def __kobocat_proxy_request(kc_request, user=None, timeout=None):
         """
         Send `kc_request`, which must specify `method` and `url` at a minimum.
         If the incoming request to be proxied is authenticated,
         logged-in user's API token will be added to `kc_request.headers`
 
+        The request goes through the process-wide pool of connections to
+        KoBoCAT. See `KobocatHttpClient`.
+
         :param kc_request: requests.models.Request
         :param user: User
+        :param timeout: float or (connect timeout, read timeout) tuple
         :return: requests.models.Response
         """
         if not is_user_anonymous(user):
             kc_request.headers.update(get_request_headers(user.username))
 
-        session = requests.Session()
-        return session.send(kc_request.prepare())
+        return KobocatHttpClient.send(kc_request.prepare(), timeout=timeout)
 
     @staticmethod
     def __prepare_as_drf_response_signature(
@@ -1559,7 +1750,7 @@ class KobocatDeploymentBackend(BaseDeploymentBackend):
         Args:
             kc_responses (list): A list containing dictionaries with keys of
             `_uuid` from the newly generated uuid and `response`, the response
-            object received from KoBoCAT
+            object received from KoBoCAT, or `error` if the request failed
 
         Returns:
             dict: formatted dict to be passed to a Response object and sent to
@@ -1573,6 +1764,17 @@ class KobocatDeploymentBackend(BaseDeploymentBackend):
         results = []
         for response in kc_responses:
             message = t('Something went wrong')
+            if response.get('error'):
+                # KoBoCAT could not be reached for this submission
+                results.append(
+                    {
+                        'uuid': response['uuid'],
+                        'status_code': status.HTTP_502_BAD_GATEWAY,
+                        'message': message,
+                    }
+                )
+                continue
+
             try:
                 xml_parsed = fromstring_preserve_root_xmlns(
                     response['response'].content
@@ -1,5 +1,8 @@
 # coding: utf-8
 import celery
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
 from django.utils import timezone
 
 from kpi.constants import ASSET_TYPE_SURVEY
@@ -24,6 +27,36 @@ class DeployableMixin:
             # Not using .delay() due to circular import in tasks.py
             celery.current_app.send_task('kpi.tasks.sync_media_files', (self.uid,))
 
+    def sync_paired_data_files_async(self):
+        """
+        Synchronize paired data files with deployment backend asynchronously.
+        Calls received within `settings.PAIRED_DATA_SYNC_DELAY` seconds are
+        coalesced into one task.
+        """
+        cache_key = self.get_sync_paired_data_files_cache_key()
+
+        def _send_task():
+            # The key is only taken once the transaction has been committed.
+            # Otherwise, a rolled back transaction would prevent any
+            # synchronization for a while.
+            if not cache.add(
+                cache_key, True, settings.PAIRED_DATA_SYNC_DELAY * 2
+            ):
+                # A synchronization is already pending
+                return
+
+            # Not using .delay() due to circular import in tasks.py
+            celery.current_app.send_task(
+                'kpi.tasks.sync_paired_data_files',
+                (self.uid,),
+                countdown=settings.PAIRED_DATA_SYNC_DELAY,
+            )
+
+        transaction.on_commit(_send_task)
+
+    def get_sync_paired_data_files_cache_key(self) -> str:
+        return f'sync_paired_data_files:{self.uid}'
+
     @property
     def can_be_deployed(self):
         return self.asset_type and self.asset_type == ASSET_TYPE_SURVEY
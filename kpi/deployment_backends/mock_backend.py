@@ -151,6 +151,7 @@ class MockDeploymentBackend(BaseDeploymentBackend):
             }
 
         settings.MONGO_DB.instances.delete_one({'_id': submission_id})
+        self.invalidate_submission_counts()
 
         return {
             'content_type': 'application/json',
@@ -200,6 +201,7 @@ class MockDeploymentBackend(BaseDeploymentBackend):
             settings.MONGO_DB.instances.delete_one(
                 {'_id': submission_id}
             )
+        self.invalidate_submission_counts()
 
         return {
             'content_type': 'application/json',
@@ -389,11 +391,11 @@ class MockDeploymentBackend(BaseDeploymentBackend):
                                                       format_type=format_type,
                                                       **mongo_query_params)
 
-        mongo_cursor, total_count = MongoHelper.get_instances(
-            self.mongo_userform_id, **params)
+        if format_type == SUBMISSION_FORMAT_TYPE_XML:
+            # Like KoBoCAT, return XML submissions sorted by `_id`
+            params['sort'] = {'_id': 1}
 
-        # Python-only attribute used by `kpi.views.v2.data.DataViewSet.list()`
-        self.current_submission_count = total_count
+        mongo_cursor = self._get_submissions_cursor(params)
 
         submissions = [
             self._rewrite_json_attachment_urls(
@@ -444,6 +446,8 @@ class MockDeploymentBackend(BaseDeploymentBackend):
             # Do not add `MongoHelper.USERFORM_ID` to original `submissions`
             del submission[MongoHelper.USERFORM_ID]
 
+        self.invalidate_submission_counts()
+
     @property
     def mongo_userform_id(self):
         return f'{self.asset.owner.username}_{self.asset.uid}'
@@ -528,6 +532,7 @@ class MockDeploymentBackend(BaseDeploymentBackend):
             {'_id': submission_id},
             {'$set': {'_validation_status': validation_status}},
         )
+        self.invalidate_submission_counts()
         return {
             'content_type': 'application/json',
             'status': status_code,
@@ -586,6 +591,7 @@ class MockDeploymentBackend(BaseDeploymentBackend):
 
             submission_count += 1
 
+        self.invalidate_submission_counts()
         return {
             'content_type': 'application/json',
             'status': status.HTTP_200_OK,
@@ -704,7 +710,10 @@ class MockDeploymentBackend(BaseDeploymentBackend):
     @staticmethod
     def prepare_bulk_update_response(kc_responses: list) -> dict:
         total_update_attempts = len(kc_responses)
-        total_successes = total_update_attempts  # all will be successful
+        # Only submissions which could not be stored are failures
+        total_successes = len(
+            [response for response in kc_responses if not response.get('error')]
+        )
         return {
             'status': status.HTTP_200_OK,
             'data': {
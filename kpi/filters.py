@@ -12,6 +12,7 @@ from django.db.models import (
     When,
 )
 from django.db.models.query import QuerySet
+from django.db.models.sql.datastructures import Join
 from django.utils.datastructures import MultiValueDictKeyError
 from rest_framework import filters
 from rest_framework.request import Request
@@ -431,13 +432,24 @@ class SearchFilter(filters.BaseFilterBackend):
             raise e
 
         try:
-            # If no search field is specified, the search term is compared
-            # to several default fields and therefore may return a copies
-            # of the same match, therefore the `distinct()` method is required
-            return queryset.filter(q_obj).distinct()
+            filtered_queryset = queryset.filter(q_obj)
         except (FieldError, ValueError):
             return queryset.model.objects.none()
 
+        # Search terms compared to fields of related objects (e.g.
+        # `tags__name`) may return copies of the same match, therefore the
+        # `distinct()` method is required when the filter adds joins
+        if self._count_joins(filtered_queryset) > self._count_joins(queryset):
+            return filtered_queryset.distinct()
+        return filtered_queryset
+
+    @staticmethod
+    def _count_joins(queryset: QuerySet) -> int:
+        return sum(
+            isinstance(table, Join)
+            for table in queryset.query.alias_map.values()
+        )
+
 
 class KpiAssignedObjectPermissionsFilter(filters.BaseFilterBackend):
     """
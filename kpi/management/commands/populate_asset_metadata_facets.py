@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+
+from kpi.models.asset import Asset
+
+
+class Command(BaseCommand):
+
+    help = "Populate metadata facets used by the project list"
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+
+        parser.add_argument(
+            "--chunks",
+            default=2000,
+            type=int,
+            help="Update only records by batch of `chunks`.",
+        )
+
+    def handle(self, *args, **options):
+
+        self._verbosity = options['verbosity']
+        self._chunks = options['chunks']
+        self.populate_metadata_facets()
+
+    def populate_metadata_facets(self):
+        assets = Asset.all_objects.only('uid', 'settings', 'summary')
+        self.stdout.write(f'Updating assets...')
+        for asset in assets.iterator(chunk_size=self._chunks):
+            if self._verbosity >= 1:
+                self.stdout.write(f'\tAsset {asset.uid}...')
+            asset.update_metadata_facets()
+
+        if self._verbosity >= 1:
+            self.stdout.write(f'Done!')
@@ -0,0 +1,50 @@
+from django.core.management.base import BaseCommand
+
+from kpi.models.asset import Asset
+
+
+class Command(BaseCommand):
+
+    help = "Populate search documents used by the project list search"
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+
+        parser.add_argument(
+            "--chunks",
+            default=2000,
+            type=int,
+            help="Update only records by batch of `chunks`.",
+        )
+
+    def handle(self, *args, **options):
+
+        self._verbosity = options['verbosity']
+        self._chunks = options['chunks']
+        self.populate_search_documents()
+
+    def populate_search_documents(self):
+        asset_ids = Asset.all_objects.values_list('pk', flat=True).order_by(
+            'pk'
+        )
+        self.stdout.write(f'Updating assets...')
+        chunk = []
+        updated = 0
+        for asset_id in asset_ids.iterator(chunk_size=self._chunks):
+            chunk.append(asset_id)
+            if len(chunk) == self._chunks:
+                updated += self._update_chunk(chunk)
+                chunk = []
+        if chunk:
+            updated += self._update_chunk(chunk)
+
+        if self._verbosity >= 1:
+            self.stdout.write(f'Done! {updated} assets updated')
+
+    def _update_chunk(self, asset_ids: list) -> int:
+        updated = Asset.update_search_documents(
+            Asset.all_objects.filter(pk__in=asset_ids)
+        )
+        if self._verbosity >= 1:
+            self.stdout.write(f'\tAssets #{asset_ids[0]} to #{asset_ids[-1]}')
+        return updated
@@ -0,0 +1,81 @@
+from django.conf import settings
+from django.core.management import call_command
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def populate_asset_metadata_facets(apps, schema_editor):
+    if settings.SKIP_HEAVY_MIGRATIONS:
+        print(
+            """
+            !!! ATTENTION !!!
+            If you have existing projects you need to run this management command:
+
+               > python manage.py populate_asset_metadata_facets
+
+            Otherwise, metadata of project list will be incomplete.
+            """
+        )
+    else:
+        print(
+            """
+            This might take a while. If it is too slow, you may want to re-run the
+            migration with SKIP_HEAVY_MIGRATIONS=True and run the management command
+            `populate_asset_metadata_facets`.
+            """
+        )
+        call_command('populate_asset_metadata_facets', verbosity=0)
+
+
+def noop(apps, schema_editor):
+    pass
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('kpi', '0056_fix_add_submission_bad_permission_assignment'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AssetMetadataFacet',
+            fields=[
+                (
+                    'id',
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name='ID',
+                    ),
+                ),
+                (
+                    'facet',
+                    models.CharField(
+                        choices=[
+                            ('language', 'language'),
+                            ('country', 'country'),
+                            ('sector', 'sector'),
+                            ('organization', 'organization'),
+                        ],
+                        max_length=20,
+                    ),
+                ),
+                ('value', models.TextField()),
+                ('label', models.TextField(blank=True, default='')),
+                (
+                    'asset',
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name='metadata_facets',
+                        to='kpi.asset',
+                    ),
+                ),
+            ],
+        ),
+        migrations.RunPython(
+            populate_asset_metadata_facets,
+            noop,
+        ),
+    ]
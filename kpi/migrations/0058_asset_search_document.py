@@ -0,0 +1,60 @@
+from django.conf import settings
+from django.contrib.postgres.indexes import GinIndex, OpClass
+from django.contrib.postgres.operations import TrigramExtension
+from django.core.management import call_command
+from django.db import migrations, models
+from django.db.models.functions import Upper
+
+
+def populate_asset_search_documents(apps, schema_editor):
+    if settings.SKIP_HEAVY_MIGRATIONS:
+        print(
+            """
+            !!! ATTENTION !!!
+            If you have existing projects you need to run this management command:
+
+               > python manage.py populate_asset_search_documents
+
+            Otherwise, they will not be found when searching the project list.
+            """
+        )
+    else:
+        print(
+            """
+            This might take a while. If it is too slow, you may want to re-run the
+            migration with SKIP_HEAVY_MIGRATIONS=True and run the management command
+            `populate_asset_search_documents`.
+            """
+        )
+        call_command('populate_asset_search_documents', verbosity=0)
+
+
+def noop(apps, schema_editor):
+    pass
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('kpi', '0057_assetmetadatafacet'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddField(
+            model_name='asset',
+            name='search_document',
+            field=models.TextField(blank=True, default=''),
+        ),
+        migrations.RunPython(
+            populate_asset_search_documents,
+            noop,
+        ),
+        migrations.AddIndex(
+            model_name='asset',
+            index=GinIndex(
+                OpClass(Upper('search_document'), name='gin_trgm_ops'),
+                name='search_document_trgm_idx',
+            ),
+        ),
+    ]
@@ -5,11 +5,13 @@ import copy
 from collections import defaultdict
 from typing import Optional
 
+import celery
 from django.conf import settings
 from django.contrib.auth.models import User, AnonymousUser, Permission
 from django.contrib.contenttypes.models import ContentType
 from django.contrib.postgres.aggregates import ArrayAgg
-from django.db import models, transaction
+from django.core.cache import cache
+from django.db import connection, models, transaction
 from django_request_cache import cache_for_request
 from rest_framework import serializers
 
@@ -27,6 +29,12 @@ from kpi.deployment_backends.kc_access.utils import (
     kc_transaction_atomic,
 )
 from kpi.models.object_permission import ObjectPermission
+from kpi.utils.cache import (
+    get_cached_permissions,
+    invalidate_cached_permissions,
+    void_cache_for_request,
+)
+from kpi.utils.hash import calculate_hash
 from kpi.utils.object_permission import (
     get_database_user,
     perm_parse,
@@ -40,6 +48,11 @@ from kpi.utils.project_views import (
 )
 
 
+RECALCULATION_STATUS_PENDING = 'pending'
+RECALCULATION_STATUS_PROCESSING = 'processing'
+RECALCULATION_STATUS_COMPLETE = 'complete'
+
+
 class ObjectPermissionMixin:
     """
     A mixin class that adds the methods necessary for object-level permissions
@@ -70,11 +83,25 @@ class ObjectPermissionMixin:
         permissions to owner of the object.
         """
 
-        assignable_permissions = self.ASSIGNABLE_PERMISSIONS
-        if not ignore_type:
+        return self.get_assignable_permissions_for_type(
+            None if ignore_type else getattr(self, 'asset_type', None),
+            with_partial=with_partial,
+        )
+
+    @classmethod
+    def get_assignable_permissions_for_type(
+        cls, asset_type: Optional[str], with_partial: bool = True
+    ) -> tuple:
+        """
+        Same as `get_assignable_permissions()` for an object of `asset_type`,
+        without needing an instance. All assignable permissions are returned
+        if `asset_type` is `None`.
+        """
+        assignable_permissions = cls.ASSIGNABLE_PERMISSIONS
+        if asset_type is not None:
             try:
                 assignable_permissions = (
-                    self.ASSIGNABLE_PERMISSIONS_BY_TYPE[self.asset_type]
+                    cls.ASSIGNABLE_PERMISSIONS_BY_TYPE[asset_type]
                 )
             except AttributeError:
                 pass
@@ -170,16 +197,7 @@ class ObjectPermissionMixin:
         only those permissions that apply to the content_type of this object
         and are listed in settings.ALLOWED_ANONYMOUS_PERMISSIONS.
         """
-        content_type = ContentType.objects.get_for_model(self)
-        # Translate settings.ALLOWED_ANONYMOUS_PERMISSIONS to primary keys
-        codenames = set()
-        for perm in settings.ALLOWED_ANONYMOUS_PERMISSIONS:
-            app_label, codename = perm_parse(perm)
-            if app_label == content_type.app_label:
-                codenames.add(codename)
-        allowed_permission_ids = Permission.objects.filter(
-            content_type_id=content_type.pk, codename__in=codenames
-        ).values_list('pk', flat=True)
+        allowed_permission_ids = self._get_allowed_anonymous_permission_ids()
         filtered_set = copy.copy(unfiltered_set)
         for user_id, permission_id in unfiltered_set:
             if user_id == settings.ANONYMOUS_USER_ID:
@@ -230,9 +248,11 @@ class ObjectPermissionMixin:
             # FIXME: `Asset`-specific logic does not belong in this generic
             # mixin
             if self.asset_type != ASSET_TYPE_SURVEY:
-                matching_permissions = matching_permissions.exclude(
-                    codename__endswith='_submissions'
-                )
+                matching_permissions = [
+                    (perm_pk, perm_codename)
+                    for perm_pk, perm_codename in matching_permissions
+                    if not perm_codename.endswith('_submissions')
+                ]
 
             for perm_pk, perm_codename in matching_permissions:
                 if codename is not None and perm_codename != codename:
@@ -250,25 +270,230 @@ class ObjectPermissionMixin:
             # Anonymous users weren't considered; no filtering is necessary
             return effective_perms
 
-    def recalculate_descendants_perms(self):
+    def recalculate_descendants_perms(self, run_in_background: bool = True):
+        """
+        Recalculate inherited permissions of the whole subtree of `self`.
+        The subtree is fetched with one recursive query, inherited permissions
+        are computed in memory and applied by batch.
+        If the subtree is large, the recalculation is delegated to Celery.
+        """
         if self.asset_type not in ASSET_TYPES_WITH_CHILDREN:
             # It's impossible for us to have descendants. Move along...
             return
-        children = list(self.children.only('pk', 'owner', 'parent'))
-        if not children:
+
+        descendants = self._get_descendants()
+        if not descendants:
             return
-        effective_perms = self._get_effective_perms(include_calculated=False)
-        for child in children:
-            # remove stale inherited perms
-            child.permissions.filter(inherited=True).delete()
-            # calc the new ones
-            child._recalculate_inherited_perms(
-                parent_effective_perms=effective_perms,
-                stale_already_deleted=True,
-                #return_instead_of_creating=True
+
+        if (
+            run_in_background
+            and len(descendants)
+            > settings.PERMISSIONS_RECALCULATION_ASYNC_THRESHOLD
+        ):
+            self.set_descendants_perms_recalculation_progress(
+                status=RECALCULATION_STATUS_PENDING,
+                total=len(descendants),
+                processed=0,
             )
-            # recurse!
-            child.recalculate_descendants_perms()
+            # Not using .delay() due to circular import in tasks.py
+            transaction.on_commit(
+                lambda: celery.current_app.send_task(
+                    'kpi.tasks.recalculate_descendants_perms_in_background',
+                    (self.uid,),
+                )
+            )
+            return
+
+        self._recalculate_descendants_perms(descendants)
+
+    def get_descendants_perms_recalculation_progress(self) -> Optional[dict]:
+        return cache.get(self._get_descendants_perms_recalculation_cache_key())
+
+    def set_descendants_perms_recalculation_progress(self, **values):
+        cache.set(
+            self._get_descendants_perms_recalculation_cache_key(),
+            values,
+            settings.PERMISSIONS_RECALCULATION_PROGRESS_TIMEOUT,
+        )
+
+    def _get_allowed_anonymous_permission_ids(self) -> set[int]:
+        """
+        Translate settings.ALLOWED_ANONYMOUS_PERMISSIONS to primary keys
+        """
+        content_type = ContentType.objects.get_for_model(self)
+        codenames = set()
+        for perm in settings.ALLOWED_ANONYMOUS_PERMISSIONS:
+            app_label, codename = perm_parse(perm)
+            if app_label == content_type.app_label:
+                codenames.add(codename)
+        return set(
+            Permission.objects.filter(
+                content_type_id=content_type.pk, codename__in=codenames
+            ).values_list('pk', flat=True)
+        )
+
+    def _get_descendants(self) -> list[tuple[int, int, int, str]]:
+        """
+        Return `(id, parent_id, owner_id, asset_type)` of all descendants,
+        parents always coming before their children
+        """
+        table_name = self._meta.db_table
+        query = f"""
+            WITH RECURSIVE descendants AS (
+                SELECT id, parent_id, owner_id, asset_type, 1 AS depth
+                FROM {table_name}
+                WHERE parent_id = %s AND NOT pending_delete
+                UNION ALL
+                SELECT a.id, a.parent_id, a.owner_id, a.asset_type,
+                    d.depth + 1
+                FROM {table_name} a
+                INNER JOIN descendants d ON a.parent_id = d.id
+                WHERE NOT a.pending_delete
+            )
+            SELECT id, parent_id, owner_id, asset_type
+            FROM descendants
+            ORDER BY depth, id
+        """
+        with connection.cursor() as cursor:
+            cursor.execute(query, [self.pk])
+            return cursor.fetchall()
+
+    def _get_descendants_perms_recalculation_cache_key(self) -> str:
+        return f'recalculate_descendants_perms:{self.uid}'
+
+    @void_cache_for_request(keys=('__get_all_object_permissions',
+                                  '__get_all_user_permissions',))
+    def _recalculate_descendants_perms(self, descendants: list):
+        """
+        Set-based equivalent of calling `_recalculate_inherited_perms()` on
+        each descendant, from top to bottom.
+        """
+        content_type = ContentType.objects.get_for_model(self)
+        permission_ids = dict(
+            Permission.objects.filter(content_type=content_type).values_list(
+                'codename', 'pk'
+            )
+        )
+        heritable_permission_ids = {
+            permission_ids[parent_codename]: permission_ids[child_codename]
+            for parent_codename, child_codename in (
+                self.HERITABLE_PERMISSIONS.items()
+            )
+            if parent_codename in permission_ids
+            and child_codename in permission_ids
+        }
+        allowed_anonymous_permission_ids = (
+            self._get_allowed_anonymous_permission_ids()
+        )
+        owner_permission_ids = {}
+        effective_perms = {
+            self.pk: self._get_effective_perms(include_calculated=False)
+        }
+        uid_field = ObjectPermission._meta.get_field('uid')
+        batch_size = settings.PERMISSIONS_RECALCULATION_BATCH_SIZE
+        total = len(descendants)
+
+        for i in range(0, total, batch_size):
+            batch = descendants[i:i + batch_size]
+            asset_ids = [asset_id for asset_id, *_ in batch]
+            explicit_perms = defaultdict(lambda: {True: set(), False: set()})
+            for asset_id, user_id, permission_id, deny in (
+                ObjectPermission.objects.filter(
+                    asset_id__in=asset_ids, inherited=False
+                ).values_list('asset_id', 'user_id', 'permission_id', 'deny')
+            ):
+                explicit_perms[asset_id][deny].add((user_id, permission_id))
+
+            new_permissions = []
+            for asset_id, parent_id, owner_id, asset_type in batch:
+                inherited_perms = set()
+                # The owner gets every assignable permission
+                if owner_id is not None:
+                    try:
+                        owner_perms = owner_permission_ids[asset_type]
+                    except KeyError:
+                        owner_perms = owner_permission_ids[asset_type] = [
+                            permission_ids[codename]
+                            for codename in (
+                                self.get_assignable_permissions_for_type(
+                                    asset_type, with_partial=False
+                                )
+                            )
+                            if codename in permission_ids
+                        ]
+                    inherited_perms.update(
+                        (owner_id, permission_id)
+                        for permission_id in owner_perms
+                    )
+
+                # All parent's effective permissions become inherited ones
+                for user_id, permission_id in effective_perms[parent_id]:
+                    if user_id == owner_id:
+                        # The owner already has every assignable permission
+                        continue
+                    try:
+                        inherited_perms.add(
+                            (user_id, heritable_permission_ids[permission_id])
+                        )
+                    except KeyError:
+                        # We haven't been configured to inherit this
+                        # permission from our parent, so skip it
+                        continue
+
+                if asset_type in ASSET_TYPES_WITH_CHILDREN:
+                    effective_perms[asset_id] = {
+                        (user_id, permission_id)
+                        for user_id, permission_id in (
+                            explicit_perms[asset_id][False] | inherited_perms
+                        ).difference(explicit_perms[asset_id][True])
+                        if user_id != settings.ANONYMOUS_USER_ID
+                        or permission_id in allowed_anonymous_permission_ids
+                    }
+
+                new_permissions.extend(
+                    ObjectPermission(
+                        asset_id=asset_id,
+                        user_id=user_id,
+                        permission_id=permission_id,
+                        inherited=True,
+                        uid=uid_field.generate_uid(),
+                    )
+                    for user_id, permission_id in inherited_perms
+                )
+
+            # Users, including the owner, must never see the batch without
+            # its inherited permissions
+            with transaction.atomic():
+                stale_permissions = ObjectPermission.objects.filter(
+                    asset_id__in=asset_ids, inherited=True
+                )
+                user_ids = set(
+                    stale_permissions.values_list(
+                        'user_id', flat=True
+                    ).distinct()
+                )
+                user_ids.update(
+                    permission.user_id for permission in new_permissions
+                )
+                # Skip `post_delete` signals, which would load every stale
+                # permission and invalidate the cache once per row
+                stale_permissions._raw_delete(stale_permissions.db)
+                ObjectPermission.objects.bulk_create(
+                    new_permissions, batch_size=batch_size
+                )
+                # Neither deletion nor `bulk_create()` send signals, invalidate
+                # the cached permissions of the whole batch at once
+                invalidate_cached_permissions(asset=asset_ids, user=user_ids)
+                if total > settings.PERMISSIONS_RECALCULATION_ASYNC_THRESHOLD:
+                    self.set_descendants_perms_recalculation_progress(
+                        status=(
+                            RECALCULATION_STATUS_PROCESSING
+                            if i + batch_size < total
+                            else RECALCULATION_STATUS_COMPLETE
+                        ),
+                        total=total,
+                        processed=min(i + batch_size, total),
+                    )
 
     def _recalculate_inherited_perms(
             self,
@@ -739,6 +964,9 @@ class ObjectPermissionMixin:
         Useful to retrieve permissions for several users in a row without
         hitting DB again & again (thanks to `@cache_for_request`)
 
+        The dict is also kept in the shared cache until the permissions of the
+        object change.
+
         Because `django_cache_request` creates its keys based on method's arguments,
         it's important to minimize its number to hit the cache as much as possible.
         This method should be called when object permissions for a specific object
@@ -765,18 +993,23 @@ class ObjectPermissionMixin:
                 ]
             }
         """
-        records = ObjectPermission.objects.filter(asset_id=object_id).values(
-            'user_id', 'permission_id', 'permission__codename', 'deny'
+        def _get_all_object_permissions():
+            records = ObjectPermission.objects.filter(
+                asset_id=object_id
+            ).values('user_id', 'permission_id', 'permission__codename', 'deny')
+            object_permissions_per_user = defaultdict(list)
+            for record in records:
+                object_permissions_per_user[record['user_id']].append((
+                    record['permission_id'],
+                    record['permission__codename'],
+                    record['deny'],
+                ))
+
+            return object_permissions_per_user
+
+        return get_cached_permissions(
+            'asset', object_id, _get_all_object_permissions
         )
-        object_permissions_per_user = defaultdict(list)
-        for record in records:
-            object_permissions_per_user[record['user_id']].append((
-                record['permission_id'],
-                record['permission__codename'],
-                record['deny'],
-            ))
-
-        return object_permissions_per_user
 
     @staticmethod
     @cache_for_request
@@ -788,6 +1021,9 @@ class ObjectPermissionMixin:
 
         Query can be restricted to a list of asset ids if they are passed.
 
+        The dict is also kept in the shared cache until the permissions of the
+        user change.
+
         Because `django_cache_request` creates its keys based on method's arguments,
         it's important to minimize their number to hit the cache as much as possible.
         This method should be called when object permissions for a specific user
@@ -815,21 +1051,30 @@ class ObjectPermissionMixin:
             }
         """
         filters = {'user': user_id}
+        variant = ''
         if asset_ids:
             filters['asset_id__in'] = asset_ids
+            variant = calculate_hash(
+                ','.join(str(asset_id) for asset_id in sorted(asset_ids))
+            )
 
-        records = ObjectPermission.objects.filter(**filters).values(
-            'asset_id', 'permission_id', 'permission__codename', 'deny'
+        def _get_all_user_permissions():
+            records = ObjectPermission.objects.filter(**filters).values(
+                'asset_id', 'permission_id', 'permission__codename', 'deny'
+            )
+            object_permissions_per_object = defaultdict(list)
+            for record in records:
+                object_permissions_per_object[record['asset_id']].append((
+                    record['permission_id'],
+                    record['permission__codename'],
+                    record['deny'],
+                ))
+
+            return object_permissions_per_object
+
+        return get_cached_permissions(
+            'user', user_id, _get_all_user_permissions, variant
         )
-        object_permissions_per_object = defaultdict(list)
-        for record in records:
-            object_permissions_per_object[record['asset_id']].append((
-                record['permission_id'],
-                record['permission__codename'],
-                record['deny'],
-            ))
-
-        return object_permissions_per_object
 
     def __get_object_permissions(self, deny, user=None, codename=None):
         """
@@ -917,7 +1162,8 @@ class ObjectPermissionMixin:
         """
         Gets permissions for specific content type and permission's codename
         This method is cached per request because it can be called several times
-        in a row in the same request.
+        in a row in the same request. Permissions only change after migrations,
+        thus they are also kept in the shared cache.
 
         Args:
             content_type_id (int): ContentType primary key
@@ -925,9 +1171,8 @@ class ObjectPermissionMixin:
             codename__startswith (str)
 
         Returns:
-            mixed: If `first` is `True` returns a tuple.
-                   Otherwise a list of tuples
-                   The tuple consists of permission's pk and its codename.
+            list: A list of tuples.
+                  The tuple consists of permission's pk and its codename.
         """
         filters = {'content_type_id': content_type_id}
         if codename is not None:
@@ -936,10 +1181,16 @@ class ObjectPermissionMixin:
         if codename__startswith is not None:
             filters['codename__startswith'] = codename__startswith
 
-        permissions = Permission.objects.filter(**filters). \
-            values_list('pk', 'codename')
-
-        return permissions
+        return get_cached_permissions(
+            'content_type',
+            content_type_id,
+            lambda: list(
+                Permission.objects.filter(**filters).values_list(
+                    'pk', 'codename'
+                )
+            ),
+            f'{codename}:{codename__startswith}',
+        )
 
 
 class ObjectPermissionViewSetMixin:
@@ -7,14 +7,20 @@ from operator import add
 from typing import Optional, Union
 
 from django.conf import settings
-from django.contrib.auth.models import Permission
-from django.contrib.postgres.indexes import GinIndex
+from django.contrib.auth.models import Permission, User
+from django.contrib.contenttypes.models import ContentType
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.indexes import GinIndex, OpClass
+from django.core.cache import cache
 from django.db import models
 from django.db import transaction
-from django.db.models import Prefetch, Q, F
+from django.db.models import F, OuterRef, Prefetch, Q, Subquery, Value
+from django.db.models.fields.json import KeyTextTransform
+from django.db.models.functions import Concat, Upper
 from django.utils.translation import gettext_lazy as t
 from django_request_cache import cache_for_request
 from taggit.managers import TaggableManager, _TaggableManager
+from taggit.models import TaggedItem
 from taggit.utils import require_instance_manager
 from formpack.utils.flatten_content import flatten_content
 from formpack.utils.json_hash import json_hash
@@ -31,6 +37,8 @@ from kobo.apps.subsequences.advanced_features_params_schema import (
 from kobo.apps.subsequences.utils import (
     advanced_feature_instances,
     advanced_submission_jsonschema,
+    get_advanced_submission_validator,
+    remove_duplicate_auto_requests,
 )
 from kobo.apps.subsequences.utils.parse_known_cols import parse_known_cols
 from kpi.constants import (
@@ -75,6 +83,7 @@ from kpi.mixins import (
     StandardizeSearchableFieldMixin,
 )
 from kpi.models.asset_file import AssetFile
+from kpi.models.asset_metadata_facet import AssetMetadataFacet
 from kpi.models.asset_snapshot import AssetSnapshot
 from kpi.models.asset_user_partial_permission import AssetUserPartialPermission
 from kpi.models.asset_version import AssetVersion
@@ -217,6 +226,9 @@ class Asset(ObjectPermissionMixin,
         blank=True,
         db_index=True
     )
+    # Denormalized copy of the fields searched by default in the asset list
+    # (see `update_search_documents()`)
+    search_document = models.TextField(default='', blank=True)
 
     objects = AssetWithoutPendingDeletedManager()
     all_objects = AssetAllManager()
@@ -231,6 +243,11 @@ class Asset(ObjectPermissionMixin,
             GinIndex(
                 F('settings__country_codes'), name='settings__country_codes_idx'
             ),
+            # Trigram index to support `search_document__icontains` lookups
+            GinIndex(
+                OpClass(Upper('search_document'), name='gin_trgm_ops'),
+                name='search_document_trgm_idx',
+            ),
         ]
 
         # Example in Django documentation  represents `ordering` as a list
@@ -428,6 +445,7 @@ class Asset(ObjectPermissionMixin,
         # be the comparison is accurate.
         self.__parent_id_copy = -1
         self.__deployment_data_copy = None
+        self.__paired_data_copy = None
         self.__copy_hidden_fields()
 
     def __str__(self):
@@ -564,25 +582,78 @@ class Asset(ObjectPermissionMixin,
         if len(self.advanced_features) == 0:
             NO_FEATURES_MSG = 'no advanced features activated for this form'
             return {'type': 'object', '$description': NO_FEATURES_MSG}
-        last_deployed_version = self.deployed_versions.first()
         if content:
             return advanced_submission_jsonschema(
                 content, self.advanced_features, url=url
             )
-        if last_deployed_version is None:
+        if (version_uid := self.latest_deployed_version_uid) is None:
             NO_DEPLOYMENT_MSG = 'asset needs a deployment for this feature'
             return {'type': 'object', '$description': NO_DEPLOYMENT_MSG}
-        content = last_deployed_version.version_content
-        return advanced_submission_jsonschema(
-            content, self.advanced_features, url=url
+
+        # The schema is built from the deployed content, which can be big.
+        # Share it across requests until the advanced features or the
+        # deployed version change.
+        cache_key = self._get_advanced_submission_schema_cache_key(
+            version_uid, url
+        )
+        if (schema := cache.get(cache_key)) is None:
+            content = self.asset_versions.only('version_content').get(
+                uid=version_uid
+            ).version_content
+            schema = advanced_submission_jsonschema(
+                content, self.advanced_features, url=url
+            )
+            cache.set(
+                cache_key, schema, settings.FORMPACK_SCHEMA_CACHE_TIMEOUT
+            )
+        return schema
+
+    def get_advanced_submission_validator(self):
+        """
+        Return a validator compiled from `get_advanced_submission_schema()`.
+        It is compiled only once per process for the same advanced features
+        and deployed version.
+        """
+        cache_key = None
+        if (
+            len(self.advanced_features)
+            and (version_uid := self.latest_deployed_version_uid)
+        ):
+            cache_key = self._get_advanced_submission_schema_cache_key(
+                version_uid
+            )
+
+        return get_advanced_submission_validator(
+            cache_key,
+            self.get_advanced_submission_schema,
         )
 
     @cache_for_request
     def get_attachment_xpaths(self, deployed: bool = True) -> Optional[list]:
-        version = (
-            self.latest_deployed_version if deployed else self.latest_version
+        if not deployed or not (
+            version_uid := self.latest_deployed_version_uid
+        ):
+            return self._get_attachment_xpaths(self.latest_version)
+
+        # Deployed versions are immutable, XPaths can be shared across
+        # requests until the next redeployment.
+        cache_key = f'attachment_xpaths:{self.uid}:{version_uid}'
+        if cached_xpaths := cache.get(cache_key):
+            return cached_xpaths['xpaths']
+
+        xpaths = self._get_attachment_xpaths(
+            self.asset_versions.get(uid=version_uid)
         )
+        cache.set(
+            cache_key,
+            {'xpaths': xpaths},
+            settings.FORMPACK_SCHEMA_CACHE_TIMEOUT,
+        )
+        return xpaths
 
+    def _get_attachment_xpaths(
+        self, version: Optional[AssetVersion]
+    ) -> Optional[list]:
         if version:
             content = version.to_formpack_schema()['content']
         else:
@@ -613,6 +684,40 @@ class Asset(ObjectPermissionMixin,
         self._insert_qpath(content)
         return _get_xpaths(survey)
 
+    @cache_for_request
+    def get_xpaths_by_qpath(self) -> dict:
+        """
+        Return the XPaths of the questions of the current version, indexed by
+        their qpath. The index is built once per version and shared across
+        requests, thus `content` does not need to be loaded to read it.
+        """
+        if not (version_uid := self.version_id):
+            return self._get_xpaths_by_qpath()
+
+        cache_key = f'xpaths_by_qpath:{self.uid}:{version_uid}'
+        if (xpaths := cache.get(cache_key)) is None:
+            xpaths = self._get_xpaths_by_qpath()
+            cache.set(
+                cache_key, xpaths, settings.FORMPACK_SCHEMA_CACHE_TIMEOUT
+            )
+        return xpaths
+
+    def _get_advanced_submission_schema_cache_key(
+        self, version_uid: str, url: Optional[str] = None
+    ) -> str:
+        features_hash = json_hash([self.advanced_features, url])
+        return (
+            f'advanced_submission_schema:{self.pk}:{features_hash}:'
+            f'{version_uid}'
+        )
+
+    def _get_xpaths_by_qpath(self) -> dict:
+        return {
+            row['$qpath']: row['$xpath']
+            for row in self.content.get('survey', [])
+            if '$qpath' in row and '$xpath' in row
+        }
+
     def get_filters_for_partial_perm(
         self, user_id: int, perm: str = PERM_VIEW_SUBMISSIONS
     ) -> Union[list, None]:
@@ -864,6 +969,10 @@ class Asset(ObjectPermissionMixin,
                 *args,
                 **kwargs
             )
+            if self.__metadata_facets_need_update(update_fields):
+                self.update_metadata_facets()
+            if self.__search_document_needs_update(update_fields):
+                self.update_search_documents(Asset.all_objects.filter(pk=self.pk))
             return
 
         update_content_field = update_fields and 'content' in update_fields
@@ -950,6 +1059,19 @@ class Asset(ObjectPermissionMixin,
         ):
             self._populate_report_styles()
 
+        # Paired data files only need to be synchronized with the deployment
+        # back end when paired data or the deployment itself have changed
+        sync_paired_data_files = (
+            '_stored_data_key' in self._deployment_data
+            or (
+                (not update_fields or 'paired_data' in update_fields)
+                and (
+                    self.__paired_data_copy is None
+                    or self.paired_data != self.__paired_data_copy
+                )
+            )
+        )
+
         # Ensure `_deployment_data` is not saved directly
         try:
             stored_data_key = self._deployment_data['_stored_data_key']
@@ -973,6 +1095,12 @@ class Asset(ObjectPermissionMixin,
             **kwargs
         )
 
+        if self.__metadata_facets_need_update(update_fields):
+            self.update_metadata_facets()
+
+        if self.__search_document_needs_update(update_fields):
+            self.update_search_documents(Asset.all_objects.filter(pk=self.pk))
+
         # Update languages for parent and previous parent.
         # e.g. if a survey has been moved from one collection to another,
         # we want both collections to be updated.
@@ -999,8 +1127,18 @@ class Asset(ObjectPermissionMixin,
                 # children.
                 self.parent.update_languages()
 
-        if self.has_deployment:
-            self.deployment.sync_media_files(AssetFile.PAIRED_DATA)
+        if sync_paired_data_files:
+            if not update_fields or 'paired_data' in update_fields:
+                # Paired data are synchronized only once the transaction is
+                # committed, a rolled back save must be synchronized again
+                paired_data_copy = copy.deepcopy(self.paired_data)
+
+                def _refresh_paired_data_copy():
+                    self.__paired_data_copy = paired_data_copy
+
+                transaction.on_commit(_refresh_paired_data_copy)
+            if self.has_deployment:
+                self.sync_paired_data_files_async()
 
         if create_version:
             self.create_version()
@@ -1082,9 +1220,10 @@ class Asset(ObjectPermissionMixin,
             )
             instances = self.get_advanced_feature_instances()
             compiled_content = {**sub.content}
+            edits = remove_duplicate_auto_requests(sub.content, content)
             for instance in instances:
                 compiled_content = instance.compile_revised_record(
-                    compiled_content, edits=content
+                    compiled_content, edits=edits
                 )
             sub.content = compiled_content
             sub.save()
@@ -1137,6 +1276,92 @@ class Asset(ObjectPermissionMixin,
         self.summary['languages'] = languages
         self.save(update_fields=['summary'])
 
+    def update_metadata_facets(self):
+        """
+        Synchronize `AssetMetadataFacet` rows with `summary` and `settings`.
+        They are used to build the `metadata` block of the asset list without
+        reading the JSON of every asset.
+        """
+        facets = set()
+
+        for language in self.summary.get('languages') or []:
+            if language:
+                facets.add((AssetMetadataFacet.LANGUAGE, language, ''))
+
+        for facet in [AssetMetadataFacet.COUNTRY, AssetMetadataFacet.SECTOR]:
+            try:
+                value = self.settings[facet]['value']
+                label = self.settings[facet]['label']
+            except (KeyError, TypeError):
+                pass
+            else:
+                if value:
+                    facets.add((facet, value, label))
+
+        if organization := self.settings.get('organization'):
+            facets.add((AssetMetadataFacet.ORGANIZATION, organization, ''))
+
+        existing_facets = set(
+            self.metadata_facets.values_list('facet', 'value', 'label')
+        )
+        if facets == existing_facets:
+            return
+
+        self.metadata_facets.all().delete()
+        AssetMetadataFacet.objects.bulk_create(
+            [
+                AssetMetadataFacet(
+                    asset=self, facet=facet, value=value, label=label
+                )
+                for facet, value, label in facets
+            ]
+        )
+
+    @staticmethod
+    def get_search_document() -> Concat:
+        """
+        Return the expression of `search_document`.
+
+        The document concatenates the name, the owner's username, the
+        description, the summary, the tags and the uid, i.e. the fields the
+        asset list used to look into one by one when no field is specified in
+        the search query. Fields are separated by line breaks to prevent
+        matches across two of them.
+        """
+        tag_names = (
+            TaggedItem.objects.filter(
+                content_type=ContentType.objects.get_for_model(Asset),
+                object_id=OuterRef('pk'),
+            )
+            .order_by()
+            .values('object_id')
+            .annotate(names=StringAgg('tag__name', delimiter='\n'))
+            .values('names')
+        )
+        username = User.objects.filter(pk=OuterRef('owner_id')).values(
+            'username'
+        )
+        fields = [
+            F('name'),
+            Subquery(username),
+            KeyTextTransform('description', 'settings'),
+            F('summary'),
+            Subquery(tag_names),
+            F('uid'),
+        ]
+        separated_fields = []
+        for field in fields:
+            separated_fields.extend([field, Value('\n')])
+
+        return Concat(*separated_fields[:-1], output_field=models.TextField())
+
+    @classmethod
+    def update_search_documents(cls, queryset: models.QuerySet) -> int:
+        """
+        Rebuild `search_document` of assets of `queryset` in a single query
+        """
+        return queryset.update(search_document=cls.get_search_document())
+
     def validate_advanced_features(self):
         if self.advanced_features is None:
             self.advanced_features = {}
@@ -1357,15 +1582,31 @@ class Asset(ObjectPermissionMixin,
         elif perm in self.CONTRADICTORY_PERMISSIONS.get(PERM_PARTIAL_SUBMISSIONS):
             clean_up_table()
 
+    @staticmethod
+    def __metadata_facets_need_update(update_fields: Optional[list]) -> bool:
+        return not update_fields or bool(
+            {'settings', 'summary'}.intersection(update_fields)
+        )
+
+    @staticmethod
+    def __search_document_needs_update(update_fields: Optional[list]) -> bool:
+        return not update_fields or bool(
+            {'name', 'owner', 'settings', 'summary', 'uid'}.intersection(
+                update_fields
+            )
+        )
+
     def __copy_hidden_fields(self, fields: Optional[list] = None):
         """
-        Save a copy of `parent_id` and `_deployment_data` for these purposes
-        `save()` respectively.
+        Save a copy of `parent_id`, `_deployment_data` and `paired_data` for
+        these purposes in `save()` respectively.
 
         - `self.__parent_id_copy` is used to detect whether asset is linked a
            different parent
         - `self.__deployment_data_copy` is used to detect whether
           `_deployment_data` has been altered directly
+        - `self.__paired_data_copy` is used to detect whether paired data
+          files need to be synchronized with the deployment back end
         """
 
         # When fields are deferred, Django instantiates another copy
@@ -1387,6 +1628,11 @@ class Asset(ObjectPermissionMixin,
         ):
             self.__deployment_data_copy = copy.deepcopy(
                 self._deployment_data)
+        if (
+            fields is None and 'paired_data' not in self.get_deferred_fields()
+            or fields and 'paired_data' in fields
+        ):
+            self.__paired_data_copy = copy.deepcopy(self.paired_data)
 
 
 class UserAssetSubscription(models.Model):
@@ -0,0 +1,31 @@
+# coding: utf-8
+from django.db import models
+
+
+class AssetMetadataFacet(models.Model):
+    """
+    Materialized values of the asset metadata (i.e. languages, countries,
+    sectors and organizations) used to build the `metadata` block of the asset
+    list. Rows are maintained on `Asset.save()`.
+    """
+    LANGUAGE = 'language'
+    COUNTRY = 'country'
+    SECTOR = 'sector'
+    ORGANIZATION = 'organization'
+
+    FACET_CHOICES = (
+        (LANGUAGE, LANGUAGE),
+        (COUNTRY, COUNTRY),
+        (SECTOR, SECTOR),
+        (ORGANIZATION, ORGANIZATION),
+    )
+
+    asset = models.ForeignKey(
+        'Asset', related_name='metadata_facets', on_delete=models.CASCADE
+    )
+    facet = models.CharField(max_length=20, choices=FACET_CHOICES)
+    value = models.TextField()
+    label = models.TextField(blank=True, default='')
+
+    def __str__(self):
+        return f'{self.facet}: {self.value}'
@@ -1,7 +1,12 @@
 # coding: utf-8
 # 😬
 import copy
+import json
+from importlib.metadata import PackageNotFoundError, version
+from typing import Optional
 
+from django.conf import settings
+from django.core.cache import cache
 from django.db import models
 from rest_framework.reverse import reverse
 
@@ -19,6 +24,20 @@ from kpi.utils.models import DjangoModelABCMetaclass
 from kpi.utils.pyxform_compatibility import allow_choice_duplicates
 
 
+def _get_package_version(package: str) -> Optional[str]:
+    try:
+        return version(package)
+    except PackageNotFoundError:
+        return None
+
+
+# Compiled XForms must not survive an upgrade of formpack or pyxform
+XFORM_COMPILER_VERSIONS = [
+    _get_package_version('formpack'),
+    _get_package_version('pyxform'),
+]
+
+
 class AbstractFormList(
     OpenRosaFormListInterface, metaclass=DjangoModelABCMetaclass
 ):
@@ -204,6 +223,14 @@ class AssetSnapshot(
                                      'name': 'prepended_note',
                                      'label': _label})
 
+        # Identical sources (e.g. repeated previews, clones) compile to the
+        # same XForm, let's skip pyxform when it has already been done
+        cache_key = self._get_xform_cache_key(
+            source, root_node_name, id_string, form_title
+        )
+        if cached_xform := cache.get(cache_key):
+            return cached_xform['xml'], cached_xform['details']
+
         source_copy = copy.deepcopy(source)
         self._expand_kobo_qs(source_copy)
         self._populate_fields_with_autofields(source_copy)
@@ -230,6 +257,11 @@ class AssetSnapshot(
                 'status': 'success',
                 'warnings': warnings,
             })
+            cache.set(
+                cache_key,
+                {'xml': xml, 'details': details},
+                settings.XFORM_CACHE_TIMEOUT,
+            )
         except Exception as err:
             err_message = str(err)
             logging.error('Failed to generate xform for asset', extra={
@@ -247,3 +279,19 @@ class AssetSnapshot(
                 'warnings': warnings,
             })
         return xml, details
+
+    @staticmethod
+    def _get_xform_cache_key(
+        source: dict, root_node_name: str, id_string: str, form_title: str
+    ) -> str:
+        hashable = json.dumps(
+            [
+                XFORM_COMPILER_VERSIONS,
+                source,
+                root_node_name,
+                id_string,
+                form_title,
+            ],
+            sort_keys=True,
+        )
+        return f'xform:{calculate_hash(hashable.encode())}'
@@ -492,10 +492,10 @@ class ProjectViewExportTask(ImportExportTask):
         )
         absolute_filepath = self.get_absolute_filepath(filename)
 
-        buff = create_project_view_export(export_type, self.user.username, view)
-
         with self.result.storage.open(absolute_filepath, 'wb') as output_file:
-            output_file.write(buff.read().encode())
+            create_project_view_export(
+                export_type, self.user.username, view, output_file
+            )
 
         self.result = absolute_filepath
         self.save()
@@ -1,26 +1,276 @@
 # coding: utf-8
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
 from collections import OrderedDict
-from typing import Union
+from typing import Iterable, Union
 
+from bson import json_util
 from django.conf import settings
 from django.db.models.query import QuerySet
+from django.utils.translation import gettext_lazy as t
 from django_request_cache import cache_for_request
+from rest_framework import serializers
+from rest_framework.exceptions import NotFound
 from rest_framework.pagination import (
+    BasePagination,
     LimitOffsetPagination,
     PageNumberPagination,
 )
 from rest_framework.response import Response
 from rest_framework.reverse import reverse_lazy
 from rest_framework.serializers import SerializerMethodField
+from rest_framework.utils.urls import replace_query_param
 
 
 class DataPagination(LimitOffsetPagination):
     """
     Pagination class for submissions.
+
+    `is_count_exact` must be set by the view; `count` may be an estimate,
+    depending on `settings.SUBMISSION_COUNT_STRATEGY`.
     """
     default_limit = settings.SUBMISSION_LIST_LIMIT
     offset_query_param = 'start'
     max_limit = settings.SUBMISSION_LIST_LIMIT
+    is_count_exact = True
+
+    def get_paginated_response(self, data):
+        return Response(
+            OrderedDict(
+                [
+                    ('count', self.count),
+                    ('is_count_exact', self.is_count_exact),
+                    ('next', self.get_next_link()),
+                    ('previous', self.get_previous_link()),
+                    ('results', data),
+                ]
+            )
+        )
+
+    def get_paginated_response_schema(self, schema):
+        response_schema = super().get_paginated_response_schema(schema)
+        response_schema['properties']['is_count_exact'] = {
+            'type': 'boolean',
+            'example': True,
+        }
+        return response_schema
+
+
+class DataCursorPagination(BasePagination):
+    """
+    Keyset pagination for submissions.
+
+    Opt-in alternative to `DataPagination`, enabled with the `cursor` query
+    parameter (empty for the first page). Instead of skipping `start`
+    documents, each page is retrieved with a range condition on the sort key
+    (and `_id` as tie-breaker), so deep pages cost the same as the first one.
+    No total count is returned.
+
+    `next` and `previous` links carry an opaque cursor which encodes the
+    position of the last (or first) submission of the current page.
+    """
+    cursor_query_param = 'cursor'
+    default_limit = settings.SUBMISSION_LIST_LIMIT
+
+    invalid_cursor_message = t('Invalid cursor')
+
+    def __init__(self):
+        self.base_url = None
+        self.has_next = False
+        self.has_previous = False
+        self.keyset = None
+        self.limit = self.default_limit
+        self.next_position = None
+        self.previous_position = None
+        self.sort_direction = 1
+        self.sort_key = '_id'
+
+    def decode_cursor(self, request) -> dict:
+        """
+        Return the position encoded in the `cursor` query parameter.
+        An empty cursor points to the first page.
+        """
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return {'value': None, 'id': None, 'reverse': False}
+
+        try:
+            position = json.loads(
+                urlsafe_b64decode(encoded.encode('ascii')).decode(),
+                object_hook=json_util.object_hook,
+            )
+            keyset = {
+                'value': position['v'],
+                'id': int(position['id']),
+                'reverse': bool(position.get('r', False)),
+            }
+        except (TypeError, ValueError, KeyError, UnicodeError):
+            raise NotFound(self.invalid_cursor_message)
+
+        return keyset
+
+    def encode_cursor(self, position: dict) -> str:
+        payload = json_util.dumps(
+            {
+                'v': position['value'],
+                'id': position['id'],
+                'r': position['reverse'],
+            }
+        )
+        encoded = urlsafe_b64encode(payload.encode()).decode('ascii')
+        return replace_query_param(
+            self.base_url, self.cursor_query_param, encoded
+        )
+
+    def get_mongo_query_params(self, request, filters: dict) -> dict:
+        """
+        Update `filters` (the parameters passed to
+        `BaseDeploymentBackend.get_submissions()`) to retrieve the page
+        pointed out by the cursor.
+        `filters['limit']` is expected to be already validated.
+        """
+        self.base_url = request.build_absolute_uri()
+        self.limit = filters.get('limit', self.default_limit)
+        self.keyset = self.decode_cursor(request)
+
+        sort = filters.get('sort') or {}
+        if isinstance(sort, str):
+            try:
+                sort = json.loads(sort, object_hook=json_util.object_hook)
+            except ValueError:
+                raise serializers.ValidationError(
+                    {'sort': t('Value must be valid JSON.')}
+                )
+
+        if isinstance(sort, dict) and len(sort) == 1:
+            self.sort_key, sort_direction = list(sort.items())[0]
+            try:
+                self.sort_direction = 1 if int(sort_direction) > 0 else -1
+            except (TypeError, ValueError):
+                raise serializers.ValidationError(
+                    {'sort': t('Sort direction must be 1 or -1.')}
+                )
+
+        fields = filters.get('fields')
+        if fields:
+            if isinstance(fields, str):
+                try:
+                    fields = json.loads(fields)
+                except ValueError:
+                    raise serializers.ValidationError(
+                        {'fields': t('Value must be valid JSON.')}
+                    )
+            # The position of the submissions at the edges of the page needs
+            # the sort key and `_id` to be retrieved
+            fields = list(fields)
+            for field in ['_id', self.sort_key]:
+                if field not in fields:
+                    fields.append(field)
+            filters['fields'] = fields
+
+        filters.update(
+            {
+                'sort': {self.sort_key: self.sort_direction},
+                'keyset': self.keyset,
+                # Fetch one more submission to know whether there is a next
+                # (or previous) page
+                'limit': self.limit + 1,
+                'skip_count': True,
+            }
+        )
+        return filters
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        return self.encode_cursor(self.next_position)
+
+    def get_paginated_response(self, data):
+        return Response(
+            OrderedDict(
+                [
+                    ('next', self.get_next_link()),
+                    ('previous', self.get_previous_link()),
+                    ('results', data),
+                ]
+            )
+        )
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {
+                    'type': 'string',
+                    'nullable': True,
+                },
+                'previous': {
+                    'type': 'string',
+                    'nullable': True,
+                },
+                'results': schema,
+            },
+        }
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        return self.encode_cursor(self.previous_position)
+
+    def paginate_submissions(self, submissions: Iterable) -> list:
+        """
+        Consume the submissions returned by the deployment back end, which
+        contain at most `limit + 1` items, and compute the positions of the
+        adjacent pages.
+        """
+        page = list(submissions)
+        has_more = len(page) > self.limit
+        page = page[:self.limit]
+        is_reversed = self.keyset['reverse']
+
+        if is_reversed:
+            # Submissions have been retrieved in the opposite order
+            page.reverse()
+            self.has_previous = has_more
+            self.has_next = True
+        else:
+            self.has_next = has_more
+            self.has_previous = self.keyset['id'] is not None
+
+        if not page:
+            # No positions to point to
+            self.has_next = False
+            self.has_previous = False
+            return page
+
+        self.previous_position = self._get_position(page[0], reverse=True)
+        self.next_position = self._get_position(page[-1], reverse=False)
+        return page
+
+    def _get_position(self, submission: dict, reverse: bool) -> dict:
+        return {
+            'value': self._get_sort_value(submission),
+            'id': submission['_id'],
+            'reverse': reverse,
+        }
+
+    def _get_sort_value(self, submission: dict):
+        if self.sort_key == '_id':
+            return submission['_id']
+
+        try:
+            return submission[self.sort_key]
+        except KeyError:
+            pass
+
+        # Reserved nested attributes (e.g. `_validation_status.uid`) are
+        # stored as sub-documents
+        value = submission
+        for part in self.sort_key.split('.'):
+            if not isinstance(value, dict):
+                return None
+            value = value.get(part)
+        return value
 
 
 class Paginated(LimitOffsetPagination):
@@ -1,3 +1,5 @@
+from typing import Union
+
 from django.contrib.auth.models import User
 from django.conf import settings
 from django.db.models import Sum, Q, OuterRef, Subquery, QuerySet
@@ -8,11 +10,8 @@ from rest_framework.fields import empty
 
 from kobo.apps.organizations.models import Organization
 from kobo.apps.stripe.constants import ACTIVE_STRIPE_STATUSES
-from kobo.apps.trackers.models import NLPUsageCounter
-from kpi.deployment_backends.kc_access.shadow_models import (
-    KobocatXForm,
-    KobocatDailyXFormSubmissionCounter,
-)
+from kobo.apps.trackers.utils import get_usage_totals
+from kpi.deployment_backends.kc_access.shadow_models import KobocatXForm
 from kpi.deployment_backends.kobocat_backend import KobocatDeploymentBackend
 from kpi.models.asset import Asset
 
@@ -49,54 +48,124 @@ class AssetUsageSerializer(serializers.HyperlinkedModelSerializer):
     def __init__(self, instance=None, data=empty, **kwargs):
         super().__init__(instance=instance, data=data, **kwargs)
 
-        self._now = timezone.now().date()
+        self._start_dates = self.get_start_dates()
 
     def get_nlp_usage_current_month(self, asset):
-        start_date = self._now.replace(day=1)
-        return self._get_nlp_tracking_data(asset, start_date)
+        return self._get_nlp_tracking_data(asset, 'current_month')
 
     def get_nlp_usage_current_year(self, asset):
-        start_date = self._now.replace(day=1, month=1)
-        return self._get_nlp_tracking_data(asset, start_date)
+        return self._get_nlp_tracking_data(asset, 'current_year')
 
     def get_nlp_usage_all_time(self, asset):
-        return self._get_nlp_tracking_data(asset)
+        return self._get_nlp_tracking_data(asset, 'all_time')
 
     def get_submission_count_current_month(self, asset):
-        if not asset.has_deployment:
-            return 0
-        start_date = self._now.replace(day=1)
-        return asset.deployment.submission_count_since_date(start_date)
+        return self._get_submission_count(asset, 'current_month')
 
     def get_submission_count_current_year(self, asset):
-        if not asset.has_deployment:
-            return 0
-        start_date = self._now.replace(day=1, month=1)
-        return asset.deployment.submission_count_since_date(start_date)
+        return self._get_submission_count(asset, 'current_year')
 
     def get_submission_count_all_time(self, asset):
-        if not asset.has_deployment:
-            return 0
-
-        return asset.deployment.submission_count_since_date()
+        return self._get_submission_count(asset, 'all_time')
 
     def get_storage_bytes(self, asset):
         # Get value from asset deployment (if it has deployment)
         if not asset.has_deployment:
             return 0
 
-        return asset.deployment.attachment_storage_bytes
+        try:
+            return self.context['storage_bytes_per_asset'][asset.pk]
+        except KeyError:
+            return asset.deployment.attachment_storage_bytes
+
+    @staticmethod
+    def get_start_dates() -> dict:
+        now = timezone.now().date()
+        return {
+            'current_month': now.replace(day=1),
+            'current_year': now.replace(day=1, month=1),
+            'all_time': None,
+        }
+
+    @classmethod
+    def get_usage_per_asset(cls, assets: list[Asset]) -> dict:
+        """
+        Retrieve the usage of all `assets` with a few queries, instead of
+        several queries per asset. The returned dict is meant to be added to
+        the serializer context.
+        """
+        start_dates = cls.get_start_dates()
+        deployed_assets = [asset for asset in assets if asset.has_deployment]
+        kc_assets = [
+            asset
+            for asset in deployed_assets
+            if isinstance(asset.deployment, KobocatDeploymentBackend)
+        ]
+        xforms_per_asset = KobocatDeploymentBackend.xforms_per_asset(kc_assets)
+        submission_counts_per_xform = (
+            KobocatDeploymentBackend.submission_counts_per_xform(
+                [xform.pk for xform in xforms_per_asset.values()], start_dates
+            )
+        )
+        no_submissions = dict.fromkeys(start_dates, 0)
+
+        # Assets deployed to KoBoCAT but linked to an unexpected XForm count
+        # for nothing, like with `KobocatDeploymentBackend.xform`
+        storage_bytes_per_asset = {}
+        submission_counts_per_asset = {}
+        for asset in kc_assets:
+            if not (xform := xforms_per_asset.get(asset.pk)):
+                storage_bytes_per_asset[asset.pk] = 0
+                submission_counts_per_asset[asset.pk] = no_submissions
+                continue
+            storage_bytes_per_asset[asset.pk] = xform.attachment_storage_bytes
+            submission_counts_per_asset[asset.pk] = (
+                submission_counts_per_xform.get(xform.pk, no_submissions)
+            )
+
+        return {
+            'nlp_usage_per_asset': (
+                KobocatDeploymentBackend.nlp_tracking_data_per_asset(
+                    [asset.pk for asset in deployed_assets], start_dates
+                )
+            ),
+            'storage_bytes_per_asset': storage_bytes_per_asset,
+            'submission_counts_per_asset': submission_counts_per_asset,
+        }
 
-    def _get_nlp_tracking_data(self, asset, start_date=None):
+    def _get_nlp_tracking_data(self, asset, period):
         if not asset.has_deployment:
             return {
                 'total_nlp_asr_seconds': 0,
                 'total_nlp_mt_characters': 0,
             }
+
+        if 'nlp_usage_per_asset' in self.context:
+            try:
+                return self.context['nlp_usage_per_asset'][asset.pk][period]
+            except KeyError:
+                return {
+                    'total_nlp_asr_seconds': 0,
+                    'total_nlp_mt_characters': 0,
+                }
+
         return KobocatDeploymentBackend.nlp_tracking_data(
-            asset_ids=[asset.id], start_date=start_date
+            asset_ids=[asset.id], start_date=self._start_dates[period]
         )
 
+    def _get_submission_count(self, asset, period):
+        if not asset.has_deployment:
+            return 0
+
+        try:
+            return self.context['submission_counts_per_asset'][asset.pk][
+                period
+            ]
+        except KeyError:
+            return asset.deployment.submission_count_since_date(
+                self._start_dates[period]
+            )
+
 
 class ServiceUsageSerializer(serializers.Serializer):
     total_nlp_usage = serializers.SerializerMethodField()
@@ -175,34 +244,24 @@ class ServiceUsageSerializer(serializers.Serializer):
             return self._anchor_date.replace(year=self._now.year - 1)
         return self._anchor_date.replace(year=self._now.year)
 
-    def _filter_by_user(self, user_ids: list) -> Q:
+    def _filter_by_user(self, user_ids: Union[list, QuerySet]) -> Q:
         """
-        Turns a list of user ids into a query object to filter by
+        Turns a list (or a subquery) of user ids into a query object to
+        filter by
         """
         return Q(user_id__in=user_ids)
 
-    def _get_nlp_user_counters(self, month_filter, year_filter):
-        nlp_tracking = NLPUsageCounter.objects.only(
-            'date', 'total_asr_seconds', 'total_mt_characters'
-        ).filter(self._user_id_query).aggregate(
-            asr_seconds_current_year=Coalesce(
-                Sum('total_asr_seconds', filter=year_filter), 0
-            ),
-            mt_characters_current_year=Coalesce(
-                Sum('total_mt_characters', filter=year_filter), 0
-            ),
-            asr_seconds_current_month=Coalesce(
-                Sum('total_asr_seconds', filter=month_filter), 0
-            ),
-            mt_characters_current_month=Coalesce(
-                Sum('total_mt_characters', filter=month_filter), 0
-            ),
-            asr_seconds_all_time=Coalesce(Sum('total_asr_seconds'), 0),
-            mt_characters_all_time=Coalesce(Sum('total_mt_characters'), 0),
-        )
-
-        for nlp_key, count in nlp_tracking.items():
-            self._total_nlp_usage[nlp_key] = count if count is not None else 0
+    def _get_kobocat_user_id_query(self) -> Q:
+        """
+        KoBoCAT tables live in another database, where the subquery on
+        organization users cannot run. It is evaluated once instead.
+        """
+        if self._kobocat_user_id_query is None:
+            user_ids = self._user_ids
+            if isinstance(user_ids, QuerySet):
+                user_ids = list(user_ids)
+            self._kobocat_user_id_query = self._filter_by_user(user_ids)
+        return self._kobocat_user_id_query
 
     def _get_organization_details(self, user_id: int):
         # Get the organization ID from the request
@@ -231,23 +290,23 @@ class ServiceUsageSerializer(serializers.Serializer):
 
         if settings.STRIPE_ENABLED:
             # if the user is in an organization and has an enterprise plan, get all org users
-            # we evaluate this queryset instead of using it as a subquery because it's referencing
-            # fields from the auth_user tables on kpi *and* kobocat, making getting results in a
-            # single query not feasible until those tables are combined
-            user_ids = list(
-                User.objects.filter(
-                    organizations_organization__id=organization_id,
-                    organizations_organization__djstripe_customers__subscriptions__status__in=ACTIVE_STRIPE_STATUSES,
-                    organizations_organization__djstripe_customers__subscriptions__items__price__product__metadata__has_key='plan_type',
-                    organizations_organization__djstripe_customers__subscriptions__items__price__product__metadata__plan_type='enterprise',
-                ).values_list('pk', flat=True)[:settings.ORGANIZATION_USER_LIMIT]
-            )
-            if user_ids:
+            # it is used as a subquery on KPI tables, and evaluated for KoBoCAT
+            # tables, see `_get_kobocat_user_id_query()`
+            user_ids = User.objects.filter(
+                organizations_organization__id=organization_id,
+                organizations_organization__djstripe_customers__subscriptions__status__in=ACTIVE_STRIPE_STATUSES,
+                organizations_organization__djstripe_customers__subscriptions__items__price__product__metadata__has_key='plan_type',
+                organizations_organization__djstripe_customers__subscriptions__items__price__product__metadata__plan_type='enterprise',
+            ).values_list('pk', flat=True)[:settings.ORGANIZATION_USER_LIMIT]
+            if user_ids.exists():
+                self._user_ids = user_ids
                 self._user_id_query = self._filter_by_user(user_ids)
 
     def _get_per_asset_usage(self, user):
         self._user_id = user.pk
-        self._user_id_query = self._filter_by_user([self._user_id])
+        self._user_ids = [self._user_id]
+        self._user_id_query = self._filter_by_user(self._user_ids)
+        self._kobocat_user_id_query = None
         # get the billing data and list of organization users (if applicable)
         self._get_organization_details(self._user_id)
 
@@ -256,15 +315,7 @@ class ServiceUsageSerializer(serializers.Serializer):
         self._current_month_start = self._get_current_month_start_date()
         self._current_year_start = self._get_current_year_start_date()
 
-        current_month_filter = Q(
-            date__range=[self._current_month_start, self._now]
-        )
-        current_year_filter = Q(
-            date__range=[self._current_year_start, self._now]
-        )
-
-        self._get_submission_counters(current_month_filter, current_year_filter)
-        self._get_nlp_user_counters(current_month_filter, current_year_filter)
+        self._get_usage_counters()
 
     def _get_storage_usage(self):
         """
@@ -274,7 +325,7 @@ class ServiceUsageSerializer(serializers.Serializer):
         """
         xforms = KobocatXForm.objects.only('attachment_storage_bytes', 'id').exclude(
             pending_delete=True
-        ).filter(self._user_id_query)
+        ).filter(self._get_kobocat_user_id_query())
 
         total_storage_bytes = xforms.aggregate(
             bytes_sum=Coalesce(Sum('attachment_storage_bytes'), 0),
@@ -282,25 +333,27 @@ class ServiceUsageSerializer(serializers.Serializer):
 
         self._total_storage_bytes = total_storage_bytes['bytes_sum'] or 0
 
-    def _get_submission_counters(self, month_filter, year_filter):
+    def _get_usage_counters(self):
         """
-        Calculate submissions for all users' projects even their deleted ones
+        Calculate submissions and NLP usage for all users' projects even their
+        deleted ones
 
         Users are represented by their ids with `self._user_ids`
         """
-        submission_count = KobocatDailyXFormSubmissionCounter.objects.only(
-            'counter', 'user_id'
-        ).filter(self._user_id_query).aggregate(
-            all_time=Coalesce(Sum('counter'), 0),
-            current_year=Coalesce(
-                Sum('counter', filter=year_filter), 0
-            ),
-            current_month=Coalesce(
-                Sum('counter', filter=month_filter), 0
-            ),
+        usage = get_usage_totals(
+            self._user_id_query,
+            {
+                'current_month': self._current_month_start,
+                'current_year': self._current_year_start,
+                'all_time': None,
+            },
+            kobocat_user_filter=self._get_kobocat_user_id_query(),
         )
-
-        for submission_key, count in submission_count.items():
-            self._total_submission_count[submission_key] = (
-                count if count is not None else 0
-            )
+        for period, totals in usage.items():
+            self._total_submission_count[period] = totals['submission_count']
+            self._total_nlp_usage[f'asr_seconds_{period}'] = totals[
+                'asr_seconds'
+            ]
+            self._total_nlp_usage[f'mt_characters_{period}'] = totals[
+                'mt_characters'
+            ]
@@ -2,11 +2,17 @@ from typing import Union
 
 from django.conf import settings
 from django.contrib.auth.models import User, AnonymousUser
-from django.db.models.signals import post_save, post_delete
+from django.contrib.contenttypes.models import ContentType
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_migrate,
+    post_save,
+)
 
 from django.dispatch import receiver
 from rest_framework.authtoken.models import Token
-from taggit.models import Tag
+from taggit.models import Tag, TaggedItem
 
 from kobo.apps.hook.models.hook import Hook
 from kpi.constants import PERM_ADD_SUBMISSIONS
@@ -19,7 +25,8 @@ from kpi.deployment_backends.kc_access.utils import (
     kc_transaction_atomic,
 )
 from kpi.exceptions import DeploymentNotFound
-from kpi.models import Asset, TagUid
+from kpi.models import Asset, ObjectPermission, TagUid
+from kpi.utils.cache import invalidate_cached_permissions
 from kpi.utils.object_permission import post_assign_perm, post_remove_perm
 from kpi.utils.permissions import (
     grant_default_model_level_perms,
@@ -88,6 +95,48 @@ def tag_uid_post_save(sender, instance, created, raw, **kwargs):
     TagUid.objects.get_or_create(tag=instance)
 
 
+@receiver(post_save, sender=Tag)
+def update_tagged_assets_search_documents(
+    sender, instance, created, raw, **kwargs
+):
+    """
+    Keep the search documents of tagged assets in sync with tag names
+    """
+    if raw or created:
+        return
+    Asset.update_search_documents(Asset.all_objects.filter(tags=instance))
+
+
+@receiver(m2m_changed, sender=TaggedItem)
+def update_asset_search_document_on_tags_change(
+    sender, instance, action, **kwargs
+):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if isinstance(instance, Asset):
+        Asset.update_search_documents(Asset.all_objects.filter(pk=instance.pk))
+
+
+@receiver(post_save, sender=User)
+def update_owned_assets_search_documents(
+    sender, instance, created, raw, update_fields, **kwargs
+):
+    """
+    Keep the search documents of assets in sync with the username of their
+    owner
+    """
+    if raw or created:
+        return
+    if update_fields and 'username' not in update_fields:
+        # e.g. `last_login` is updated on each login
+        return
+    Asset.update_search_documents(
+        Asset.all_objects.filter(owner=instance).exclude(
+            search_document=Asset.get_search_document()
+        )
+    )
+
+
 @receiver(post_save, sender=Hook)
 def update_kc_xform_has_kpi_hooks(sender, instance, **kwargs):
     """
@@ -110,6 +159,30 @@ def post_delete_asset(sender, instance, **kwargs):
             parent.update_languages()
 
 
+@receiver(post_save, sender=ObjectPermission)
+@receiver(post_delete, sender=ObjectPermission)
+def invalidate_cached_object_permissions(sender, instance, **kwargs):
+    """
+    Bump the generations of the cached permissions of the asset and the user
+    each time one of their permissions is assigned or removed (e.g. by
+    `assign_perm()`, `remove_perm()`, `copy_permissions_from()`, or when partial
+    permissions are updated)
+    """
+    invalidate_cached_permissions(
+        asset=[instance.asset_id], user=[instance.user_id]
+    )
+
+
+@receiver(post_migrate)
+def invalidate_cached_content_type_permissions(sender, **kwargs):
+    """
+    Permissions (and their code names) only change after migrations
+    """
+    invalidate_cached_permissions(
+        content_type=ContentType.objects.values_list('pk', flat=True)
+    )
+
+
 @receiver(post_assign_perm, sender=Asset)
 def post_assign_asset_perm(
     sender,
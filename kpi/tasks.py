@@ -3,6 +3,7 @@ import constance
 import requests
 from django.conf import settings
 from django.contrib.auth.models import User
+from django.core.cache import cache
 from django.core.mail import send_mail
 from django.core.management import call_command
 
@@ -11,6 +12,7 @@ from kobo.celery import celery_app
 from kpi.constants import LIMIT_HOURS_23
 from kpi.maintenance_tasks import remove_old_asset_snapshots
 from kpi.models.asset import Asset
+from kpi.models.asset_file import AssetFile
 from kpi.models.import_export_task import (
     ExportTask,
     ImportTask,
@@ -18,6 +20,39 @@ from kpi.models.import_export_task import (
 )
 
 
+@celery_app.task(
+    soft_time_limit=settings.CELERY_LONG_RUNNING_TASK_SOFT_TIME_LIMIT,
+    time_limit=settings.CELERY_LONG_RUNNING_TASK_TIME_LIMIT,
+)
+def bulk_update_submissions_in_background(
+    asset_uid: str, user_id: int, data: dict, task_uid: str
+):
+    asset = Asset.objects.get(uid=asset_uid)
+    user = User.objects.get(pk=user_id)
+    try:
+        asset.deployment.bulk_update_submissions(data, user, task_uid=task_uid)
+    except Exception as e:
+        asset.deployment.set_bulk_update_progress(
+            task_uid,
+            user,
+            status=asset.deployment.BULK_UPDATE_STATUS_ERROR,
+            error=str(e),
+        )
+        raise
+
+
+@celery_app.task(
+    soft_time_limit=settings.CELERY_LONG_RUNNING_TASK_SOFT_TIME_LIMIT,
+    time_limit=settings.CELERY_LONG_RUNNING_TASK_TIME_LIMIT,
+)
+def recalculate_descendants_perms_in_background(asset_uid):
+    try:
+        asset = Asset.all_objects.get(uid=asset_uid)
+    except Asset.DoesNotExist:
+        return
+    asset.recalculate_descendants_perms(run_in_background=False)
+
+
 @celery_app.task
 def import_in_background(import_task_uid):
     import_task = ImportTask.objects.get(uid=import_task_uid)
@@ -77,6 +112,19 @@ def sync_media_files(asset_uid):
     asset.deployment.sync_media_files()
 
 
+@celery_app.task
+def sync_paired_data_files(asset_uid):
+    try:
+        asset = Asset.objects.defer('content').get(uid=asset_uid)
+    except Asset.DoesNotExist:
+        return
+
+    # Let any save occurring from now on schedule another synchronization
+    cache.delete(asset.get_sync_paired_data_files_cache_key())
+    if asset.has_deployment:
+        asset.deployment.sync_media_files(AssetFile.PAIRED_DATA)
+
+
 @celery_app.task
 def enketo_flush_cached_preview(server_url, form_id):
     """
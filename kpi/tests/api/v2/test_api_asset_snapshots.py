@@ -173,6 +173,20 @@ class TestAssetSnapshotList(AssetSnapshotBase):
             assert 'X-OpenRosa-Accept-Content-Length' in response
             assert 'X-OpenRosa-Version' in response
 
+    def test_open_rosa_endpoints_support_conditional_requests(self):
+        creation_response = self._create_asset_snapshot_from_asset()
+        snapshot_uid = creation_response.data['uid']
+        self.client.login(username='someuser', password='someuser')
+        for view_name in ['assetsnapshot-form-list', 'assetsnapshot-manifest']:
+            url = reverse(self._get_endpoint(view_name), args=(snapshot_uid,))
+            response = self.client.get(url)
+            assert response.status_code == status.HTTP_200_OK
+            etag = response['ETag']
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            assert response.status_code == status.HTTP_304_NOT_MODIFIED
+            assert response['ETag'] == etag
+            assert not response.content
+
     def test_xml_renderer(self):
         """
         Make sure the API endpoint returns the same XML as the ORM
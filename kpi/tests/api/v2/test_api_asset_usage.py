@@ -5,6 +5,8 @@ from dateutil.relativedelta import relativedelta
 
 from django.conf import settings
 from django.contrib.auth.models import User
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from rest_framework import status
 
@@ -178,6 +180,39 @@ class AssetUsageAPITestCase(BaseAssetTestCase):
         assert response.data['results'][0]['submission_count_current_month'] == 2
         assert response.data['results'][0]['submission_count_all_time'] == 2
 
+    def test_nlp_usage_is_retrieved_once_per_page(self):
+        for _ in range(3):
+            self.__create_asset()
+        self.__add_nlp_trackers()
+
+        url = reverse(self._get_endpoint('asset-usage-list'))
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+
+        assert response.status_code == status.HTTP_200_OK
+        assert len(response.data['results']) == 3
+        nlp_queries = [
+            query
+            for query in ctx.captured_queries
+            if NLPUsageCounter._meta.db_table in query['sql']
+        ]
+        assert len(nlp_queries) == 1
+
+        results = {
+            result['asset']: result for result in response.data['results']
+        }
+        asset_url = reverse(
+            self._get_endpoint('asset-detail'), args=(self.asset.uid,)
+        )
+        usage = results[f'http://testserver{asset_url}']
+        assert usage['nlp_usage_all_time']['total_nlp_asr_seconds'] == 4728
+        for result in results.values():
+            if result is not usage:
+                assert result['nlp_usage_all_time'] == {
+                    'total_nlp_asr_seconds': 0,
+                    'total_nlp_mt_characters': 0,
+                }
+
     def test_no_data(self):
         """
         Test the endpoint functions when assets have no data
@@ -6,13 +6,17 @@ import json
 import os
 from io import StringIO
 
+import mock
+from django.conf import settings
 from django.contrib.auth.models import User
 from django.urls import reverse
 from django.utils import timezone
 from rest_framework import status
 
 from kobo.apps.project_views.models.project_view import ProjectView
+from kobo.apps.reports import report_data
 from kpi.constants import (
+    ASSET_TYPE_SURVEY,
     PERM_CHANGE_ASSET,
     PERM_CHANGE_METADATA_ASSET,
     PERM_VIEW_ASSET,
@@ -31,6 +35,7 @@ from kpi.tests.kpi_test_case import KpiTestCase
 from kpi.urls.router_api_v2 import URL_NAMESPACE as ROUTER_URL_NAMESPACE
 from kpi.utils.hash import calculate_hash
 from kpi.utils.object_permission import get_anonymous_user
+from kpi.views.v2.asset import AssetViewSet
 from kpi.utils.project_views import (
     get_region_for_view,
 )
@@ -110,6 +115,52 @@ class AssetListApiTests(BaseAssetTestCase):
         hash_response = self.client.get(hash_url)
         self.assertEqual(hash_response.data.get("hash"), expected_hash)
 
+    def test_assets_metadata(self):
+        someuser = User.objects.get(username='someuser')
+        anotheruser = User.objects.get(username='anotheruser')
+        asset = Asset.objects.create(
+            owner=someuser,
+            asset_type=ASSET_TYPE_SURVEY,
+            content={
+                'survey': [
+                    {'type': 'text', 'name': 'q1', 'label': ['Q1', 'Q1']},
+                ],
+                'translations': ['English (en)', 'French (fr)'],
+                'translated': ['label'],
+            },
+            settings={
+                'sector': {'value': 'Health', 'label': 'Health'},
+                'organization': 'Some organization',
+            },
+        )
+        Asset.objects.create(
+            owner=anotheruser,
+            asset_type=ASSET_TYPE_SURVEY,
+            settings={'organization': 'Another organization'},
+        )
+
+        with self.assertNumQueries(1):
+            metadata = AssetViewSet().get_metadata(
+                Asset.objects.filter(owner=someuser)
+            )
+        assert 'English (en)' in metadata['languages']
+        assert 'French (fr)' in metadata['languages']
+        assert ('Health', 'Health') in metadata['sectors']
+        assert 'Some organization' in metadata['organizations']
+        assert 'Another organization' not in metadata['organizations']
+
+        response = self.client.get(self.list_url, {'metadata': 'on'})
+        assert response.status_code == status.HTTP_200_OK
+        assert 'Some organization' in response.data['metadata']['organizations']
+
+        # Facets are updated when asset is saved
+        asset.settings['organization'] = 'Renamed organization'
+        asset.save()
+        response = self.client.get(self.list_url, {'metadata': 'on'})
+        organizations = response.data['metadata']['organizations']
+        assert 'Some organization' not in organizations
+        assert 'Renamed organization' in organizations
+
     def test_assets_search_query(self):
         someuser = User.objects.get(username='someuser')
         question = Asset.objects.create(
@@ -183,6 +234,33 @@ class AssetListApiTests(BaseAssetTestCase):
         results = uids_from_search_results('pk:alrighty')
         self.assertListEqual(results, [])
 
+    def test_assets_search_query_is_kept_in_sync(self):
+        someuser = User.objects.get(username='someuser')
+        asset = Asset.objects.create(
+            owner=someuser, name='survey', asset_type='survey'
+        )
+
+        def uids_from_search_results(query):
+            response = self.client.get(self.list_url, data={'q': query})
+            return [r['uid'] for r in response.data['results']]
+
+        assert uids_from_search_results('marmalade') == []
+        asset.tags.add('marmalade')
+        assert uids_from_search_results('marmalade') == [asset.uid]
+        asset.tags.remove('marmalade')
+        assert uids_from_search_results('marmalade') == []
+
+        asset.name = 'Breakfast'
+        asset.save()
+        assert uids_from_search_results('breakfast') == [asset.uid]
+
+        someuser.username = 'someone_else'
+        someuser.save()
+        assert uids_from_search_results('someone_else') == [asset.uid]
+
+        # Field-specific syntax still works
+        assert uids_from_search_results('name:Breakfast') == [asset.uid]
+
     def test_assets_ordering(self):
 
         someuser = User.objects.get(username='someuser')
@@ -994,6 +1072,64 @@ class AssetDetailApiTests(BaseAssetDetailTestCase):
         response = self.client.get(report_url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
 
+    def test_report_submissions_are_cached(self):
+        report_url = reverse(
+            self._get_endpoint('asset-reports'), kwargs={'uid': self.asset_uid}
+        )
+        self.asset.content = {
+            'survey': [
+                {
+                    'type': 'select_one',
+                    'label': 'q1',
+                    'select_from_list_name': 'iu0sl99'
+                },
+            ],
+            'choices': [
+                {'name': 'a1', 'label': ['a1'], 'list_name': 'iu0sl99'},
+                {'name': 'a3', 'label': ['a3'], 'list_name': 'iu0sl99'},
+            ]
+        }
+        self.asset.save()
+        self.asset.deploy(backend='mock', active=True)
+        submission = {
+            '__version__': self.asset.latest_deployed_version.uid,
+            'q1': 'a1',
+        }
+        self.asset.deployment.mock_submissions([copy.deepcopy(submission)])
+
+        response = self.client.get(report_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['list'][0]['data']['total_count'], 1)
+
+        # The report is served from the cache while submissions do not change
+        with mock.patch.object(
+            report_data, 'data_by_identifiers'
+        ) as patched_data_by_identifiers:
+            cached_list = report_data.get_cached_report_data(
+                self.asset, self.asset.owner
+            )
+            assert not patched_data_by_identifiers.called
+        self.assertEqual(cached_list, response.data['list'])
+
+        # New submissions void the cached report
+        self.asset.deployment.mock_submissions([copy.deepcopy(submission)])
+        response = self.client.get(report_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['list'][0]['data']['total_count'], 2)
+
+        # Submissions edited outside KPI void the cached report too
+        settings.MONGO_DB.instances.update_many(
+            {'_userform_id': self.asset.deployment.mongo_userform_id},
+            {'$set': {'q1': 'a3', '_last_edited': '2024-01-01T00:00:00'}},
+        )
+        with mock.patch.object(
+            report_data,
+            'data_by_identifiers',
+            wraps=report_data.data_by_identifiers,
+        ) as patched_data_by_identifiers:
+            report_data.get_cached_report_data(self.asset, self.asset.owner)
+            assert patched_data_by_identifiers.called
+
     def test_map_styles_field(self):
         self.check_asset_writable_json_field('map_styles')
 
@@ -2,7 +2,9 @@
 import unittest
 from mock import patch, MagicMock
 
+from django.conf import settings
 from django.contrib.auth.models import User
+from django.test import override_settings
 from django.urls import reverse
 from rest_framework import status
 from rest_framework.exceptions import ErrorDetail
@@ -17,6 +19,7 @@ from kpi.constants import (
 from kpi.models import Asset
 from kpi.tests.base_test_case import BaseAssetTestCase
 from kpi.urls.router_api_v2 import URL_NAMESPACE as ROUTER_URL_NAMESPACE
+from kpi.utils.xml import strip_nodes
 
 
 class BasePairedDataTestCase(BaseAssetTestCase):
@@ -428,6 +431,93 @@ class PairedDataExternalApiTests(BasePairedDataTestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(response.content, expected_xml)
 
+    def test_get_external_appends_new_submissions(self):
+        self.deploy_source()
+        self.source_asset.deployment.mock_submissions(
+            [
+                {'city_name': 'Montreal'},
+                {'city_name': 'Nairobi'},
+            ]
+        )
+        self.login_as_other_user('anotheruser', 'anotheruser')
+        response = self.client.get(self.external_xml_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.getvalue().count(b'<data>'), 2)
+
+        # Simulate a new submission received by KoBoCAT
+        settings.MONGO_DB.instances.insert_one(
+            {
+                '_id': 3,
+                '_userform_id': self.source_asset.deployment.mongo_userform_id,
+                'city_name': 'Lima',
+            }
+        )
+        with override_settings(PAIRED_DATA_EXPIRATION=-1):
+            with patch(
+                'kpi.views.v2.paired_data.strip_nodes', wraps=strip_nodes
+            ) as patched_strip_nodes:
+                response = self.client.get(self.external_xml_url)
+                # Only the new submission has been processed
+                self.assertEqual(patched_strip_nodes.call_count, 1)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        content = response.getvalue()
+        self.assertEqual(content.count(b'<data>'), 3)
+        self.assertIn(b'Montreal', content)
+        self.assertIn(b'Lima', content)
+
+        # Editing a submission rebuilds the whole file
+        settings.MONGO_DB.instances.update_one(
+            {'_id': 2},
+            {
+                '$set': {
+                    'city_name': 'Mombasa',
+                    '_last_edited': '2024-01-01T00:00:00',
+                }
+            },
+        )
+        with override_settings(PAIRED_DATA_EXPIRATION=-1):
+            response = self.client.get(self.external_xml_url)
+        content = response.getvalue()
+        self.assertEqual(content.count(b'<data>'), 3)
+        self.assertIn(b'Mombasa', content)
+        self.assertNotIn(b'Nairobi', content)
+
+        # Deleting a submission rebuilds the whole file
+        self.source_asset.deployment.delete_submission(1, self.someuser)
+        with override_settings(PAIRED_DATA_EXPIRATION=-1):
+            response = self.client.get(self.external_xml_url)
+        content = response.getvalue()
+        self.assertEqual(content.count(b'<data>'), 2)
+        self.assertNotIn(b'Montreal', content)
+
+    def test_get_external_not_modified(self):
+        self.deploy_source()
+        self.source_asset.deployment.mock_submissions(
+            [{'city_name': 'Montreal'}]
+        )
+        self.login_as_other_user('anotheruser', 'anotheruser')
+        response = self.client.get(self.external_xml_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        etag = response['ETag']
+
+        # The stored hash is enough to validate the client copy, the file is
+        # not read from storage
+        with patch('django.core.files.File.read') as patched_read:
+            response = self.client.get(
+                self.external_xml_url, HTTP_IF_NONE_MATCH=etag
+            )
+            patched_read.assert_not_called()
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response['ETag'], etag)
+        self.assertEqual(response.content, b'')
+
+        response = self.client.get(
+            self.external_xml_url, HTTP_IF_NONE_MATCH='"md5:outdated"'
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn(b'Montreal', response.getvalue())
+
     def deploy_source(self):
         # Refresh source asset from DB, it has been altered by
         # `self.toggle_source_sharing()`
@@ -10,7 +10,8 @@ from django.urls import reverse
 from django.utils import timezone
 from rest_framework import status
 
-from kobo.apps.trackers.models import NLPUsageCounter
+from kobo.apps.trackers.models import MonthlyUsageRollup, NLPUsageCounter
+from kobo.apps.trackers.utils import refresh_monthly_usage_rollups
 from kpi.deployment_backends.kc_access.shadow_models import (
     KobocatXForm,
     KobocatDailyXFormSubmissionCounter,
@@ -277,6 +278,39 @@ class ServiceUsageAPITestCase(ServiceUsageAPIBase):
         assert response.data['total_submission_count']['all_time'] == 3
         assert response.data['total_storage_bytes'] == 0
 
+    def test_usage_of_past_months_is_read_from_rollups(self):
+        self._create_asset()
+        self.add_nlp_trackers()
+        self.add_submissions(count=1)
+
+        assert refresh_monthly_usage_rollups() == 1
+        current_month = timezone.now().date().replace(day=1)
+        last_month = current_month - relativedelta(months=1)
+        rollup = MonthlyUsageRollup.objects.get(
+            user=self.anotheruser, month=last_month
+        )
+        assert rollup.total_asr_seconds == 142
+        assert rollup.total_mt_characters == 1253
+
+        # Daily counters of rolled up months are not read anymore
+        NLPUsageCounter.objects.filter(date__lt=current_month).update(
+            total_asr_seconds=0, total_mt_characters=0
+        )
+
+        url = reverse(self._get_endpoint('service-usage-list'))
+        response = self.client.get(url)
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['total_submission_count']['current_month'] == 1
+        assert response.data['total_submission_count']['all_time'] == 1
+        assert (
+            response.data['total_nlp_usage']['asr_seconds_current_month']
+            == 4586
+        )
+        assert response.data['total_nlp_usage']['asr_seconds_all_time'] == 4728
+        assert (
+            response.data['total_nlp_usage']['mt_characters_all_time'] == 6726
+        )
+
     def test_no_data(self):
         """
         Test the endpoint functions when assets have no data
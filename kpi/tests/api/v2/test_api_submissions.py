@@ -18,9 +18,11 @@ import responses
 from dict2xml import dict2xml
 from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.test import override_settings
 from django.urls import reverse
 from django_digest.test import Client as DigestClient
 from rest_framework import status
+from rest_framework.reverse import reverse as reverse_with_request
 
 from kobo.apps.audit_log.models import AuditLog
 from kpi.constants import (
@@ -33,6 +35,8 @@ from kpi.constants import (
     PERM_VALIDATE_SUBMISSIONS,
     PERM_VIEW_ASSET,
     PERM_VIEW_SUBMISSIONS,
+    SUBMISSION_COUNT_STRATEGY_EXACT,
+    SUBMISSION_COUNT_STRATEGY_FAST,
     SUBMISSION_FORMAT_TYPE_XML,
 )
 from kpi.models import Asset
@@ -525,6 +529,125 @@ class SubmissionApiTests(BaseSubmissionTestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(len(response.data['results']), limit)
 
+    def test_list_submissions_with_cursor(self):
+        """
+        someuser is the owner of the project.
+        They can walk through their data with cursor pagination, forwards and
+        backwards.
+        """
+        response = self.client.get(
+            self.submission_list_url, {'format': 'json', 'cursor': '', 'limit': 6}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn('count', response.data)
+        self.assertIsNone(response.data['previous'])
+
+        pages = [response.data['results']]
+        while response.data['next']:
+            response = self.client.get(response.data['next'])
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertLessEqual(len(response.data['results']), 6)
+            pages.append(response.data['results'])
+
+        submission_ids = [s['_id'] for page in pages for s in page]
+        self.assertEqual(
+            submission_ids, sorted(s['_id'] for s in self.submissions)
+        )
+
+        # Go back to the previous page
+        response = self.client.get(response.data['previous'])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['results'], pages[-2])
+
+    def test_list_submissions_with_cursor_and_sort(self):
+        """
+        someuser is the owner of the project.
+        Cursor pagination follows the requested sort, even when values are not
+        unique.
+        """
+        for idx, submission in enumerate(self.submissions):
+            submission['q1'] = 'ab'[idx % 2]
+        self.asset.deployment.mock_submissions(self.submissions)
+
+        response = self.client.get(
+            self.submission_list_url,
+            {
+                'format': 'json',
+                'cursor': '',
+                'limit': 3,
+                'sort': '{"q1": -1}',
+                'fields': '["q1"]',
+            },
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        results = list(response.data['results'])
+        while response.data['next']:
+            response = self.client.get(response.data['next'])
+            results.extend(response.data['results'])
+
+        expected = sorted(
+            self.submissions, key=lambda s: (s['q1'], s['_id']), reverse=True
+        )
+        self.assertEqual(
+            [(r['q1'], r['_id']) for r in results],
+            [(s['q1'], s['_id']) for s in expected],
+        )
+
+    def test_list_submissions_with_invalid_cursor(self):
+        response = self.client.get(
+            self.submission_list_url, {'format': 'json', 'cursor': 'foo'}
+        )
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+        response = self.client.get(
+            self.submission_list_url,
+            {'format': 'json', 'cursor': '', 'start': 5},
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @override_settings(SUBMISSION_COUNT_STRATEGY=SUBMISSION_COUNT_STRATEGY_FAST)
+    def test_list_submissions_with_fast_count(self):
+        """
+        someuser is the owner of the project.
+        Counts of filtered lists are cached until submissions are written.
+        """
+        response = self.client.get(self.submission_list_url, {'format': 'json'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], len(self.submissions))
+        self.assertFalse(response.data['is_count_exact'])
+
+        params = {'format': 'json', 'query': '{"_submitted_by": "someuser"}'}
+        expected_count = len(self.submissions_submitted_by_someuser)
+        response = self.client.get(self.submission_list_url, params)
+        self.assertEqual(response.data['count'], expected_count)
+        self.assertTrue(response.data['is_count_exact'])
+
+        response = self.client.get(self.submission_list_url, params)
+        self.assertEqual(response.data['count'], expected_count)
+        self.assertFalse(response.data['is_count_exact'])
+
+        # Writing submissions voids cached counts
+        submission = self.submissions_submitted_by_someuser[0]
+        response = self.client.delete(
+            self.asset.deployment.get_submission_detail_url(submission['_id']),
+            HTTP_ACCEPT='application/json',
+        )
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        response = self.client.get(self.submission_list_url, params)
+        self.assertEqual(response.data['count'], expected_count - 1)
+        self.assertTrue(response.data['is_count_exact'])
+
+    @override_settings(SUBMISSION_COUNT_STRATEGY=SUBMISSION_COUNT_STRATEGY_EXACT)
+    def test_list_submissions_with_exact_count(self):
+        params = {'format': 'json', 'query': '{"_submitted_by": "someuser"}'}
+        for _ in range(2):
+            response = self.client.get(self.submission_list_url, params)
+            self.assertEqual(
+                response.data['count'],
+                len(self.submissions_submitted_by_someuser),
+            )
+            self.assertTrue(response.data['is_count_exact'])
+
     def test_list_submissions_not_shared_as_anotheruser(self):
         """
         someuser is the owner of the project.
@@ -1055,6 +1178,58 @@ class SubmissionApiTests(BaseSubmissionTestCase):
             assert attachment['question_xpath'] == expected_question_xpaths[idx]
 
 
+    def test_attachments_rewrite_is_computed_once_per_stream(self):
+        submissions = [
+            {
+                '_id': submission_id,
+                '_uuid': str(uuid.uuid4()),
+                'formhub/uuid': 'formhub-uuid',
+                '_attachments': [
+                    {
+                        'download_url': f'http://kc.testserver/{submission_id}.jpg',
+                        'filename': f'someuser/attachments/{submission_id}.jpg',
+                        'id': submission_id,
+                    }
+                ],
+            }
+            for submission_id in (2000, 2001, 2002)
+        ]
+        self.asset.deployment.mock_submissions(submissions)
+
+        with mock.patch.object(
+            Asset, '_get_attachment_xpaths', autospec=True, return_value=[]
+        ) as patched_get_attachment_xpaths:
+            with mock.patch(
+                'kpi.deployment_backends.base_backend.reverse',
+                wraps=reverse_with_request,
+            ) as patched_reverse:
+                response = self.client.get(
+                    self.submission_list_url, {'format': 'json'}
+                )
+                assert patched_reverse.call_count == 1
+
+            attachments = [
+                submission['_attachments'][0]
+                for submission in response.data['results']
+                if submission['_id'] in (2000, 2001, 2002)
+            ]
+            for submission_id, attachment in zip(
+                (2000, 2001, 2002), attachments
+            ):
+                assert attachment['download_url'] == (
+                    'http://testserver/api/v2/assets/'
+                    f'{self.asset.uid}/data/{submission_id}/attachments/'
+                    f'{submission_id}/?format=json'
+                )
+
+            # XPaths are kept until next redeployment
+            response = self.client.get(
+                self.submission_list_url, {'format': 'json'}
+            )
+            assert response.status_code == status.HTTP_200_OK
+            assert patched_get_attachment_xpaths.call_count == 1
+
+
 class SubmissionEditApiTests(BaseSubmissionTestCase):
 
     def setUp(self):
@@ -1934,6 +2109,48 @@ class BulkUpdateSubmissionsApiTests(BaseSubmissionTestCase):
         assert response.status_code == status.HTTP_200_OK
         self._check_bulk_update(response)
 
+    @override_settings(SUBMISSION_BULK_UPDATE_MAX_WORKERS=2)
+    def test_bulk_update_submissions_keeps_order(self):
+        response = self.client.patch(
+            self.submission_url, data=self.submitted_payload, format='json'
+        )
+        assert response.status_code == status.HTTP_200_OK
+        self._check_bulk_update(response)
+        results = response.data['results']
+        # Each result must match the submission sent at the same position
+        for result in results:
+            assert result['uuid'] == result['response']['uuid']
+            assert result['uuid'] in result['response']['updated_submission']
+        assert len(set(result['uuid'] for result in results)) == len(results)
+
+    @override_settings(SUBMISSION_BULK_UPDATE_ASYNC_THRESHOLD=2)
+    def test_bulk_update_submissions_in_background(self):
+        response = self.client.patch(
+            self.submission_url, data=self.submitted_payload, format='json'
+        )
+        assert response.status_code == status.HTTP_202_ACCEPTED
+        assert response.data['status'] == 'processing'
+        assert response.data['count'] == 3
+
+        # Celery tasks are run synchronously in tests, the update is over
+        response = self.client.get(response.data['url'])
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['status'] == 'complete'
+        assert response.data['processed'] == 3
+        assert response.data['result']['successes'] == 3
+
+        # Other users cannot see the progress
+        progress_url = reverse(
+            self._get_endpoint('submission-bulk-progress'),
+            kwargs={
+                'parent_lookup_asset': self.asset.uid,
+                'task_uid': response.data['uid'],
+            },
+        )
+        self._log_in_as_another_user()
+        response = self.client.get(progress_url)
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
     @pytest.mark.skip(
         reason=(
             'Useless with the current implementation of'
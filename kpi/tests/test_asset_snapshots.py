@@ -6,6 +6,8 @@ from constance.test import override_config
 from django.contrib.auth.models import User
 from django.test import TestCase
 from django.utils import timezone
+from formpack import FormPack
+from mock import patch
 
 from kpi.maintenance_tasks import remove_old_asset_snapshots
 from kpi.tests.api.v2 import test_api_asset_snapshots
@@ -80,6 +82,32 @@ class CreateAssetSnapshots(AssetSnapshotsTestCase):
         snap = AssetSnapshot.objects.create(source=content)
         assert snap.xml.count('<value>ABC</value>') == 2
 
+    def test_identical_sources_are_compiled_once(self):
+        with patch(
+            'kpi.models.asset_snapshot.FormPack', wraps=FormPack
+        ) as patched_formpack:
+            first_snapshot = AssetSnapshot.objects.create(
+                asset=self.asset, source=self.asset.content
+            )
+            second_snapshot = AssetSnapshot.objects.create(
+                asset=self.asset, source=self.asset.content
+            )
+            assert patched_formpack.call_count <= 1
+
+        assert first_snapshot.xml == second_snapshot.xml
+        assert first_snapshot.details == second_snapshot.details
+        assert first_snapshot.details['status'] == 'success'
+
+        with patch(
+            'kpi.models.asset_snapshot.FormPack', wraps=FormPack
+        ) as patched_formpack:
+            AssetSnapshot.objects.create(
+                asset=self.asset,
+                source=self.asset.content,
+                details={'note': 'Preview with a different note'},
+            )
+            patched_formpack.assert_called_once()
+
 
 class AssetSnapshotHousekeeping(AssetSnapshotsTestCase):
 
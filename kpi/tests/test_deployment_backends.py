@@ -1,10 +1,34 @@
 # coding: utf-8
+import re
+from datetime import timedelta
+
 import pytest
-from django.test import TestCase
+from dateutil.relativedelta import relativedelta
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from mock import PropertyMock, patch
+from rest_framework.exceptions import ValidationError
 
+from kobo.apps.trackers.models import MonthlyUsageRollup, NLPUsageCounter
+from kobo.apps.trackers.utils import refresh_monthly_usage_rollups
+from kpi.constants import SUBMISSION_FORMAT_TYPE_XML
+from kpi.deployment_backends.kc_access.shadow_models import (
+    KobocatDailyXFormSubmissionCounter,
+    KobocatMonthlyXFormSubmissionCounter,
+    KobocatUserProfile,
+    KobocatXForm,
+    ReadOnlyKobocatInstance,
+)
+from kpi.deployment_backends.kobocat_backend import KobocatDeploymentBackend
 from kpi.exceptions import DeploymentDataException
 from kpi.models.asset import Asset
 from kpi.models.asset_version import AssetVersion
+from kpi.utils.mongo_helper import MongoHelper
 
 
 class CreateDeployment(TestCase):
@@ -148,3 +172,336 @@ class MockDeployment(TestCase):
         # altered directly
         with self.assertRaises(DeploymentDataException) as e:
             asset.save()
+
+    def test_sync_paired_data_files_only_when_needed(self):
+        cache.delete(self.asset.get_sync_paired_data_files_cache_key())
+        with patch('kpi.deployment_backends.mixin.celery') as patched_celery:
+            send_task = patched_celery.current_app.send_task
+            with self.captureOnCommitCallbacks(execute=True):
+                self.asset.settings['description'] = 'Lorem ipsum'
+                self.asset.save()
+            send_task.assert_not_called()
+
+            # Several saves within the delay trigger only one synchronization
+            with self.captureOnCommitCallbacks(execute=True):
+                self.asset.paired_data = {
+                    'aFDsfbRXJKQeG7cTAX4doM': {
+                        'fields': [],
+                        'filename': 'paired_data.xml',
+                        'paired_data_uid': 'pdtAfJM3KEzWsDh5LBm8Ky',
+                    }
+                }
+                self.asset.save()
+                self.asset.paired_data['aFDsfbRXJKQeG7cTAX4doM'][
+                    'filename'
+                ] = 'renamed_paired_data.xml'
+                self.asset.save()
+            send_task.assert_called_once_with(
+                'kpi.tasks.sync_paired_data_files',
+                (self.asset.uid,),
+                countdown=settings.PAIRED_DATA_SYNC_DELAY,
+            )
+
+    def test_sync_paired_data_files_after_rolled_back_save(self):
+        cache_key = self.asset.get_sync_paired_data_files_cache_key()
+        cache.delete(cache_key)
+        self.asset.paired_data = {
+            'aFDsfbRXJKQeG7cTAX4doM': {
+                'fields': [],
+                'filename': 'paired_data.xml',
+                'paired_data_uid': 'pdtAfJM3KEzWsDh5LBm8Ky',
+            }
+        }
+        with patch('kpi.deployment_backends.mixin.celery') as patched_celery:
+            send_task = patched_celery.current_app.send_task
+            # The transaction is never committed, i.e. callbacks do not run
+            with self.captureOnCommitCallbacks(execute=False):
+                self.asset.save()
+            send_task.assert_not_called()
+            assert cache.get(cache_key) is None
+
+            # The next committed save is synchronized right away
+            with self.captureOnCommitCallbacks(execute=True):
+                self.asset.save()
+            send_task.assert_called_once()
+
+
+class KobocatDeployment(TestCase):
+
+    unmanaged_models = [
+        KobocatXForm,
+        ReadOnlyKobocatInstance,
+        KobocatDailyXFormSubmissionCounter,
+        KobocatMonthlyXFormSubmissionCounter,
+        KobocatUserProfile,
+    ]
+    mongo_userform_id = 'someuser_xml_by_batch'
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        with connection.schema_editor() as schema_editor:
+            for unmanaged_model in cls.unmanaged_models:
+                schema_editor.create_model(unmanaged_model)
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='someuser')
+        self.asset = Asset.objects.create(
+            owner=self.user,
+            content={'survey': [{'type': 'text', 'name': 'q1'}]},
+        )
+        now = timezone.now()
+        self.xform = KobocatXForm.objects.create(
+            user_id=self.user.pk,
+            id_string='xml_by_batch',
+            date_created=now,
+            date_modified=now,
+            kpi_asset_uid=self.asset.uid,
+        )
+        # Submissions of another form must not be returned
+        self.other_xform = other_xform = KobocatXForm.objects.create(
+            user_id=self.user.pk,
+            id_string='other',
+            date_created=now,
+            date_modified=now,
+        )
+        self.submission_ids = []
+        mongo_submissions = []
+        for i in range(8):
+            for xform in [self.xform, other_xform]:
+                instance = ReadOnlyKobocatInstance.objects.create(
+                    xml=f'<data id="{xform.id_string}"><q1>{i}</q1></data>',
+                    xform=xform,
+                    date_created=now,
+                    date_modified=now,
+                )
+                if xform == self.xform:
+                    self.submission_ids.append(instance.pk)
+                    mongo_submissions.append(
+                        {
+                            '_id': instance.pk,
+                            '_userform_id': self.mongo_userform_id,
+                            'q1': 'skip' if i == 4 else 'keep',
+                        }
+                    )
+        settings.MONGO_DB.instances.delete_many(
+            {'_userform_id': self.mongo_userform_id}
+        )
+        settings.MONGO_DB.instances.insert_many(mongo_submissions)
+
+        self.deployment = KobocatDeploymentBackend(self.asset)
+        for name, value in [
+            ('xform_id', self.xform.pk),
+            ('mongo_userform_id', self.mongo_userform_id),
+        ]:
+            patcher = patch.object(
+                KobocatDeploymentBackend,
+                name,
+                new_callable=PropertyMock,
+                return_value=value,
+            )
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def _get_submissions_in_xml(self, **params):
+        return list(
+            self.deployment._KobocatDeploymentBackend__get_submissions_in_xml(
+                **params
+            )
+        )
+
+    def test_get_submissions_in_xml_by_batch(self):
+        batch_size = 3
+        with patch.object(MongoHelper, 'DEFAULT_BATCHSIZE', batch_size):
+            with CaptureQueriesContext(connection) as ctx:
+                submissions = self._get_submissions_in_xml(
+                    query={'q1': 'keep'}, start=0, limit=None
+                )
+
+        expected_values = [0, 1, 2, 3, 5, 6, 7]
+        assert submissions == [
+            f'<data id="xml_by_batch"><q1>{i}</q1></data>'
+            for i in expected_values
+        ]
+        assert self.deployment.current_submission_count == len(
+            expected_values
+        )
+        in_lists = [
+            in_list
+            for query in ctx.captured_queries
+            for in_list in re.findall(r' IN \(([^)]*)\)', query['sql'])
+        ]
+        assert len(in_lists) == 3
+        assert all(
+            len(in_list.split(',')) <= batch_size for in_list in in_lists
+        )
+
+    def test_get_submissions_in_xml_with_submission_ids(self):
+        submission_ids = self.submission_ids[1:6]
+        submissions = self._get_submissions_in_xml(
+            submission_ids=list(reversed(submission_ids)), start=1, limit=3
+        )
+        assert self.deployment.current_submission_count == 5
+        assert submissions == [
+            f'<data id="xml_by_batch"><q1>{i}</q1></data>' for i in [2, 3, 4]
+        ]
+
+    def test_get_submissions_in_xml_after_submission_id(self):
+        # Same parameters as the `xml-external` incremental rebuild
+        submissions = self.deployment.get_submissions(
+            self.user,
+            format_type=SUBMISSION_FORMAT_TYPE_XML,
+            query={
+                '_id': {
+                    '$gt': self.submission_ids[1],
+                    '$lte': self.submission_ids[5],
+                }
+            },
+        )
+        assert list(submissions) == [
+            f'<data id="xml_by_batch"><q1>{i}</q1></data>'
+            for i in [2, 3, 4, 5]
+        ]
+
+        with pytest.raises(ValidationError):
+            self.deployment.get_submissions(
+                self.user,
+                format_type=SUBMISSION_FORMAT_TYPE_XML,
+                sort={'_id': 1},
+            )
+
+    @override_settings(
+        CACHES={
+            'default': {
+                'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'
+            }
+        },
+    )
+    def test_last_submission_edit_time_is_cached_per_write_generation(self):
+        edit_time = timezone.now() + timedelta(minutes=5)
+        instances = ReadOnlyKobocatInstance.objects.filter(xform=self.xform)
+        last_edit_time = self.deployment.last_submission_edit_time
+
+        instances.filter(pk=self.submission_ids[0]).update(
+            date_modified=edit_time
+        )
+        with self.assertNumQueries(0):
+            assert self.deployment.last_submission_edit_time == last_edit_time
+
+        # Edits made through KPI bump the write generation
+        self.deployment.invalidate_submission_counts()
+        assert (
+            self.deployment.last_submission_edit_time == edit_time.isoformat()
+        )
+
+    def _create_kobocat_asset(self, owner, xform, id_string=None):
+        asset = Asset.objects.create(
+            owner=owner,
+            content={'survey': [{'type': 'text', 'name': 'q1'}]},
+        )
+        Asset.objects.filter(pk=asset.pk).update(
+            _deployment_data={
+                'backend': 'kobocat',
+                'backend_response': {
+                    'formid': xform.pk,
+                    'id_string': id_string or xform.id_string,
+                },
+            }
+        )
+        return Asset.objects.select_related('owner').get(pk=asset.pk)
+
+    def test_submission_counts_per_xform(self):
+        today = timezone.now().date()
+        for xform, days_ago, counter in [
+            (self.xform, 0, 2),
+            (self.xform, 3, 1),
+            (self.xform, 40, 5),
+            (self.other_xform, 0, 7),
+        ]:
+            KobocatDailyXFormSubmissionCounter.objects.create(
+                date=today - timedelta(days=days_ago),
+                user_id=self.user.pk,
+                xform=xform,
+                counter=counter,
+            )
+        start_dates = {
+            'current_month': today - timedelta(days=10),
+            'all_time': None,
+        }
+
+        submission_counts = (
+            KobocatDeploymentBackend.submission_counts_per_xform(
+                [self.xform.pk], start_dates
+            )
+        )
+        assert submission_counts == {
+            self.xform.pk: {'current_month': 3, 'all_time': 8},
+        }
+
+    def test_xforms_per_asset(self):
+        another_user = User.objects.create_user(username='anotheruser')
+        asset = self._create_kobocat_asset(self.user, self.xform)
+        # Linked to an XForm owned by someone else
+        mismatched_owner_asset = self._create_kobocat_asset(
+            another_user, self.other_xform
+        )
+        # Linked to an XForm whose `id_string` differs
+        now = timezone.now()
+        mismatched_id_string_asset = self._create_kobocat_asset(
+            self.user,
+            KobocatXForm.objects.create(
+                user_id=self.user.pk,
+                id_string='third',
+                date_created=now,
+                date_modified=now,
+            ),
+            id_string='unexpected',
+        )
+
+        with self.assertNumQueries(1):
+            xforms_per_asset = KobocatDeploymentBackend.xforms_per_asset(
+                [asset, mismatched_owner_asset, mismatched_id_string_asset]
+            )
+        assert list(xforms_per_asset) == [asset.pk]
+        assert xforms_per_asset[asset.pk].pk == self.xform.pk
+
+    def test_transfer_counters_ownership_refreshes_rollups(self):
+        new_owner = User.objects.create_user(username='anotheruser')
+        last_month = timezone.now().date().replace(day=1) - relativedelta(
+            months=1
+        )
+        KobocatDailyXFormSubmissionCounter.objects.create(
+            date=last_month, user_id=self.user.pk, xform=self.xform, counter=5
+        )
+        # Usage of another project stays with the previous owner
+        KobocatDailyXFormSubmissionCounter.objects.create(
+            date=last_month,
+            user_id=self.user.pk,
+            xform=self.other_xform,
+            counter=3,
+        )
+        NLPUsageCounter.objects.create(
+            date=last_month,
+            user=self.user,
+            asset=self.asset,
+            total_asr_seconds=10,
+            total_mt_characters=20,
+        )
+        assert refresh_monthly_usage_rollups() == 1
+
+        self.deployment._xform = self.xform
+        self.deployment.transfer_counters_ownership(new_owner)
+
+        rollups = {
+            rollup.user_id: rollup
+            for rollup in MonthlyUsageRollup.objects.filter(month=last_month)
+        }
+        assert rollups.keys() == {self.user.pk, new_owner.pk}
+        previous_owner_rollup = rollups[self.user.pk]
+        assert previous_owner_rollup.submission_count == 3
+        assert previous_owner_rollup.total_asr_seconds == 0
+        assert previous_owner_rollup.total_mt_characters == 0
+        new_owner_rollup = rollups[new_owner.pk]
+        assert new_owner_rollup.submission_count == 5
+        assert new_owner_rollup.total_asr_seconds == 10
+        assert new_owner_rollup.total_mt_characters == 20
@@ -0,0 +1,108 @@
+# coding: utf-8
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+from django.test import SimpleTestCase, override_settings
+
+from kpi.deployment_backends.kc_access.http_client import KobocatHttpClient
+
+
+class StubKobocatHandler(BaseHTTPRequestHandler):
+    """
+    Answer with the status codes queued in `server.status_codes` (200 when
+    the queue is empty), set a session cookie and keep connections alive.
+    """
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):  # noqa
+        self._respond()
+
+    def do_POST(self):  # noqa
+        content_length = int(self.headers.get('Content-Length', 0))
+        self.rfile.read(content_length)
+        self._respond()
+
+    def log_message(self, *args):
+        pass
+
+    def _respond(self):
+        self.server.client_ports.add(self.client_address[1])
+        self.server.request_count += 1
+        self.server.cookie_headers.append(self.headers.get('Cookie'))
+        status_code = 200
+        if self.server.status_codes:
+            status_code = self.server.status_codes.pop(0)
+        body = b'{}'
+        self.send_response(status_code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Set-Cookie', 'sessionid=secret; Path=/')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+@override_settings(
+    KOBOCAT_HTTP_MAX_RETRIES=2,
+    KOBOCAT_HTTP_BACKOFF_FACTOR=0,
+    KOBOCAT_HTTP_POOL_MAXSIZE=2,
+)
+class KobocatHttpClientTestCase(SimpleTestCase):
+
+    def setUp(self):
+        KobocatHttpClient.reset()
+        self.server = ThreadingHTTPServer(
+            ('127.0.0.1', 0), StubKobocatHandler
+        )
+        self.server.client_ports = set()
+        self.server.request_count = 0
+        self.server.cookie_headers = []
+        self.server.status_codes = []
+        self.server_thread = threading.Thread(
+            target=self.server.serve_forever, daemon=True
+        )
+        self.server_thread.start()
+        host, port = self.server.server_address
+        self.url = f'http://{host}:{port}/api/v1/forms'
+
+    def tearDown(self):
+        KobocatHttpClient.reset()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def _send(self, method='GET', **kwargs):
+        request = requests.Request(method=method, url=self.url, **kwargs)
+        return KobocatHttpClient.send(request.prepare())
+
+    def test_connections_are_reused(self):
+        for _ in range(5):
+            response = self._send()
+            self.assertEqual(response.status_code, 200)
+
+        self.assertEqual(self.server.request_count, 5)
+        self.assertEqual(len(self.server.client_ports), 1)
+
+    def test_retry_on_gateway_errors(self):
+        self.server.status_codes = [502, 503]
+        response = self._send()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.server.request_count, 3)
+
+    def test_last_response_is_returned_when_retries_are_exhausted(self):
+        self.server.status_codes = [504, 504, 504, 504]
+        response = self._send()
+        self.assertEqual(response.status_code, 504)
+        self.assertEqual(self.server.request_count, 3)
+
+    def test_post_is_not_retried(self):
+        self.server.status_codes = [503]
+        response = self._send('POST', data={'foo': 'bar'})
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(self.server.request_count, 1)
+
+    def test_cookies_are_not_shared_between_requests(self):
+        self._send(headers={'Authorization': 'Token first-user'})
+        self._send(headers={'Authorization': 'Token second-user'})
+
+        self.assertEqual(self.server.cookie_headers, [None, None])
+        self.assertEqual(len(KobocatHttpClient.get_session().cookies), 0)
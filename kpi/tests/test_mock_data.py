@@ -2,12 +2,14 @@
 from copy import deepcopy
 from collections import OrderedDict
 
+import mock
 from django.contrib.auth.models import User
 from django.test import TestCase
 
 from formpack import FormPack
 from kobo.apps.reports import report_data
 from kpi.models import Asset
+from kpi.utils.mongo_helper import MongoHelper
 
 F1 = {'survey': [{'$kuid': 'Uf89NP4VX', 'type': 'start', 'name': 'start'},
                   {'$kuid': 'ZtZBY7XHX', 'type': 'end', 'name': 'end'},
@@ -205,6 +207,69 @@ class MockDataReports(TestCase):
         self.assertEqual(values[0]['data']['percentages'], (75, 25))
         self.assertEqual(values[0]['data']['responses'], ('First option', 'Second option'))
 
+    def test_kobo_apps_reports_report_data_with_mongo_aggregation(self):
+        field_names = ['Select_one', 'Select_Many', 'Text']
+        expected = report_data.data_by_identifiers(
+            self.asset,
+            field_names=field_names,
+            lang='Arabic',
+            submission_stream=self.asset.deployment.get_submissions(self.user),
+        )
+        with mock.patch.object(
+            MongoHelper,
+            'get_value_frequencies',
+            wraps=MongoHelper.get_value_frequencies,
+        ) as patched_get_value_frequencies:
+            values = report_data.data_by_identifiers(
+                self.asset,
+                field_names=field_names,
+                lang='Arabic',
+                submission_stream=self.asset.deployment.get_submissions(
+                    self.user
+                ),
+                use_mongo_aggregation=True,
+            )
+            assert patched_get_value_frequencies.call_args.args[1] == [
+                'Select_one',
+                'Select_Many',
+            ]
+        self.assertEqual(values, expected)
+
+    def test_kobo_apps_reports_report_data_with_projected_stream(self):
+        field_names = ['Select_one', 'Select_Many', 'Text']
+        expected = report_data.data_by_identifiers(
+            self.asset,
+            field_names=field_names,
+            submission_stream=self.asset.deployment.get_submissions(self.user),
+        )
+        get_submission_stream = mock.Mock(
+            side_effect=lambda fields: self.asset.deployment.get_submissions(
+                self.user, fields=fields
+            )
+        )
+        values = report_data.data_by_identifiers(
+            self.asset,
+            field_names=field_names,
+            get_submission_stream=get_submission_stream,
+            use_mongo_aggregation=True,
+        )
+        # Only the question which is not aggregated by MongoDB is retrieved
+        projected_fields = get_submission_stream.call_args.args[0]
+        assert 'Text' in projected_fields
+        assert 'Select_one' not in projected_fields
+        assert '__version__' in projected_fields
+        self.assertEqual(values, expected)
+
+    def test_value_frequencies_are_grouped_by_field_above_facet_limit(self):
+        mongo_userform_id = self.asset.deployment.mongo_userform_id
+        fields = ['Select_one', 'Select_Many']
+        expected = MongoHelper.get_value_frequencies(mongo_userform_id, fields)
+        with mock.patch.object(MongoHelper, 'FACET_MAX_GROUPS', 0):
+            values = MongoHelper.get_value_frequencies(
+                mongo_userform_id, fields
+            )
+        assert values == expected
+
     def test_kobo_apps_reports_report_data_translation(self):
         values = report_data.data_by_identifiers(self.asset,
                                                  lang='Arabic',
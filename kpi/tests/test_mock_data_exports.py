@@ -1161,3 +1161,13 @@ class MockDataExports(MockDataExportsBase):
 
         # testing anotheruser can export data
         self.run_csv_export_test(user=self.anotheruser)
+
+    def test_build_formpack_uses_cached_schemas(self):
+        # `setUp()` has already built the formpack once
+        with mock.patch(
+            'kpi.models.asset_version.AssetVersion.to_formpack_schema'
+        ) as patched_to_formpack_schema:
+            formpack, _ = report_data.build_formpack(self.asset)
+            assert not patched_to_formpack_schema.called
+
+        assert list(formpack.versions) == list(self.formpack.versions)
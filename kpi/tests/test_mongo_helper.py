@@ -147,3 +147,83 @@ class MongoHelperTestCase(TestCase):
             1,
         )
 
+
+    def test_get_instances_with_keyset(self):
+        user = baker.make('auth.User')
+        asset = baker.make('kpi.Asset', owner=user)
+        asset.deploy(backend='mock', active=True)
+        userform_id = asset.deployment.mongo_userform_id
+        submissions = [
+            {'_id': 1, 'q1': 'b'},
+            {'_id': 2},
+            {'_id': 3, 'q1': 'a'},
+            {'_id': 4, 'q1': 'b'},
+            {'_id': 5},
+        ]
+        self.add_submissions(asset, submissions)
+
+        for sort_dir, expected_ids in [
+            (1, [2, 5, 3, 1, 4]),
+            (-1, [4, 1, 3, 5, 2]),
+        ]:
+            keyset = {'value': None, 'id': None, 'reverse': False}
+            submission_ids = []
+            while True:
+                cursor, count = MongoHelper.get_instances(
+                    userform_id,
+                    start=0,
+                    limit=2,
+                    sort={'q1': sort_dir},
+                    keyset=keyset,
+                    skip_count=True,
+                )
+                page = list(cursor)
+                assert count is None
+                if not page:
+                    break
+                submission_ids.extend(s['_id'] for s in page)
+                keyset = {
+                    'value': page[-1].get('q1'),
+                    'id': page[-1]['_id'],
+                    'reverse': False,
+                }
+            assert submission_ids == expected_ids
+
+        # Walk backwards from the last submission
+        cursor, count = MongoHelper.get_instances(
+            userform_id,
+            start=0,
+            sort={'q1': 1},
+            keyset={'value': 'b', 'id': 4, 'reverse': True},
+        )
+        assert [s['_id'] for s in cursor] == [1, 3, 5, 2]
+        # The total count is not narrowed down by the keyset
+        assert count == 5
+
+    def test_get_cached_count(self):
+        user = baker.make('auth.User')
+        asset = baker.make('kpi.Asset', owner=user)
+        asset.deploy(backend='mock', active=True)
+        userform_id = asset.deployment.mongo_userform_id
+        self.add_submissions(asset, [{'q1': 'a1'}, {'q1': 'a2'}])
+        query = {'q1': {'$in': ['a1', 'a2']}}
+
+        assert MongoHelper.get_cached_count(userform_id, query=query) == (
+            2,
+            True,
+        )
+        # `query` must not be altered
+        assert query == {'q1': {'$in': ['a1', 'a2']}}
+        assert MongoHelper.get_cached_count(userform_id, query=query) == (
+            2,
+            False,
+        )
+
+        self.add_submissions(asset, [{'q1': 'a1'}])
+        assert MongoHelper.get_cached_count(userform_id, query=query) == (
+            3,
+            True,
+        )
+        assert MongoHelper.get_cached_count(
+            userform_id, query=query, data_version='1'
+        ) == (3, True)
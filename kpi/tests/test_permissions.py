@@ -1,7 +1,10 @@
 # coding: utf-8
 import unittest
 from django.contrib.auth.models import User, AnonymousUser
-from django.test import TestCase
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from mock import patch
 
 from kpi.constants import (
     ASSET_TYPE_COLLECTION,
@@ -19,6 +22,12 @@ from kpi.constants import (
     PERM_VIEW_SUBMISSIONS,
 )
 from kpi.exceptions import BadPermissionsException
+from kpi.models import ObjectPermission
+from kpi.tasks import recalculate_descendants_perms_in_background
+from kpi.utils.cache import (
+    get_permissions_cache_stats,
+    invalidate_cached_permissions,
+)
 from kpi.utils.object_permission import get_all_objects_for_user
 from ..models.asset import Asset
 
@@ -252,6 +261,137 @@ class PermissionsTestCase(BasePermissionsTestCase):
         self._test_add_remove_inherited_perm(self.admin_collection, 'change_',
                                              self.someuser, self.admin_asset)
 
+    def test_nested_collections_inherited_permissions(self):
+        sub_collection = Asset.objects.create(
+            asset_type=ASSET_TYPE_COLLECTION,
+            owner=self.admin,
+            parent=self.admin_collection,
+        )
+        surveys = [
+            Asset.objects.create(
+                asset_type=ASSET_TYPE_SURVEY,
+                owner=self.admin,
+                parent=sub_collection,
+            )
+            for _ in range(3)
+        ]
+        self.admin_collection.assign_perm(self.someuser, PERM_CHANGE_ASSET)
+        for descendant in [sub_collection] + surveys:
+            self.assertTrue(self.someuser.has_perm(PERM_VIEW_ASSET, descendant))
+            self.assertTrue(
+                self.someuser.has_perm(PERM_CHANGE_ASSET, descendant)
+            )
+            # Owner's permissions are kept
+            for perm in descendant.get_assignable_permissions(
+                with_partial=False
+            ):
+                self.assertTrue(self.admin.has_perm(perm, descendant))
+
+        # Explicit deny on the sub collection stops the inheritance
+        sub_collection.assign_perm(self.someuser, PERM_CHANGE_ASSET, deny=True)
+        for survey in surveys:
+            self.assertTrue(self.someuser.has_perm(PERM_VIEW_ASSET, survey))
+            self.assertFalse(self.someuser.has_perm(PERM_CHANGE_ASSET, survey))
+
+    def test_large_recalculation_runs_in_background(self):
+        surveys = [
+            Asset.objects.create(
+                asset_type=ASSET_TYPE_SURVEY,
+                owner=self.admin,
+                parent=self.admin_collection,
+            )
+            for _ in range(3)
+        ]
+        with override_settings(PERMISSIONS_RECALCULATION_ASYNC_THRESHOLD=2):
+            with patch('kpi.mixins.object_permission.celery') as patched_celery:
+                with self.captureOnCommitCallbacks(execute=True):
+                    self.admin_collection.assign_perm(
+                        self.someuser, PERM_VIEW_ASSET
+                    )
+                patched_celery.current_app.send_task.assert_called_once_with(
+                    'kpi.tasks.recalculate_descendants_perms_in_background',
+                    (self.admin_collection.uid,),
+                )
+            progress = (
+                self.admin_collection.get_descendants_perms_recalculation_progress()
+            )
+            assert progress == {'status': 'pending', 'total': 3, 'processed': 0}
+            for survey in surveys:
+                self.assertFalse(self.someuser.has_perm(PERM_VIEW_ASSET, survey))
+
+            recalculate_descendants_perms_in_background(
+                self.admin_collection.uid
+            )
+            progress = (
+                self.admin_collection.get_descendants_perms_recalculation_progress()
+            )
+            assert progress == {'status': 'complete', 'total': 3, 'processed': 3}
+            for survey in surveys:
+                self.assertTrue(self.someuser.has_perm(PERM_VIEW_ASSET, survey))
+
+    def test_permissions_are_cached_until_they_change(self):
+        asset = self.admin_asset
+        grantee = self.someuser
+        # Database is reset between test runs but not the shared cache
+        with override_settings(PERMISSIONS_CACHE_TIMEOUT=60):
+            invalidate_cached_permissions(asset=[asset.pk], user=[grantee.pk])
+            self.assertFalse(grantee.has_perm(PERM_VIEW_ASSET, asset))
+            stats = get_permissions_cache_stats()
+            with CaptureQueriesContext(connection) as context:
+                self.assertFalse(grantee.has_perm(PERM_VIEW_ASSET, asset))
+            assert not any(
+                ObjectPermission._meta.db_table in query['sql']
+                for query in context.captured_queries
+            )
+            assert get_permissions_cache_stats()['hits'] > stats['hits']
+
+            asset.assign_perm(grantee, PERM_VIEW_ASSET)
+            self.assertTrue(grantee.has_perm(PERM_VIEW_ASSET, asset))
+            assert (
+                get_permissions_cache_stats()['invalidations']
+                > stats['invalidations']
+            )
+
+            asset.remove_perm(grantee, PERM_VIEW_ASSET)
+            self.assertFalse(grantee.has_perm(PERM_VIEW_ASSET, asset))
+
+    def test_cached_permissions_are_invalidated_when_inherited(self):
+        sub_collection = Asset.objects.create(
+            asset_type=ASSET_TYPE_COLLECTION,
+            owner=self.admin,
+            parent=self.admin_collection,
+        )
+        survey = Asset.objects.create(
+            asset_type=ASSET_TYPE_SURVEY,
+            owner=self.admin,
+            parent=sub_collection,
+        )
+        grantee = self.someuser
+        # Database is reset between test runs but not the shared cache
+        with override_settings(PERMISSIONS_CACHE_TIMEOUT=60):
+            invalidate_cached_permissions(
+                asset=[sub_collection.pk, survey.pk], user=[grantee.pk]
+            )
+            # Cache the permissions before they change
+            self.assertFalse(grantee.has_perm(PERM_VIEW_ASSET, survey))
+
+            self.admin_collection.assign_perm(grantee, PERM_VIEW_ASSET)
+            for descendant in [sub_collection, survey]:
+                self.assertTrue(grantee.has_perm(PERM_VIEW_ASSET, descendant))
+
+            self.admin_collection.remove_perm(grantee, PERM_VIEW_ASSET)
+            for descendant in [sub_collection, survey]:
+                self.assertFalse(
+                    grantee.has_perm(PERM_VIEW_ASSET, descendant)
+                )
+
+            # Moving an asset out of a collection drops inherited permissions
+            sub_collection.assign_perm(grantee, PERM_VIEW_ASSET)
+            self.assertTrue(grantee.has_perm(PERM_VIEW_ASSET, survey))
+            survey.parent = None
+            survey.save()
+            self.assertFalse(grantee.has_perm(PERM_VIEW_ASSET, survey))
+
     def test_implied_asset_grant_permissions(self):
         implications = {
             PERM_CHANGE_ASSET: (PERM_VIEW_ASSET,),
@@ -1,5 +1,13 @@
 # coding: utf-8
+import csv
+from io import BytesIO, StringIO
+
+from django.conf import settings
 from django.contrib.auth.models import User
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from mock import patch
 
 from kobo.apps.project_views.models.project_view import ProjectView
 from kpi.constants import (
@@ -9,8 +17,14 @@ from kpi.constants import (
     PERM_VIEW_ASSET,
     PERM_VIEW_SUBMISSIONS,
 )
+from kpi.deployment_backends.kc_access.shadow_models import KobocatXForm
 from kpi.models import Asset
 from kpi.tests.base_test_case import BaseTestCase
+from kpi.utils import project_view_exports
+from kpi.utils.project_view_exports import (
+    create_project_view_export,
+    get_submission_counts,
+)
 from kpi.utils.project_views import (
     get_project_view_user_permissions_for_asset,
     user_has_project_view_asset_perm,
@@ -124,3 +138,116 @@ class ProjectViewsUtilsTestCase(BaseTestCase):
         assert sorted(['BWA', 'LSO', 'MOZ', 'NAM', 'ZAF', 'ZWE']) == sorted(
             get_region_for_view(ProjectView.objects.get(name='Test view 1').uid)
         )
+
+
+@patch.object(project_view_exports, 'EXPORT_CHUNK_SIZE', 2)
+class ProjectViewExportsTestCase(BaseTestCase):
+    fixtures = ['test_data']
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        with connection.schema_editor() as schema_editor:
+            schema_editor.create_model(KobocatXForm)
+
+    def setUp(self):
+        self.user = User.objects.get(username='someuser')
+        self.view = ProjectView.objects.create(
+            name='Overview', countries='*', permissions=[PERM_VIEW_ASSET]
+        )
+        self.view.users.set([self.user])
+        Asset.objects.all().delete()
+        now = timezone.now()
+        self.submission_counts = {}
+        for i in range(5):
+            asset = Asset.objects.create(
+                owner=self.user, name=f'survey {i}', asset_type='survey'
+            )
+            if i == 4:
+                # Not deployed
+                continue
+            xform = KobocatXForm.objects.create(
+                user_id=self.user.pk,
+                id_string=asset.uid,
+                date_created=now,
+                date_modified=now,
+                num_of_submissions=i * 10,
+                kpi_asset_uid=asset.uid,
+            )
+            Asset.objects.filter(pk=asset.pk).update(
+                _deployment_data={'backend_response': {'formid': xform.pk}}
+            )
+            self.submission_counts[asset.uid] = i * 10
+
+    def _get_xform_queries(self, context) -> list:
+        return [
+            query
+            for query in context.captured_queries
+            if KobocatXForm._meta.db_table in query['sql']
+        ]
+
+    def test_get_submission_counts_by_chunk(self):
+        xform_ids = list(
+            KobocatXForm.objects.values_list('pk', flat=True)
+        )
+        with CaptureQueriesContext(connection) as context:
+            submission_counts = get_submission_counts(
+                xform_ids + [xform_ids[0], None]
+            )
+        assert sorted(submission_counts.values()) == [0, 10, 20, 30]
+        # 4 distinct ids, 2 per chunk
+        assert len(self._get_xform_queries(context)) == 2
+
+    def test_assets_export_is_written_by_chunk(self):
+        output_file = BytesIO()
+        with CaptureQueriesContext(connection) as context:
+            create_project_view_export(
+                'assets', self.user.username, self.view.uid, output_file
+            )
+        # One query per chunk of 2 assets, except the last one which only
+        # contains the asset which is not deployed
+        assert len(self._get_xform_queries(context)) == 2
+
+        rows = list(
+            csv.DictReader(StringIO(output_file.getvalue().decode()))
+        )
+        assert len(rows) == 5
+        assert [row['name'] for row in rows] == [
+            f'survey {i}' for i in range(5)
+        ]
+        for row in rows:
+            assert int(row['submission_count']) == (
+                self.submission_counts.get(row['uid'], 0)
+            )
+
+    def test_users_export_is_written_by_chunk(self):
+        for i in range(3):
+            User.objects.create(username=f'exported_user_{i}')
+        output_file = BytesIO()
+        with patch.object(
+            output_file, 'write', wraps=output_file.write
+        ) as patched_write:
+            create_project_view_export(
+                'users', self.user.username, self.view.uid, output_file
+            )
+        rows = list(
+            csv.DictReader(StringIO(output_file.getvalue().decode()))
+        )
+        expected_usernames = list(
+            User.objects.exclude(pk=settings.ANONYMOUS_USER_ID)
+            .order_by('id')
+            .values_list('username', flat=True)
+        )
+        assert [row['username'] for row in rows] == expected_usernames
+        # Each chunk of 2 users is written as soon as it is ready
+        assert patched_write.call_count == (len(expected_usernames) + 1) // 2
+
+    def test_export_without_data_only_contains_header(self):
+        self.view.countries = 'ZZZ'
+        self.view.save()
+        output_file = BytesIO()
+        create_project_view_export(
+            'assets', self.user.username, self.view.uid, output_file
+        )
+        rows = list(csv.reader(StringIO(output_file.getvalue().decode())))
+        assert rows == [list(project_view_exports.CONFIG['assets']['columns'])]
@@ -1,8 +1,114 @@
 # -*- coding: utf-8 -*-
+from collections import Counter
 from functools import wraps
+from typing import Any, Callable, Iterable
+from uuid import uuid4
 
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
 from django_request_cache import get_request_cache
 
+from kpi.utils.log import logging
+
+PERMISSIONS_CACHE_STATS = ('hits', 'misses', 'invalidations')
+# Number of recorded events kept in memory before adding them to the shared
+# counters
+PERMISSIONS_CACHE_STATS_FLUSH_THRESHOLD = 100
+
+_permissions_cache_stats = Counter()
+
+
+def get_cached_permissions(
+    scope: str, scope_id: int, loader: Callable[[], Any], variant: str = ''
+) -> Any:
+    """
+    Return permissions of `scope` (e.g. `asset`, `user`) whose id is
+    `scope_id` from the shared cache. `loader()` is called to (re)build them
+    if they are missing or stale, i.e. if the generation of the scope has been
+    bumped by `invalidate_cached_permissions()` since they have been cached.
+
+    `variant` distinguishes several cached values of the same scope.
+    """
+    if not settings.PERMISSIONS_CACHE_TIMEOUT:
+        return loader()
+
+    generation_key = _get_permissions_generation_key(scope, scope_id)
+    data_key = f'permissions:{scope}:{scope_id}:data:{variant}'
+    cached = cache.get_many([generation_key, data_key])
+    generation = cached.get(generation_key)
+    if (
+        generation is not None
+        and data_key in cached
+        and cached[data_key]['generation'] == generation
+    ):
+        _record_permissions_cache_stat('hits')
+        return cached[data_key]['data']
+
+    _record_permissions_cache_stat('misses')
+    if generation is None:
+        generation = uuid4().hex
+        if not cache.add(generation_key, generation, None):
+            # Another process initialized (or bumped) the generation meanwhile
+            generation = cache.get(generation_key)
+
+    data = loader()
+    if generation is not None:
+        cache.set(
+            data_key,
+            {'generation': generation, 'data': data},
+            settings.PERMISSIONS_CACHE_TIMEOUT,
+        )
+    return data
+
+
+def get_permissions_cache_stats() -> dict:
+    """
+    Return the number of hits, misses and invalidations of the permissions
+    cache, aggregated among all processes
+    """
+    _flush_permissions_cache_stats()
+    keys = {
+        stat: _get_permissions_cache_stat_key(stat)
+        for stat in PERMISSIONS_CACHE_STATS
+    }
+    values = cache.get_many(keys.values())
+    stats = {stat: values.get(key, 0) for stat, key in keys.items()}
+    lookups = stats['hits'] + stats['misses']
+    stats['hit_rate'] = stats['hits'] / lookups if lookups else None
+    return stats
+
+
+def invalidate_cached_permissions(**scope_ids: Iterable[int]):
+    """
+    Bump the generation of each scope id passed as keyword arguments, e.g.:
+        `invalidate_cached_permissions(asset=[1, 2], user=[3])`
+
+    Within a transaction, generations are bumped again on commit. Otherwise,
+    other processes could cache the permissions they read before the commit
+    under the new generation.
+    """
+    if not settings.PERMISSIONS_CACHE_TIMEOUT:
+        return
+
+    keys = [
+        _get_permissions_generation_key(scope, scope_id)
+        for scope, ids in scope_ids.items()
+        for scope_id in set(ids)
+    ]
+    if not keys:
+        return
+
+    def _bump_generations():
+        cache.set_many({key: uuid4().hex for key in keys}, None)
+
+    _bump_generations()
+    if connection.in_atomic_block:
+        transaction.on_commit(_bump_generations)
+
+    _record_permissions_cache_stat('invalidations', len(keys))
+    logging.debug(f'Permissions cache invalidated: {", ".join(keys)}')
+
 
 def void_cache_for_request(keys):
     """
@@ -29,3 +135,33 @@ def void_cache_for_request(keys):
             return func(*args, **kwargs)
         return wrapper
     return _void_cache_for_request
+
+
+def _flush_permissions_cache_stats():
+    stats = dict(_permissions_cache_stats)
+    _permissions_cache_stats.clear()
+    for stat, value in stats.items():
+        key = _get_permissions_cache_stat_key(stat)
+        cache.add(key, 0, None)
+        try:
+            cache.incr(key, value)
+        except ValueError:
+            # The counter has been evicted in the meantime
+            cache.set(key, value, None)
+
+
+def _get_permissions_cache_stat_key(stat: str) -> str:
+    return f'permissions:stats:{stat}'
+
+
+def _get_permissions_generation_key(scope: str, scope_id: int) -> str:
+    return f'permissions:{scope}:{scope_id}:generation'
+
+
+def _record_permissions_cache_stat(stat: str, count: int = 1):
+    _permissions_cache_stats[stat] += count
+    if (
+        sum(_permissions_cache_stats.values())
+        >= PERMISSIONS_CACHE_STATS_FLUSH_THRESHOLD
+    ):
+        _flush_permissions_cache_stats()
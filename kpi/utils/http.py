@@ -0,0 +1,41 @@
+# coding: utf-8
+import datetime
+from typing import Optional
+
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+
+def get_validator_headers(
+    etag: str, last_modified: Optional[datetime.datetime] = None
+) -> dict:
+    """
+    Return `ETag` and `Last-Modified` (if provided) headers to let clients
+    send conditional requests
+    """
+    headers = {'ETag': quote_etag(etag)}
+    if last_modified:
+        headers['Last-Modified'] = http_date(last_modified.timestamp())
+    return headers
+
+
+def get_not_modified_response(
+    request: 'rest_framework.request.Request',
+    etag: str,
+    last_modified: Optional[datetime.datetime] = None,
+) -> Optional[HttpResponse]:
+    """
+    Return a `304 Not Modified` response if the copy of the client, validated
+    by `If-None-Match` or `If-Modified-Since` headers, is still current.
+    Otherwise, return `None`.
+    """
+    headers = get_validator_headers(etag, last_modified)
+    return get_conditional_response(
+        request,
+        etag=headers['ETag'],
+        last_modified=(
+            int(last_modified.timestamp()) if last_modified else None
+        ),
+        response=HttpResponse(headers=headers),
+    )
@@ -1,13 +1,18 @@
 # coding: utf-8
 from __future__ import annotations
 
+import copy
 import re
+import uuid
 from typing import Any, Dict, Optional, Union
 
+from bson import json_util
 from django.conf import settings
+from django.core.cache import cache
 
 from kobo.celery import celery_app
 from kpi.constants import NESTED_MONGO_RESERVED_ATTRIBUTES
+from kpi.utils.hash import calculate_hash
 from kpi.utils.strings import base64_encodestring
 
 PermissionFilter = Dict[str, Any]
@@ -73,8 +78,15 @@ class MongoHelper:
 
     # Match KoBoCAT's variables of ParsedInstance class
     USERFORM_ID = '_userform_id'
+    LAST_EDITED = '_last_edited'
     DEFAULT_BATCHSIZE = 1000
 
+    COUNT_CACHE_KEY_PREFIX = 'mongo_count'
+    # `$facet` returns all its results in one document, which cannot exceed
+    # 16 MB. Above this number of (potentially) distinct values, frequencies
+    # are computed field by field instead.
+    FACET_MAX_GROUPS = 50000
+
     @classmethod
     def decode(cls, key):
         """
@@ -126,6 +138,53 @@ class MongoHelper:
 
         return total_count
 
+    @classmethod
+    def get_cached_count(
+        cls,
+        mongo_userform_id: str,
+        query: Optional[dict] = None,
+        submission_ids: Optional[list] = None,
+        permission_filters: Optional[list] = None,
+        data_version: str = '',
+    ) -> tuple[int, bool]:
+        """
+        Return the number of documents matching the filters and whether it
+        has been counted right now (i.e. is exact) or comes from the cache.
+
+        Counts are cached per `mongo_userform_id` and normalized filters for
+        `settings.SUBMISSION_COUNT_CACHE_TIMEOUT` seconds. They are voided by
+        `invalidate_cached_counts()` or when `data_version` changes.
+        """
+        normalized_filters = json_util.dumps(
+            {
+                'data_version': data_version,
+                'permission_filters': permission_filters or [],
+                'query': query or {},
+                'submission_ids': sorted(submission_ids or []),
+            },
+            sort_keys=True,
+        )
+        cache_key = ':'.join(
+            [
+                cls.COUNT_CACHE_KEY_PREFIX,
+                mongo_userform_id,
+                cls.get_write_generation(mongo_userform_id),
+                calculate_hash(normalized_filters),
+            ]
+        )
+        if (count := cache.get(cache_key)) is not None:
+            return count, False
+
+        # `get_count()` alters `query`
+        count = cls.get_count(
+            mongo_userform_id,
+            query=copy.deepcopy(query),
+            submission_ids=submission_ids,
+            permission_filters=permission_filters,
+        )
+        cache.set(cache_key, count, settings.SUBMISSION_COUNT_CACHE_TIMEOUT)
+        return count, True
+
     @classmethod
     def get_instances(
         cls,
@@ -138,7 +197,37 @@ class MongoHelper:
         submission_ids: Optional[list] = None,
         permission_filters: Optional[list] = None,
         skip_count=False,
+        keyset: Optional[dict] = None,
     ):
+        """
+        Return a cursor on the submissions of `mongo_userform_id` and their
+        total count (`None` if `skip_count` is True).
+
+        When `keyset` is provided, results are paginated by range instead of
+        `skip()`. `keyset` is a dictionary with the `value` of the sort key and
+        the `id` of the last document of the previous page (both `None` for the
+        first page) and a `reverse` boolean to walk backwards. `_id` is used as
+        a tie-breaker to support sort keys which are not unique.
+        See `kpi.paginators.DataCursorPagination`
+        """
+        sort_key = None
+        sort_dir = None
+        if sort is not None and len(sort) == 1:
+            sort = MongoHelper.to_safe_dict(sort, reading=True)
+            sort_key = list(sort.keys())[0]
+            sort_dir = int(sort[sort_key])  # -1 for desc, 1 for asc
+
+        keyset_query = None
+        if keyset is not None:
+            if sort_key is None:
+                sort_key = '_id'
+                sort_dir = 1
+            if keyset.get('reverse'):
+                sort_dir = -sort_dir
+            keyset_query = cls.get_keyset_query(
+                sort_key, sort_dir, keyset.get('value'), keyset.get('id')
+            )
+
         cursor, total_count = cls._get_cursor_and_count(
             mongo_userform_id,
             fields=fields,
@@ -146,23 +235,79 @@ class MongoHelper:
             submission_ids=submission_ids,
             permission_filters=permission_filters,
             skip_count=skip_count,
+            keyset_query=keyset_query,
         )
 
         cursor.skip(start)
         if limit is not None:
             cursor.limit(limit)
 
-        if sort is not None and len(sort) == 1:
-            sort = MongoHelper.to_safe_dict(sort, reading=True)
-            sort_key = list(sort.keys())[0]
-            sort_dir = int(sort[sort_key])  # -1 for desc, 1 for asc
-            cursor.sort(sort_key, sort_dir)
+        if sort_key is not None:
+            if keyset is not None and sort_key != '_id':
+                cursor.sort([(sort_key, sort_dir), ('_id', sort_dir)])
+            else:
+                cursor.sort(sort_key, sort_dir)
 
         # set batch size
-        cursor.batch_size = cls.DEFAULT_BATCHSIZE
+        cursor.batch_size(cls.DEFAULT_BATCHSIZE)
 
         return cursor, total_count
 
+    @classmethod
+    def get_keyset_query(
+        cls,
+        sort_key: str,
+        sort_dir: int,
+        value: Any,
+        submission_id: Optional[int],
+    ) -> Optional[dict]:
+        """
+        Build the range condition which matches documents located after
+        (`value`, `submission_id`) when sorting on `sort_key` in the direction
+        `sort_dir` (and on `_id`, as tie-breaker, in the same direction).
+
+        `sort_key` must be already encoded (see `to_safe_dict()`) because the
+        returned query is not passed through `to_safe_dict()` again.
+        Documents whose `sort_key` is missing or null are sorted first by
+        MongoDB in ascending order (and last in descending order).
+        """
+        if submission_id is None:
+            return None
+
+        id_operator = '$gt' if sort_dir > 0 else '$lt'
+        same_value_query = {'_id': {id_operator: submission_id}}
+
+        if sort_key == '_id':
+            return same_value_query
+
+        same_value_query[sort_key] = value
+
+        if sort_dir > 0:
+            if value is None:
+                return {
+                    cls.OR_OPERATOR: [
+                        same_value_query,
+                        {sort_key: {'$ne': None}},
+                    ]
+                }
+            return {
+                cls.OR_OPERATOR: [
+                    {sort_key: {'$gt': value}},
+                    same_value_query,
+                ]
+            }
+
+        if value is None:
+            return same_value_query
+
+        return {
+            cls.OR_OPERATOR: [
+                {sort_key: {'$lt': value}},
+                same_value_query,
+                {sort_key: None},
+            ]
+        }
+
     @staticmethod
     def get_max_time_ms():
         """
@@ -174,6 +319,49 @@ class MongoHelper:
             max_time_secs = settings.MONGO_QUERY_TIMEOUT
         return max_time_secs * 1000
 
+    @classmethod
+    def get_last_edited(cls, mongo_userform_id: str) -> Optional[str]:
+        """
+        Return the most recent date submissions of `mongo_userform_id` have
+        been edited, if any.
+        """
+        cursor = (
+            settings.MONGO_DB.instances.find(
+                {
+                    cls.USERFORM_ID: mongo_userform_id,
+                    cls.LAST_EDITED: {'$exists': True},
+                },
+                {cls.LAST_EDITED: 1, '_id': 0},
+                max_time_ms=cls.get_max_time_ms(),
+            )
+            .sort(cls.LAST_EDITED, -1)
+            .limit(1)
+        )
+        for record in cursor:
+            return record[cls.LAST_EDITED]
+        return None
+
+    @classmethod
+    def get_write_generation(cls, mongo_userform_id: str) -> str:
+        """
+        Return a value which changes every time `invalidate_cached_counts()`
+        is called for `mongo_userform_id`, i.e. whenever KPI writes
+        submissions.
+        """
+        return cache.get(cls._get_count_generation_key(mongo_userform_id), '0')
+
+    @classmethod
+    def invalidate_cached_counts(cls, mongo_userform_id: str):
+        """
+        Void all counts of `mongo_userform_id` cached by `get_cached_count()`.
+        It must be called whenever submissions are written.
+        """
+        cache.set(
+            cls._get_count_generation_key(mongo_userform_id),
+            uuid.uuid4().hex,
+            None,
+        )
+
     @classmethod
     def is_attribute_invalid(cls, key: str) -> str:
         """
@@ -308,6 +496,80 @@ class MongoHelper:
 
         return {cls.AND_OPERATOR: [query, permission_filters_query]}
 
+    @classmethod
+    def get_value_frequencies(
+        cls,
+        mongo_userform_id: str,
+        fields: list[str],
+        permission_filters: Optional[list] = None,
+    ) -> dict[str, list[dict]]:
+        """
+        Count, inside MongoDB, how many submissions contain each distinct
+        value of each field of `fields`.
+
+        Return a dictionary indexed by field names whose values are lists of
+        `{'value': ..., 'count': ...}` (`None` stands for missing values),
+        sorted by first occurrence, i.e. in the same order as if submissions
+        were read one by one.
+        """
+        if not fields:
+            return {}
+
+        query = {cls.USERFORM_ID: mongo_userform_id}
+        if permission_filters is not None:
+            query = cls.get_permission_filters_query(query, permission_filters)
+        query = cls.to_safe_dict(query, reading=True)
+
+        pipelines = [
+            [
+                {
+                    '$group': {
+                        '_id': f'${cls.encode(field)}',
+                        'count': {'$sum': 1},
+                        'first_id': {'$min': '$_id'},
+                    }
+                },
+                {'$sort': {'first_id': 1}},
+            ]
+            for field in fields
+        ]
+
+        # Each submission can hold a distinct value, so the number of
+        # submissions bounds the size of the results
+        submission_count, _ = cls.get_cached_count(
+            mongo_userform_id, permission_filters=permission_filters
+        )
+        if submission_count * len(fields) > cls.FACET_MAX_GROUPS:
+            return {
+                field: [
+                    {'value': group['_id'], 'count': group['count']}
+                    for group in settings.MONGO_DB.instances.aggregate(
+                        [{'$match': query}] + pipeline,
+                        allowDiskUse=True,
+                        maxTimeMS=cls.get_max_time_ms(),
+                    )
+                ]
+                for field, pipeline in zip(fields, pipelines)
+            }
+
+        # Mongo forbids some characters in `$facet` output names
+        facets = {
+            f'f{idx}': pipeline for idx, pipeline in enumerate(pipelines)
+        }
+        results = settings.MONGO_DB.instances.aggregate(
+            [{'$match': query}, {'$facet': facets}],
+            maxTimeMS=cls.get_max_time_ms(),
+        )
+        results = next(results, {})
+
+        return {
+            field: [
+                {'value': group['_id'], 'count': group['count']}
+                for group in results.get(f'f{idx}', [])
+            ]
+            for idx, field in enumerate(fields)
+        }
+
     @classmethod
     def _convert_permissions(
         cls, input_data: Union[PermissionFilter, list[PermissionFilter]]
@@ -345,6 +607,7 @@ class MongoHelper:
         submission_ids: Optional[list] = None,
         permission_filters=None,
         skip_count=False,
+        keyset_query: Optional[dict] = None,
     ):
         if query is None:
             query = {}
@@ -372,8 +635,14 @@ class MongoHelper:
             # Retrieve all fields except `cls.USERFORM_ID`
             fields_to_select = {cls.USERFORM_ID: 0}
 
+        # The keyset condition only narrows down the page, it must not alter
+        # the total count.
+        find_query = query
+        if keyset_query is not None:
+            find_query = {cls.AND_OPERATOR: [query, keyset_query]}
+
         cursor = settings.MONGO_DB.instances.find(
-            query, fields_to_select, max_time_ms=cls.get_max_time_ms()
+            find_query, fields_to_select, max_time_ms=cls.get_max_time_ms()
         )
         count = None
         if not skip_count:
@@ -382,6 +651,10 @@ class MongoHelper:
             )
         return cursor, count
 
+    @classmethod
+    def _get_count_generation_key(cls, mongo_userform_id: str) -> str:
+        return f'{cls.COUNT_CACHE_KEY_PREFIX}_generation:{mongo_userform_id}'
+
     @classmethod
     def _is_attribute_encoded(cls, key):
         """
@@ -2,6 +2,8 @@
 from __future__ import annotations
 import csv
 from io import StringIO
+from itertools import islice
+from typing import BinaryIO
 
 from django.conf import settings
 from django.contrib.auth.models import User
@@ -16,6 +18,8 @@ from kpi.models import Asset
 from kpi.utils.project_views import get_region_for_view
 
 
+EXPORT_CHUNK_SIZE = 1000
+
 ASSET_FIELDS = (
     'id',
     'uid',
@@ -116,18 +120,20 @@ def get_q(countries: list[str], export_type: str) -> QuerySet:
     return Q(**{q_term: countries})
 
 
-def get_submission_count(xform_id: int) -> int:
-
-    result = (
-        KobocatXForm.objects.values('num_of_submissions')
-        .filter(pk=xform_id)
-        .first()
-    )
-
-    if not result:
-        return 0
-
-    return result['num_of_submissions']
+def get_submission_counts(xform_ids: list[int]) -> dict[int, int]:
+    """
+    Return the number of submissions of each KoBoCAT XForm of `xform_ids`,
+    with one query per chunk of `EXPORT_CHUNK_SIZE` ids
+    """
+    xform_ids = [xform_id for xform_id in set(xform_ids) if xform_id]
+    submission_counts = {}
+    for i in range(0, len(xform_ids), EXPORT_CHUNK_SIZE):
+        submission_counts.update(
+            KobocatXForm.objects.filter(
+                pk__in=xform_ids[i:i + EXPORT_CHUNK_SIZE]
+            ).values_list('pk', 'num_of_submissions')
+        )
+    return submission_counts
 
 
 def get_data(filtered_queryset: QuerySet, export_type: str) -> QuerySet:
@@ -152,28 +158,46 @@ def get_data(filtered_queryset: QuerySet, export_type: str) -> QuerySet:
 
 
 def create_project_view_export(
-        export_type: str, username: str, uid: str
-) -> StringIO:
+    export_type: str, username: str, uid: str, output_file: BinaryIO
+) -> None:
+    """
+    Write the CSV export into `output_file`, chunk by chunk, to avoid
+    keeping the whole export in memory
+    """
     config = CONFIG[export_type]
     region_for_view = get_region_for_view(uid)
 
     q = get_q(region_for_view, export_type)
     filtered_queryset = config['queryset'].filter(q)
-    data = get_data(filtered_queryset, export_type)
+    data = get_data(filtered_queryset, export_type).iterator(
+        chunk_size=EXPORT_CHUNK_SIZE
+    )
 
     buff = StringIO()
     writer = csv.writer(buff)
     writer.writerow(config['columns'])
-    for row in data:
-        items = row.pop(config['key'], {}) or {}
-        flatten_settings_inplace(items)
-        row.update(items)
+    while rows := list(islice(data, EXPORT_CHUNK_SIZE)):
         # submission counts come from kobocat database and therefore need to be
         # appended manually rather than through queries
         if export_type == 'assets':
-            row['submission_count'] = get_submission_count(row['form_id'])
-        flat_row = [get_row_value(row, col) for col in config['columns']]
-        writer.writerow(flat_row)
-
-    buff.seek(0)
-    return buff
+            submission_counts = get_submission_counts(
+                [row['form_id'] for row in rows]
+            )
+        for row in rows:
+            items = row.pop(config['key'], {}) or {}
+            flatten_settings_inplace(items)
+            row.update(items)
+            if export_type == 'assets':
+                row['submission_count'] = submission_counts.get(
+                    row['form_id'], 0
+                )
+            flat_row = [get_row_value(row, col) for col in config['columns']]
+            writer.writerow(flat_row)
+
+        output_file.write(buff.getvalue().encode())
+        buff.seek(0)
+        buff.truncate()
+
+    # Only the header remains when there is no data to export
+    if buff.tell():
+        output_file.write(buff.getvalue().encode())
@@ -4,7 +4,9 @@ import json
 from collections import defaultdict, OrderedDict
 from operator import itemgetter
 
-from django.db.models import Count
+from django.contrib.postgres.aggregates import StringAgg
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import MD5, Collate
 from django.http import Http404
 from django.shortcuts import get_object_or_404
 from rest_framework import exceptions, renderers, status, viewsets
@@ -33,6 +35,8 @@ from kpi.filters import (
 from kpi.highlighters import highlight_xform
 from kpi.models import (
     Asset,
+    AssetMetadataFacet,
+    AssetVersion,
     UserAssetSubscription,
 )
 from kpi.mixins.object_permission import ObjectPermissionViewSetMixin
@@ -55,7 +59,6 @@ from kpi.serializers.v2.asset import (
     AssetListSerializer,
     AssetSerializer,
 )
-from kpi.utils.hash import calculate_hash
 from kpi.serializers.v2.reports import ReportsDetailSerializer
 from kpi.utils.kobo_to_xlsform import to_xlsform_structure
 from kpi.utils.ss_structure_to_mdtable import ss_structure_to_mdtable
@@ -386,13 +389,10 @@ class AssetViewSet(
     ]
     # Terms that can be used to search and filter return values
     # from a query `q`
+    # `search_document` concatenates name, owner's username, description,
+    # summary, tags and uid (see `Asset.get_search_document()`)
     search_default_field_lookups = [
-        'name__icontains',
-        'owner__username__icontains',
-        'settings__description__icontains',
-        'summary__icontains',
-        'tags__name__icontains',
-        'uid__icontains',
+        'search_document__icontains',
     ]
 
     def get_object(self):
@@ -562,53 +562,25 @@ class AssetViewSet(
             'organizations': set(),
         }
 
-        records = queryset.values('summary', 'settings').exclude(
-            summary__languages=[],
-            settings__country_codes=[],
-            settings__sector={},
-            settings__organization='',
+        # Facets are materialized on `Asset.save()`, one aggregate query is
+        # enough whatever the number of assets is
+        records = (
+            AssetMetadataFacet.objects.filter(
+                asset_id__in=queryset.order_by().values('pk')
+            )
+            .values_list('facet', 'value', 'label')
+            .distinct()
         )
 
-        # Languages
-        records = records.order_by()
-
-        for record in records.all():
-            try:
-                languages = record['summary']['languages']
-            except (ValueError, KeyError):
-                pass
-            else:
-                for language in languages:
-                    if language:
-                        metadata['languages'].add(language)
-
-            try:
-                country = record['settings']['country']
-                value = country['value']
-                label = country['label']
-            except (KeyError, TypeError):
-                pass
-            else:
-                if value and value not in metadata['countries']:
-                    metadata['countries'][value] = label
-
-            try:
-                sector = record['settings']['sector']
-                value = sector['value']
-                label = sector['label']
-            except (KeyError, TypeError):
-                pass
+        for facet, value, label in records:
+            if facet == AssetMetadataFacet.LANGUAGE:
+                metadata['languages'].add(value)
+            elif facet == AssetMetadataFacet.COUNTRY:
+                metadata['countries'].setdefault(value, label)
+            elif facet == AssetMetadataFacet.SECTOR:
+                metadata['sectors'].setdefault(value, label)
             else:
-                if value and value not in metadata['sectors']:
-                    metadata['sectors'][value] = label
-
-            try:
-                organization = record['settings']['organization']
-            except KeyError:
-                pass
-            else:
-                if organization:
-                    metadata['organizations'].add(organization)
+                metadata['organizations'].add(value)
 
         metadata['languages'] = sorted(list(metadata['languages']))
 
@@ -726,24 +698,29 @@ class AssetViewSet(
         if user.is_anonymous:
             raise exceptions.NotAuthenticated()
         else:
+            latest_version_uid = Subquery(
+                AssetVersion.objects.filter(asset_id=OuterRef('pk'))
+                .order_by('-date_modified')
+                .values('uid')[:1]
+            )
             accessible_assets = (
                 get_objects_for_user(user, 'view_asset', Asset)
                 .filter(asset_type=ASSET_TYPE_SURVEY)
-                .order_by("uid")
+                .annotate(latest_version_uid=latest_version_uid)
             )
 
-            assets_version_ids = [
-                asset.version_id
-                for asset in accessible_assets
-                if asset.version_id is not None
-            ]
-            # Sort alphabetically
-            assets_version_ids.sort()
-
-            if len(assets_version_ids) > 0:
-                hash_ = calculate_hash(''.join(assets_version_ids), algorithm='md5')
-            else:
-                hash_ = ''
+            # Let PostgreSQL sort (binary collation, as Python would do) and
+            # hash the version uids. It avoids loading every asset and their
+            # latest version.
+            hash_ = accessible_assets.aggregate(
+                hash=MD5(
+                    StringAgg(
+                        'latest_version_uid',
+                        delimiter='',
+                        ordering=Collate('latest_version_uid', 'C'),
+                    )
+                )
+            )['hash'] or ''
 
             return Response({
                 'hash': hash_
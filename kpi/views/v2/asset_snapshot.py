@@ -1,6 +1,7 @@
 # coding: utf-8
-import re
 import copy
+import json
+import re
 from xml.dom import Node
 from typing import Optional
 
@@ -30,6 +31,8 @@ from kpi.renderers import (
 from kpi.serializers.v2.asset_snapshot import AssetSnapshotSerializer
 from kpi.serializers.v2.open_rosa import FormListSerializer, ManifestSerializer
 from kpi.tasks import enketo_flush_cached_preview
+from kpi.utils.hash import calculate_hash
+from kpi.utils.http import get_not_modified_response, get_validator_headers
 from kpi.utils.object_permission import get_database_user
 from kpi.utils.project_views import (
     user_has_project_view_asset_perm,
@@ -103,8 +106,18 @@ class AssetSnapshotViewSet(OpenRosaViewSetMixin, NoUpdateModelViewSet):
         snapshot = self.get_object()
         context = {'request': request}
         serializer = FormListSerializer([snapshot], many=True, context=context)
+        # The form list also contains URLs and the description, not only the
+        # form hash
+        etag = calculate_hash(
+            json.dumps(serializer.data, sort_keys=True).encode(), prefix=True
+        )
+        if not_modified_response := get_not_modified_response(request, etag):
+            return not_modified_response
 
-        return Response(serializer.data, headers=self.get_headers())
+        headers = self.get_headers()
+        headers.update(get_validator_headers(etag))
+
+        return Response(serializer.data, headers=headers)
 
     def get_object(self):
         try:
@@ -165,8 +178,18 @@ class AssetSnapshotViewSet(OpenRosaViewSetMixin, NoUpdateModelViewSet):
 
         context = {'request': request}
         serializer = ManifestSerializer(files, many=True, context=context)
+        # Files are represented by their stored hashes, thus the manifest
+        # entity tag can be built without reading any file on storage
+        etag = calculate_hash(
+            json.dumps(serializer.data, sort_keys=True).encode(), prefix=True
+        )
+        if not_modified_response := get_not_modified_response(request, etag):
+            return not_modified_response
+
+        headers = self.get_headers()
+        headers.update(get_validator_headers(etag))
 
-        return Response(serializer.data, headers=self.get_headers())
+        return Response(serializer.data, headers=headers)
 
     @action(detail=True, renderer_classes=[renderers.TemplateHTMLRenderer])
     def preview(self, request, *args, **kwargs):
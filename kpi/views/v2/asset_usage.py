@@ -1,5 +1,6 @@
 from rest_framework import renderers, viewsets
 from rest_framework.mixins import ListModelMixin
+from rest_framework.response import Response
 
 from kpi.models.asset import Asset
 from kpi.permissions import IsAuthenticated
@@ -48,4 +49,23 @@ class AssetUsageViewSet(ListModelMixin, viewsets.GenericViewSet):
     serializer_class = AssetUsageSerializer
 
     def get_queryset(self):
-        return Asset.objects.defer('content').filter(owner=self.request.user)
+        return (
+            Asset.objects.defer('content')
+            .select_related('owner')
+            .filter(owner=self.request.user)
+        )
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+
+        page = self.paginate_queryset(queryset)
+        assets = page if page is not None else list(queryset)
+        # Usage of all the assets of the page is retrieved at once, instead
+        # of running several queries for each of them.
+        context_ = self.get_serializer_context()
+        context_.update(AssetUsageSerializer.get_usage_per_asset(assets))
+        serializer = self.get_serializer(assets, many=True, context=context_)
+
+        if page is not None:
+            return self.get_paginated_response(serializer.data)
+        return Response(serializer.data)
@@ -33,7 +33,7 @@ from kpi.constants import (
 )
 from kpi.exceptions import ObjectDeploymentDoesNotExist
 from kpi.models import Asset
-from kpi.paginators import DataPagination
+from kpi.paginators import DataCursorPagination, DataPagination
 from kpi.permissions import (
     DuplicateSubmissionPermission,
     EditLinkSubmissionPermission,
@@ -95,6 +95,23 @@ class DataViewSet(AssetNestedObjectViewsetMixin, NestedViewSetMixin,
     >
     >       curl -X GET https://[kpi]/api/v2/assets/aSAvYreNzVEkrWg5Gdcvg/data/?start=0&limit=10
 
+    Depending on the server configuration, `count` can be an estimate (e.g.
+    retrieved from a counter or a cache) for large projects. The response
+    property `is_count_exact` tells whether it is the case.
+
+    ### Cursor pagination
+
+    On large projects, deep pages are faster to retrieve with the `cursor`
+    parameter. Pass it empty to get the first page, then follow the `next` and
+    `previous` links of the response. It can be combined with `limit`, `sort`
+    (on one key only), `fields` and `query`, but not with `start`.
+    The response does not contain `count`.
+    <span class='label label-warning'>Not supported in `XML` format</span>
+
+    > Example: The first ten results
+    >
+    >       curl -X GET https://[kpi]/api/v2/assets/aSAvYreNzVEkrWg5Gdcvg/data/?cursor=&limit=10
+
     ## Query submitted data
     Provides a list of submitted data for a specific form. Use `query`
     parameter to apply form data specific, see
@@ -299,6 +316,29 @@ class DataViewSet(AssetNestedObjectViewsetMixin, NestedViewSetMixin,
     "group_1/sub_group_1/.../sub_group_n/question_1": "new value"
     </pre>
 
+    When the number of submissions to update is above the limit set by the
+    server, they are updated in the background and the response is
+    `202 Accepted`.
+
+    > Response 202
+    >
+    >        {
+    >           "uid": {string},
+    >           "status": "processing",
+    >           "count": {integer},
+    >           "processed": 0,
+    >           "url": "https://[kpi]/api/v2/assets/aSAvYreNzVEkrWg5Gdcvg/data/bulk/{uid}/"
+    >        }
+
+    The progress of the update can be retrieved at `url`.
+
+    <pre class="prettyprint">
+    <b>GET</b> /api/v2/assets/<code>{uid}</code>/data/bulk/<code>{task_uid}</code>/
+    </pre>
+
+    `status` becomes `complete` (and `result` contains the same payload as a
+    synchronous update) or `error` once the update is over.
+
 
     ### CURRENT ENDPOINT
     """
@@ -380,8 +420,33 @@ class DataViewSet(AssetNestedObjectViewsetMixin, NestedViewSetMixin,
         if json_response['status'] == status.HTTP_200_OK and audit_logs:
             AuditLog.objects.bulk_create(audit_logs)
 
+        if json_response['status'] == status.HTTP_202_ACCEPTED:
+            json_response['data']['url'] = reverse(
+                'submission-bulk-progress',
+                kwargs={
+                    'parent_lookup_asset': self.asset.uid,
+                    'task_uid': json_response['data']['uid'],
+                },
+                request=request,
+            )
+
         return Response(**json_response)
 
+    @action(
+        detail=False,
+        methods=['GET'],
+        renderer_classes=[renderers.JSONRenderer],
+        url_path=r'bulk/(?P<task_uid>[^/.]+)',
+    )
+    def bulk_progress(self, request, task_uid, *args, **kwargs):
+        deployment = self._get_deployment()
+        progress = deployment.get_bulk_update_submissions_progress(
+            task_uid, request.user
+        )
+        if progress is None:
+            raise Http404
+        return Response(progress)
+
     def destroy(self, request, pk, *args, **kwargs):
         deployment = self._get_deployment()
         # Coerce to int because back end only finds matches with same type
@@ -447,6 +512,21 @@ class DataViewSet(AssetNestedObjectViewsetMixin, NestedViewSetMixin,
         submission_id = positive_int(pk)
         return self._get_enketo_link(request, submission_id, 'view')
 
+    @property
+    def paginator(self):
+        """
+        Use keyset pagination when `cursor` is present in the query string
+        """
+        if not hasattr(self, '_paginator'):
+            if (
+                DataCursorPagination.cursor_query_param
+                in self.request.query_params
+            ):
+                self._paginator = DataCursorPagination()
+            else:
+                self._paginator = self.pagination_class()
+        return self._paginator
+
     def get_queryset(self):
         # This method is needed when pagination is activated and renderer is
         # `BrowsableAPIRenderer`. Because data comes from Mongo, `list()` and
@@ -470,6 +550,11 @@ class DataViewSet(AssetNestedObjectViewsetMixin, NestedViewSetMixin,
                 )
             )
 
+        paginator = self.paginator
+        use_cursor = isinstance(paginator, DataCursorPagination)
+        if use_cursor:
+            filters = paginator.get_mongo_query_params(request, filters)
+
         try:
             submissions = deployment.get_submissions(request.user,
                                                     format_type=format_type,
@@ -482,12 +567,21 @@ class DataViewSet(AssetNestedObjectViewsetMixin, NestedViewSetMixin,
                 raise serializers.ValidationError(message)
             logging.warning(message, exc_info=True)
             raise serializers.ValidationError('Unsupported query')
-        # Create a dummy list to let the Paginator do all the calculation
+
+        if use_cursor:
+            page = paginator.paginate_submissions(submissions)
+            return paginator.get_paginated_response(page)
+
+        # Pass a dummy sequence to let the Paginator do all the calculation
         # for pagination because it does not need the list of real objects.
-        # It avoids retrieving all the objects from MongoDB
-        dummy_submissions_list = [None] * deployment.current_submission_count
+        # It avoids retrieving all the objects from MongoDB. `range()` is lazy
+        # and does not allocate one item per submission.
+        dummy_submissions_list = range(deployment.current_submission_count)
         page = self.paginate_queryset(dummy_submissions_list)
         if page is not None:
+            paginator.is_count_exact = (
+                deployment.current_submission_count_is_exact
+            )
             return self.get_paginated_response(submissions)
 
         return Response(list(submissions))
@@ -614,6 +708,10 @@ class DataViewSet(AssetNestedObjectViewsetMixin, NestedViewSetMixin,
 
         # Remove `format` from filters. No need to use it
         filters.pop('format', None)
+        # `cursor` is decoded by `DataCursorPagination` into `keyset`, which
+        # must not come from the query string
+        filters.pop(DataCursorPagination.cursor_query_param, None)
+        filters.pop('keyset', None)
         # Do not allow requests to retrieve more than `SUBMISSION_LIST_LIMIT`
         # submissions at one time
         limit = filters.get('limit', settings.SUBMISSION_LIST_LIMIT)
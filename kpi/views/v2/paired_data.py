@@ -1,7 +1,12 @@
 # coding: utf-8
+import hashlib
+import json
+import tempfile
+from typing import BinaryIO, Optional, Union
+
 from django.conf import settings
-from django.core.files.base import ContentFile
-from django.http import Http404
+from django.core.files import File
+from django.http import FileResponse, Http404, HttpResponse
 from django.utils import timezone
 from rest_framework import renderers, viewsets
 from rest_framework.decorators import action
@@ -18,6 +23,8 @@ from kpi.permissions import (
 from kpi.serializers.v2.paired_data import PairedDataSerializer
 from kpi.renderers import SubmissionXMLRenderer
 from kpi.utils.hash import calculate_hash
+from kpi.utils.http import get_not_modified_response, get_validator_headers
+from kpi.utils.mongo_helper import MongoHelper
 from kpi.utils.viewset_mixins import AssetNestedObjectViewsetMixin
 from kpi.utils.xml import strip_nodes, add_xml_declaration
 
@@ -179,6 +186,8 @@ class PairedDataViewset(AssetNestedObjectViewsetMixin,
     permission_classes = (AssetEditorPermission,)
     serializer_class = PairedDataSerializer
 
+    XML_EXTERNAL_CHUNK_SIZE = 1024 * 1024
+
     @action(detail=True,
             methods=['GET'],
             permission_classes=[XMLExternalDataPermission],
@@ -243,65 +252,55 @@ class PairedDataViewset(AssetNestedObjectViewsetMixin,
                     timedelta.total_seconds() > settings.PAIRED_DATA_EXPIRATION
                 )
 
-        # ToDo evaluate adding headers for caching and a HTTP 304 status code
         if not has_expired:
-            return Response(asset_file.content.file.read().decode())
-
-        # If the content of `asset_file' has expired, let's regenerate the XML
-        submissions = source_asset.deployment.get_submissions(
-            self.asset.owner,
-            format_type=SUBMISSION_FORMAT_TYPE_XML
-        )
-        parsed_submissions = []
-        allowed_fields = paired_data.allowed_fields
-        random_uuid = ShortUUID().random(24)
-
-        for submission in submissions:
-            # Use `rename_root_node_to='data'` to rename the root node of each
-            # submission to `data` so that form authors do not have to rewrite
-            # their `xml-external` formulas any time the asset UID changes,
-            # e.g. when cloning a form or creating a project from a template.
-            # Set `use_xpath=True` because `paired_data.fields` uses full group
-            # hierarchies, not just question names.
-            parsed_submissions.append(
-                strip_nodes(
-                    submission,
-                    allowed_fields,
-                    use_xpath=True,
-                    rename_root_node_to='data',
-                    bulk_action_cache_key=random_uuid,
-                )
+            return self._get_xml_external_response(asset_file)
+
+        # If the content of `asset_file' has expired, let's update the XML
+        old_state = asset_file.metadata.get('paired_data_state')
+        if not asset_file.content:
+            old_state = None
+        new_state = self._get_xml_external_state(paired_data, source_asset)
+        if new_state['count'] == 0:
+            # We do not want to cache an empty file
+            root_tag_name = SubmissionXMLRenderer.root_tag_name
+            return Response(
+                add_xml_declaration(f'<{root_tag_name}></{root_tag_name}>')
             )
 
-        filename = paired_data.filename
-        parsed_submissions_to_str = ''.join(parsed_submissions)
-        root_tag_name = SubmissionXMLRenderer.root_tag_name
-        xml_ = add_xml_declaration(
-            f'<{root_tag_name}>'
-            f'{parsed_submissions_to_str}'
-            f'</{root_tag_name}>'
-        )
-
-        if not parsed_submissions:
-            # We do not want to cache an empty file
-            return Response(xml_)
+        if self._can_append_to_xml_external(source_asset, old_state, new_state):
+            if new_state['last_submission_id'] == old_state['last_submission_id']:
+                # Nothing has changed since last time, keep the file as is
+                asset_file.save(update_fields=['date_modified'])
+                return self._get_xml_external_response(asset_file)
+            xml_file, md5_hash = self._write_xml_external(
+                paired_data,
+                source_asset,
+                new_state,
+                asset_file=asset_file,
+                after_submission_id=old_state['last_submission_id'],
+            )
+        else:
+            xml_file, md5_hash = self._write_xml_external(
+                paired_data, source_asset, new_state
+            )
 
         # We need to delete the current file (if it exists) when filename
         # has changed. Otherwise, it would leave an orphan file on storage
+        filename = paired_data.filename
         if asset_file.pk and asset_file.content.name != filename:
             asset_file.content.delete()
 
-        asset_file.content = ContentFile(xml_.encode(), name=filename)
+        with xml_file:
+            asset_file.content = File(xml_file, name=filename)
+            asset_file.set_md5_hash(md5_hash)
+            asset_file.metadata['paired_data_state'] = new_state
+            asset_file.save()
 
-        # `xml_` is already there in memory, let's use its content to get its
-        # hash and store it within `asset_file` metadata
-        asset_file.set_md5_hash(calculate_hash(xml_, prefix=True))
-        asset_file.save()
         if old_hash != asset_file.md5_hash:
             # resync paired data to the deployment backend
             self.asset.deployment.sync_media_files(AssetFile.PAIRED_DATA)
 
-        return Response(xml_)
+        return self._get_xml_external_response(asset_file)
 
     def get_object(self):
         obj = self.get_queryset(as_list=False).get(
@@ -335,3 +334,162 @@ class PairedDataViewset(AssetNestedObjectViewsetMixin,
             source__names[record['uid']] = record['name']
         context_['source__names'] = source__names
         return context_
+
+    def _can_append_to_xml_external(
+        self, source_asset: Asset, old_state: Optional[dict], new_state: dict
+    ) -> bool:
+        """
+        Return whether new submissions can be appended to the existing file.
+        Otherwise, it must be rebuilt from scratch because the fields have
+        changed, or submissions have been edited or deleted since it has
+        been built.
+        """
+        if not old_state:
+            return False
+
+        for key in ['fields_hash', 'last_edit_time', 'write_generation']:
+            # States saved before `last_edit_time` was added are rebuilt
+            if key not in old_state or old_state[key] != new_state[key]:
+                return False
+
+        # Ensure no submissions have been deleted
+        count = source_asset.deployment.calculated_submission_count(
+            self.asset.owner,
+            query={'_id': {'$lte': old_state['last_submission_id']}},
+        )
+        return count == old_state['count']
+
+    def _get_xml_external_response(
+        self, asset_file: AssetFile
+    ) -> Union[FileResponse, HttpResponse]:
+        """
+        Stream the content of the `xml-external` file with validator headers.
+        If the client already has the current version (based on the stored
+        MD5 hash), return a `304 Not Modified` without reading the storage.
+        """
+        not_modified_response = get_not_modified_response(
+            self.request, asset_file.md5_hash, asset_file.date_modified
+        )
+        if not_modified_response:
+            return not_modified_response
+
+        response = FileResponse(
+            asset_file.content.open('rb'),
+            content_type=(
+                f'{SubmissionXMLRenderer.media_type}; '
+                f'charset={SubmissionXMLRenderer.charset}'
+            ),
+        )
+        for header, value in get_validator_headers(
+            asset_file.md5_hash, asset_file.date_modified
+        ).items():
+            response[header] = value
+        return response
+
+    def _get_xml_external_state(
+        self, paired_data: PairedData, source_asset: Asset
+    ) -> dict:
+        """
+        Return what is needed to know whether submissions of `source_asset`
+        have changed since the `xml-external` file has been built.
+        """
+        source_deployment = source_asset.deployment
+        # Retrieve the generation and the last edit before the submissions to
+        # not miss any write
+        write_generation = MongoHelper.get_write_generation(
+            source_deployment.mongo_userform_id
+        )
+        last_edit_time = source_deployment.last_submission_edit_time
+        last_submissions = list(
+            source_deployment.get_submissions(
+                self.asset.owner,
+                fields=['_id'],
+                sort={'_id': -1},
+                limit=1,
+            )
+        )
+        if not last_submissions:
+            return {'count': 0}
+
+        last_submission_id = last_submissions[0]['_id']
+        count = source_deployment.calculated_submission_count(
+            self.asset.owner, query={'_id': {'$lte': last_submission_id}}
+        )
+        return {
+            'count': count,
+            'fields_hash': calculate_hash(json.dumps(paired_data.allowed_fields)),
+            'last_edit_time': last_edit_time,
+            'last_submission_id': last_submission_id,
+            'write_generation': write_generation,
+        }
+
+    def _write_xml_external(
+        self,
+        paired_data: PairedData,
+        source_asset: Asset,
+        state: dict,
+        asset_file: Optional[AssetFile] = None,
+        after_submission_id: Optional[int] = None,
+    ) -> tuple[BinaryIO, str]:
+        """
+        Write the `xml-external` file into a temporary file, without keeping
+        the whole content in memory, and return it with its MD5 hash.
+
+        If `asset_file` and `after_submission_id` are provided, only the
+        submissions which have been received since are processed, and added
+        to the content of `asset_file`.
+        """
+        root_tag_name = SubmissionXMLRenderer.root_tag_name
+        closing_tag = f'</{root_tag_name}>'.encode()
+        xml_file = tempfile.TemporaryFile()
+        md5 = hashlib.md5()
+
+        def _write(content: bytes):
+            xml_file.write(content)
+            md5.update(content)
+
+        id_query = {'$lte': state['last_submission_id']}
+        if after_submission_id is None:
+            _write(add_xml_declaration(f'<{root_tag_name}>').encode())
+        else:
+            # Copy the existing file without its closing tag
+            remaining_bytes = asset_file.content.size - len(closing_tag)
+            with asset_file.content.open('rb') as existing_file:
+                while remaining_bytes > 0:
+                    chunk = existing_file.read(
+                        min(self.XML_EXTERNAL_CHUNK_SIZE, remaining_bytes)
+                    )
+                    if not chunk:
+                        break
+                    _write(chunk)
+                    remaining_bytes -= len(chunk)
+            id_query['$gt'] = after_submission_id
+
+        submissions = source_asset.deployment.get_submissions(
+            self.asset.owner,
+            format_type=SUBMISSION_FORMAT_TYPE_XML,
+            query={'_id': id_query},
+        )
+        allowed_fields = paired_data.allowed_fields
+        random_uuid = ShortUUID().random(24)
+        for submission in submissions:
+            # Use `rename_root_node_to='data'` to rename the root node of each
+            # submission to `data` so that form authors do not have to rewrite
+            # their `xml-external` formulas any time the asset UID changes,
+            # e.g. when cloning a form or creating a project from a template.
+            # Set `use_xpath=True` because `paired_data.fields` uses full group
+            # hierarchies, not just question names.
+            _write(
+                strip_nodes(
+                    submission,
+                    allowed_fields,
+                    use_xpath=True,
+                    rename_root_node_to='data',
+                    bulk_action_cache_key=random_uuid,
+                ).encode()
+            )
+
+        _write(closing_tag)
+        xml_file.seek(0)
+
+        return xml_file, f'md5:{md5.hexdigest()}'